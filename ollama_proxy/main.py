@@ -1,8 +1,840 @@
-from fastapi import FastAPI, Request
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import httpx
 
-app = FastAPI()
+OLLAMA_URL = "http://localhost:11434/v1/chat/completions"  # Cambia si tu Ollama está en otra IP/puerto
+# Varias instancias separadas por comas; por defecto solo OLLAMA_URL
+OLLAMA_URLS = [url.strip() for url in os.getenv("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()]
+
+# Balanceo: expulsión temporal de backends que fallan y reintentos en otro
+EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", str(max(len(OLLAMA_URLS) - 1, 0))))
+
+# Límites del pool de conexiones hacia Ollama (configurables por entorno)
+MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "60"))
+
+# Caché de respuestas para prompts repetidos (0 desactiva)
+CACHE_MAX_ENTRIES = int(os.getenv("OLLAMA_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = float(os.getenv("OLLAMA_CACHE_TTL", "300"))
+
+# Planificador: inferencias simultáneas por modelo y cola de espera acotada
+MAX_CONCURRENCY_PER_MODEL = int(os.getenv("OLLAMA_MAX_CONCURRENCY_PER_MODEL", "2"))
+MAX_QUEUE_DEPTH = int(os.getenv("OLLAMA_MAX_QUEUE_DEPTH", "32"))
+QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))
+
+# Modelos con etiqueta y cola propias; el resto se agrupa como "other". Sin
+# lista explícita se aceptan los primeros OLLAMA_MAX_MODEL_LABELS modelos vistos
+OLLAMA_MODELS = [m.strip() for m in os.getenv("OLLAMA_MODELS", "").split(",") if m.strip()]
+MAX_MODEL_LABELS = int(os.getenv("OLLAMA_MAX_MODEL_LABELS", "16"))
+
+# Recomendador TiSASRec local (TFLite), servido con micro-lotes
+_REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RECOMMENDER_MODEL_PATH = os.getenv(
+    "RECOMMENDER_MODEL_PATH", os.path.join(_REPO_ROOT, "assets", "ml_models", "tisasrec", "tisasrec_model.tflite"))
+RECOMMENDER_ITEM_MAPPING = os.getenv(
+    "RECOMMENDER_ITEM_MAPPING", os.path.join(_REPO_ROOT, "data", "item_mapping_temposage_unified.json"))
+RECOMMENDER_MAX_BATCH = int(os.getenv("RECOMMENDER_MAX_BATCH", "32"))
+RECOMMENDER_MAX_WAIT = float(os.getenv("RECOMMENDER_MAX_WAIT_MS", "5")) / 1000.0
+RECOMMENDER_MAX_QUEUE = int(os.getenv("RECOMMENDER_MAX_QUEUE", "1024"))
+RECOMMENDER_THREADS = int(os.getenv("RECOMMENDER_THREADS", "0")) or None
+RECOMMENDER_TIME_SPAN = int(os.getenv("RECOMMENDER_TIME_SPAN", "256"))
+RECOMMENDER_TOP_K = int(os.getenv("RECOMMENDER_TOP_K", "5"))
+
+
+class SchedulerSaturated(Exception):
+    """La cola del modelo está llena o la espera superó el límite."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ModelLabels:
+    """Acota los valores de ``model`` usados en métricas y colas del planificador.
+
+    El nombre del modelo lo elige el cliente: sin límite, cada nombre nuevo
+    crearía series de Prometheus y colas que nunca se liberan.
+    """
+
+    OTHER = "other"
+
+    def __init__(self, allowed: list, max_labels: int):
+        self.allowed = set(allowed)
+        self.max_labels = max_labels
+        self._seen = set()
+
+    def __call__(self, model: str) -> str:
+        if self.allowed:
+            return model if model in self.allowed else self.OTHER
+        if model in self._seen:
+            return model
+        if len(self._seen) < self.max_labels:
+            self._seen.add(model)
+            return model
+        return self.OTHER
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.active = 0
+        self.waiters = deque()
+
+
+class Scheduler:
+    """Limita las inferencias concurrentes por modelo con una cola FIFO acotada.
+
+    Las peticiones que encuentran todos los huecos ocupados esperan en orden
+    de llegada. Si la cola ya tiene ``max_queue`` peticiones se rechaza al
+    instante (429) y si la espera supera ``queue_timeout`` se devuelve 503, en
+    lugar de acumular peticiones hasta que Ollama agote el timeout.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queues = {}
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue()
+        return queue
+
+    async def acquire(self, model: str):
+        queue = self._queue(model)
+        if queue.active < self.max_concurrency and not queue.waiters:
+            queue.active += 1
+            return
+        if len(queue.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerSaturated(429, f"Cola del modelo '{model}' llena ({self.max_queue} en espera)")
+        waiter = asyncio.get_running_loop().create_future()
+        queue.waiters.append(waiter)
+        try:
+            # release() entrega el hueco directamente al primero de la cola
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco llegó justo al expirar: se devuelve para el siguiente
+                self.release(model)
+            else:
+                waiter.cancel()
+                try:
+                    queue.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise SchedulerSaturated(503, f"Tiempo de espera agotado en la cola del modelo '{model}'")
+            raise
+
+    def release(self, model: str):
+        queue = self._queue(model)
+        while queue.waiters:
+            waiter = queue.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        queue.active -= 1
+        if not queue.active:
+            # Las colas inactivas se descartan para que el dict no crezca sin límite
+            del self._queues[model]
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency_per_model": self.max_concurrency,
+            "max_queue_depth": self.max_queue,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "models": {
+                model: {"active": queue.active, "queued": len(queue.waiters)}
+                for model, queue in self._queues.items()
+            },
+        }
+
+# Cubetas de latencia: desde decenas de microsegundos (overhead del proxy)
+# hasta los minutos que puede tardar una generación larga
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Metrics:
+    """Registro mínimo de métricas con exposición en formato de texto Prometheus."""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._buckets = {}
+
+    @staticmethod
+    def _labels(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def describe(self, name: str, kind: str, text: str, buckets: tuple = None):
+        self._help[name] = (kind, text)
+        if buckets is not None:
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self._counters.setdefault(name, {})
+        key = self._labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def add_gauge(self, name: str, value: float, **labels):
+        series = self._gauges.setdefault(name, {})
+        key = self._labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self._histograms.setdefault(name, {})
+        key = self._labels(labels)
+        bounds = self._buckets.get(name, LATENCY_BUCKETS)
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [[0] * len(bounds), 0.0, 0]
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                state[0][i] += 1
+        state[1] += value
+        state[2] += 1
+
+    @staticmethod
+    def _format_labels(key: tuple, extra: dict = None) -> str:
+        items = list(key) + list((extra or {}).items())
+        if not items:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+    def render(self, extra_gauges: dict = None, extra_counters: dict = None) -> str:
+        """Texto Prometheus; ``extra_*`` son series calculadas al vuelo ``{nombre: {etiquetas: valor}}``."""
+        lines = []
+
+        def header(name, default_kind):
+            kind, text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        counters = {name: dict(series) for name, series in self._counters.items()}
+        for name, series in (extra_counters or {}).items():
+            counters.setdefault(name, {}).update(series)
+        for name, series in counters.items():
+            header(name, "counter")
+            lines.extend(f"{name}{self._format_labels(k)} {v}" for k, v in series.items())
+        gauges = {name: dict(series) for name, series in self._gauges.items()}
+        for name, series in (extra_gauges or {}).items():
+            gauges.setdefault(name, {}).update(series)
+        for name, series in gauges.items():
+            header(name, "gauge")
+            lines.extend(f"{name}{self._format_labels(k)} {v}" for k, v in series.items())
+        for name, series in self._histograms.items():
+            header(name, "histogram")
+            bounds = self._buckets.get(name, LATENCY_BUCKETS)
+            for key, (buckets, total, count) in series.items():
+                for bound, bucket_count in zip(bounds, buckets):
+                    lines.append(f"{name}_bucket{self._format_labels(key, {'le': bound})} {bucket_count}")
+                lines.append(f"{name}_bucket{self._format_labels(key, {'le': '+Inf'})} {count}")
+                lines.append(f"{name}_sum{self._format_labels(key)} {total}")
+                lines.append(f"{name}_count{self._format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _new_metrics() -> Metrics:
+    metrics = Metrics()
+    metrics.describe("ollama_proxy_requests_total", "counter", "Peticiones /api/chat por modelo, modo y código HTTP")
+    metrics.describe("ollama_proxy_request_duration_seconds", "histogram", "Duración total de /api/chat vista por el proxy")
+    metrics.describe("ollama_proxy_upstream_duration_seconds", "histogram", "Tiempo esperando a Ollama")
+    metrics.describe("ollama_proxy_overhead_seconds", "histogram", "Duración total menos tiempo en Ollama y en cola")
+    metrics.describe("ollama_proxy_queue_wait_seconds", "histogram", "Espera en la cola del planificador")
+    metrics.describe("ollama_proxy_inflight_requests", "gauge", "Peticiones /api/chat en curso")
+    metrics.describe("ollama_proxy_upstream_timeouts_total", "counter", "Timeouts hacia Ollama")
+    metrics.describe("ollama_proxy_errors_total", "counter", "Errores devueltos al cliente por motivo")
+    metrics.describe("ollama_proxy_tokens_total", "counter", "Tokens informados por Ollama (prompt/completion)")
+    metrics.describe("ollama_proxy_cache_hits_total", "counter", "Aciertos de la caché de respuestas")
+    metrics.describe("ollama_proxy_cache_misses_total", "counter", "Fallos de la caché de respuestas")
+    metrics.describe("ollama_proxy_cache_coalesced_total", "counter", "Peticiones agrupadas con otra idéntica en vuelo")
+    metrics.describe("ollama_proxy_cache_evictions_total", "counter", "Entradas expulsadas por tamaño")
+    metrics.describe("ollama_proxy_cache_expirations_total", "counter", "Entradas expiradas por TTL")
+    metrics.describe("ollama_proxy_cache_entries", "gauge", "Entradas en la caché de respuestas")
+    metrics.describe("ollama_proxy_scheduler_rejected_total", "counter", "Peticiones rechazadas por cola llena (429)")
+    metrics.describe("ollama_proxy_scheduler_timed_out_total", "counter",
+                     "Peticiones que agotaron la espera en cola (503)")
+    metrics.describe("ollama_proxy_scheduler_active", "gauge", "Inferencias en curso por modelo")
+    metrics.describe("ollama_proxy_scheduler_queued", "gauge", "Peticiones en cola por modelo")
+    metrics.describe("ollama_proxy_backend_outstanding", "gauge", "Peticiones en curso por backend")
+    metrics.describe("ollama_proxy_backend_available", "gauge", "1 si el backend no está expulsado")
+    metrics.describe("recommender_requests_total", "counter", "Peticiones /api/recommend por código HTTP")
+    metrics.describe("recommender_request_duration_seconds", "histogram", "Duración total de /api/recommend")
+    metrics.describe("recommender_queue_wait_seconds", "histogram", "Espera de cada petición hasta entrar en un lote")
+    metrics.describe("recommender_inference_seconds", "histogram", "Duración de cada invocación del modelo")
+    metrics.describe("recommender_batch_size", "histogram", "Peticiones por invocación del modelo", BATCH_SIZE_BUCKETS)
+    metrics.describe("recommender_queue_depth", "gauge", "Peticiones esperando a formar lote")
+    return metrics
+
+
+def _record_usage(metrics: Metrics, model: str, usage: dict):
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if isinstance(tokens, (int, float)):
+            metrics.inc("ollama_proxy_tokens_total", tokens, model=model, type=kind)
+
+
+def _usage_from_sse(line: bytes):
+    """Extrae el bloque ``usage`` de una línea ``data: {...}`` si lo contiene."""
+    if not line.startswith(b"data:") or b'"usage"' not in line:
+        return None
+    try:
+        return json.loads(line[5:].strip()).get("usage")
+    except (ValueError, AttributeError):
+        return None
+
+
+class NoBackendAvailable(Exception):
+    """Todos los backends de Ollama fallaron o están expulsados."""
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class LoadBalancer:
+    """Reparte las peticiones entre varias instancias de Ollama.
+
+    Elige el backend con menos peticiones en curso. Los chequeos de salud son
+    pasivos: tras ``eject_after`` fallos seguidos (error de conexión o 502/503/504)
+    el backend queda expulsado ``eject_seconds``. Se reintentan en otro backend,
+    hasta ``max_retries`` veces, los fallos al conectar y las respuestas
+    502/503/504 (backend caído o sobrecargado, o el proxy delante de él sin
+    respuesta); con el último intento se devuelve la respuesta 5xx tal cual.
+    El resto de errores no se reintenta: si la petición ya se envió (p. ej. la
+    conexión se cortó a mitad de respuesta) Ollama pudo haberla procesado.
+    """
+
+    RETRYABLE_STATUS = (502, 503, 504)
+
+    def __init__(self, urls: list, eject_after: int, eject_seconds: float, max_retries: int):
+        self.backends = [Backend(url) for url in urls]
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_retries = max_retries
+        self._next = 0
+
+    def _pick(self, exclude: set):
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and b.available(now)]
+        if not candidates:
+            # Si todos están expulsados se prueba el que antes vuelve a estar disponible
+            ejected = [b for b in self.backends if b not in exclude]
+            if not ejected:
+                return None
+            return min(ejected, key=lambda b: b.ejected_until)
+        # Menos peticiones en curso; los empates se reparten en rotación
+        self._next = (self._next + 1) % len(self.backends)
+        return min(candidates, key=lambda b: (b.outstanding, (self.backends.index(b) - self._next) % len(self.backends)))
+
+    def _record_failure(self, backend: Backend):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.eject_after:
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _record_success(self, backend: Backend):
+        backend.consecutive_failures = 0
+        backend.ejected_until = 0.0
+
+    async def send(self, client: httpx.AsyncClient, payload: dict, stream: bool = False):
+        """Envía ``payload`` al mejor backend y devuelve ``(respuesta, backend)``.
+
+        El llamador debe invocar ``done(backend)`` cuando termine con la respuesta.
+        """
+        tried = set()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            backend = self._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend)
+            backend.outstanding += 1
+            backend.requests += 1
+            try:
+                response = await client.send(client.build_request("POST", backend.url, json=payload),
+                                             stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # La petición no llegó a procesarse: es seguro reintentar en otro backend
+                self.done(backend)
+                self._record_failure(backend)
+                last_error = e
+                continue
+            except Exception:
+                self.done(backend)
+                self._record_failure(backend)
+                raise
+            if response.status_code in self.RETRYABLE_STATUS:
+                self._record_failure(backend)
+                if attempt < self.max_retries and len(tried) < len(self.backends):
+                    await response.aclose()
+                    self.done(backend)
+                    continue
+            else:
+                self._record_success(backend)
+            return response, backend
+        if last_error is not None:
+            raise last_error
+        raise NoBackendAvailable("No hay backends de Ollama disponibles")
+
+    def done(self, backend: Backend):
+        backend.outstanding -= 1
+
+    async def post(self, client: httpx.AsyncClient, payload: dict) -> httpx.Response:
+        response, backend = await self.send(client, payload)
+        self.done(backend)
+        return response
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        return [
+            {
+                "url": b.url,
+                "available": b.available(now),
+                "outstanding": b.outstanding,
+                "requests": b.requests,
+                "failures": b.failures,
+                "consecutive_failures": b.consecutive_failures,
+                "ejected_for_seconds": max(0.0, round(b.ejected_until - now, 1)),
+            }
+            for b in self.backends
+        ]
+
+
+def _upstream_error(e: Exception) -> HTTPException:
+    """Traduce un fallo hacia Ollama en un error HTTP en lugar de un mensaje falso."""
+    if isinstance(e, SchedulerSaturated):
+        headers = {"Retry-After": "1"} if e.status_code == 429 else None
+        return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+    if isinstance(e, NoBackendAvailable):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail=f"Ollama no respondió a tiempo: {e}")
+    if isinstance(e, httpx.HTTPStatusError):
+        return HTTPException(status_code=502, detail=f"Ollama respondió {e.response.status_code}")
+    if isinstance(e, httpx.RequestError):
+        return HTTPException(status_code=502, detail=f"No se pudo contactar con Ollama: {e}")
+    return HTTPException(status_code=502, detail=f"Respuesta inválida de Ollama: {e}")
+
+
+class ResponseCache:
+    """Caché LRU con TTL para respuestas de chat no streaming.
+
+    Además agrupa las peticiones idénticas concurrentes: mientras una petición
+    está en vuelo, las demás con la misma clave esperan su resultado en lugar
+    de lanzar otra inferencia contra Ollama. La petición a Ollama corre en su
+    propia tarea, así que si el cliente que la lanzó se desconecta las demás
+    siguen esperándola; solo al cancelado le llega ``CancelledError``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(model: str, messages: list) -> str:
+        # Se normalizan rol y contenido pero se conservan el resto de campos
+        # (``images``, ``tool_calls``...), que también llegan a Ollama
+        normalized = [
+            {**m, "role": str(m.get("role", "")).strip().lower(), "content": str(m.get("content", "")).strip()}
+            for m in messages
+        ]
+        raw = json.dumps({"model": model, "messages": normalized}, sort_keys=True,
+                         separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: str, fetch):
+        """Devuelve el valor cacheado o lo obtiene con ``fetch()`` una sola vez."""
+        value = self._get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.get_running_loop().create_task(self._fetch(key, fetch))
+            # Evita el aviso "exception was never retrieved" si nadie esperaba
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, fetch):
+        try:
+            value = await fetch()
+            self._put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+        }
+
+
+class RecommenderUnavailable(Exception):
+    """El modelo de recomendaciones no está cargado."""
+
+
+def _load_interpreter(model_path: str, num_threads: int = None):
+    """Intérprete TFLite: LiteRT si está instalado, si no ``tflite_runtime`` o ``tf.lite``."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class RecommenderModel:
+    """TiSASRec exportado a TFLite: ``(item_seq, time_matrix)`` -> probabilidades del siguiente item.
+
+    El intérprete se carga una vez y sus tensores se reservan una sola vez
+    con lote ``max_batch``: cada lote se rellena hasta ``max_batch`` filas, así
+    que ``allocate_tensors`` no vuelve a llamarse al cambiar el tamaño del lote.
+    """
+
+    def __init__(self, model_path: str, max_batch: int, time_span: int, num_threads: int = None,
+                 item_mapping_path: str = None):
+        import numpy as np
+        self._np = np
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.time_span = time_span
+        self.interpreter = _load_interpreter(model_path, num_threads)
+        details = self.interpreter.get_input_details()
+        self._item_input = next(d for d in details if "item_seq" in d["name"])
+        self._time_input = next(d for d in details if "time_matrix" in d["name"])
+        self._output = self.interpreter.get_output_details()[0]
+        self.maxlen = int(self._item_input["shape"][1])
+        self.num_outputs = int(self._output["shape"][-1])
+        # id original -> id interno; sin mapeo se usan los ids tal cual
+        self.item_to_index = None
+        self.index_to_item = None
+        if item_mapping_path and os.path.exists(item_mapping_path):
+            with open(item_mapping_path, "r", encoding="utf-8") as f:
+                self.item_to_index = {str(k): int(v) for k, v in json.load(f).items()}
+            self.index_to_item = {v: k for k, v in self.item_to_index.items()}
+        for detail in (self._item_input, self._time_input):
+            shape = list(detail["shape"])
+            shape[0] = max_batch
+            self.interpreter.resize_tensor_input(detail["index"], shape)
+        self.interpreter.allocate_tensors()
+
+    def encode(self, items: list, timestamps: list = None):
+        """Secuencia de una petición -> ``(item_seq, time_seq)`` con padding a la izquierda.
+
+        Los tiempos se escalan como en TiSASRec: ``round((t - t_min) / escala) + 1``
+        con la menor diferencia no nula como escala. Los items desconocidos
+        producen ``ValueError`` en lugar de confundirse con el padding (id 0).
+        """
+        np = self._np
+        if self.item_to_index is not None:
+            unknown = [item for item in items if str(item) not in self.item_to_index]
+            indices = [self.item_to_index.get(str(item), 0) for item in items]
+        else:
+            indices = [int(item) for item in items]
+            unknown = [item for item, index in zip(items, indices) if not 0 < index < self.num_outputs]
+        if unknown:
+            raise ValueError(f"items desconocidos: {unknown[:10]}")
+        indices = indices[-self.maxlen:]
+        item_seq = np.zeros(self.maxlen, dtype=np.int32)
+        time_seq = np.zeros(self.maxlen, dtype=np.int64)
+        if indices:
+            item_seq[self.maxlen - len(indices):] = indices
+        if timestamps:
+            times = np.asarray(timestamps, dtype=np.int64)
+            diffs = np.diff(times)
+            nonzero = diffs[diffs != 0]
+            scale = nonzero.min() if len(nonzero) else 1
+            scaled = np.round((times - times.min()) / scale).astype(np.int64) + 1
+            scaled = scaled[-self.maxlen:]
+            time_seq[self.maxlen - len(scaled):] = scaled
+        return item_seq, time_seq
+
+    def predict(self, item_seqs, time_seqs):
+        """Una invocación por cada ``max_batch`` filas; devuelve ``(B, num_items + 1)``."""
+        np = self._np
+        results = []
+        for start in range(0, len(item_seqs), self.max_batch):
+            items = item_seqs[start:start + self.max_batch]
+            times = time_seqs[start:start + self.max_batch]
+            count = len(items)
+            if count < self.max_batch:
+                items = np.pad(items, ((0, self.max_batch - count), (0, 0)))
+                times = np.pad(times, ((0, self.max_batch - count), (0, 0)))
+            spans = np.abs(times[:, :, None] - times[:, None, :])
+            np.minimum(spans, self.time_span, out=spans)
+            self.interpreter.set_tensor(self._item_input["index"], items)
+            self.interpreter.set_tensor(self._time_input["index"], spans.astype(np.int32))
+            self.interpreter.invoke()
+            results.append(self.interpreter.get_tensor(self._output["index"])[:count].copy())
+        return np.concatenate(results)
+
+    def top_k(self, scores, k: int) -> list:
+        np = self._np
+        scores = scores.copy()
+        scores[0] = -np.inf
+        k = max(1, min(k, len(scores) - 1))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            {"item": self.index_to_item.get(int(i), str(int(i))) if self.index_to_item else int(i),
+             "score": float(scores[i])}
+            for i in best
+        ]
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes en lotes y los ejecuta de uno en uno.
+
+    El primer elemento abre un lote que se cierra al llegar a ``max_batch``
+    elementos o tras ``max_wait`` segundos. El lote se ejecuta en un hilo
+    aparte (el intérprete no es reentrante, así que solo hay uno) para no
+    bloquear el bucle de eventos. Con la cola llena se rechaza con 429.
+    """
+
+    def __init__(self, run_batch, max_batch: int, max_wait: float, max_queue: int, metrics: Metrics):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._queue = asyncio.Queue(max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommender")
+        self._task = None
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise SchedulerSaturated(429, f"Cola del recomendador llena ({self._queue.maxsize} en espera)")
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Las peticiones cuyo cliente ya se fue no se calculan
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.metrics.observe("recommender_queue_wait_seconds", started - enqueued)
+            self.metrics.observe("recommender_batch_size", len(batch))
+            try:
+                results = await loop.run_in_executor(self._executor, self.run_batch, [e[0] for e in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            self.metrics.observe("recommender_inference_seconds", time.perf_counter() - started)
+            self.batches += 1
+            self.requests += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+        }
+
+
+def _load_recommender(metrics: Metrics):
+    """Carga el modelo al arrancar; si falta (o falta numpy/TFLite) el proxy sigue sirviendo chat.
+
+    numpy y el runtime TFLite son opcionales (``requirements-recommender.txt``).
+    """
+    if not os.path.exists(RECOMMENDER_MODEL_PATH):
+        print(f"Recomendador desactivado: no existe {RECOMMENDER_MODEL_PATH}")
+        return None, None
+    try:
+        model = RecommenderModel(RECOMMENDER_MODEL_PATH, RECOMMENDER_MAX_BATCH, RECOMMENDER_TIME_SPAN,
+                                 RECOMMENDER_THREADS, RECOMMENDER_ITEM_MAPPING)
+    except ImportError as e:
+        print(f"Recomendador desactivado: {e}. Instala las dependencias con "
+              "'pip install -r requirements-recommender.txt'")
+        return None, None
+    except Exception as e:
+        print(f"Recomendador desactivado: {type(e).__name__}: {e}")
+        return None, None
+
+    def run_batch(requests: list):
+        import numpy as np
+        item_seqs = np.stack([r[0] for r in requests])
+        time_seqs = np.stack([r[1] for r in requests])
+        return list(model.predict(item_seqs, time_seqs))
+
+    batcher = MicroBatcher(run_batch, RECOMMENDER_MAX_BATCH, RECOMMENDER_MAX_WAIT, RECOMMENDER_MAX_QUEUE, metrics)
+    batcher.start()
+    return model, batcher
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un único cliente reutilizado por todas las peticiones: mantiene las
+    # conexiones abiertas (keep-alive) en lugar de abrir una por /api/chat
+    app.state.client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=REQUEST_TIMEOUT,
+    )
+    app.state.cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+    app.state.metrics = _new_metrics()
+    app.state.model_labels = ModelLabels(OLLAMA_MODELS, MAX_MODEL_LABELS)
+    app.state.balancer = LoadBalancer(OLLAMA_URLS, EJECT_AFTER_FAILURES, EJECT_SECONDS, MAX_RETRIES)
+    # El límite por modelo se aplica por cada backend disponible
+    app.state.scheduler = Scheduler(MAX_CONCURRENCY_PER_MODEL * len(OLLAMA_URLS), MAX_QUEUE_DEPTH, QUEUE_TIMEOUT)
+    app.state.recommender, app.state.batcher = _load_recommender(app.state.metrics)
+    try:
+        yield
+    finally:
+        if app.state.batcher is not None:
+            await app.state.batcher.stop()
+        await app.state.client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS abierto para demo
 app.add_middleware(
@@ -13,28 +845,254 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-OLLAMA_URL = "http://localhost:11434/v1/chat/completions"  # Cambia si tu Ollama está en otra IP/puerto
+async def _stream_upstream(request: Request, response: httpx.Response, release, on_usage):
+    # Reenvía los fragmentos SSE de Ollama tal como llegan. Si el cliente se
+    # desconecta se corta el bucle y se cierra la respuesta, lo que cancela la
+    # petición hacia Ollama en lugar de dejarla generando en vano. El hueco
+    # del planificador se libera al terminar el stream.
+    pending = b""
+    try:
+        async for chunk in response.aiter_raw():
+            if await request.is_disconnected():
+                break
+            yield chunk
+            # Busca el bloque usage (último evento) sin retener todo el stream
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                usage = _usage_from_sse(line)
+                if usage:
+                    on_usage(usage)
+    finally:
+        await response.aclose()
+        release()
+
+
+class _Observation:
+    """Tiempos de una petición /api/chat para las métricas."""
+
+    def __init__(self, metrics: Metrics, model: str, stream: bool):
+        self.metrics = metrics
+        self.model = model
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.upstream = 0.0
+        self.queued = 0.0
+        self.finished = False
+        metrics.add_gauge("ollama_proxy_inflight_requests", 1, model=model)
+
+    def error(self, e: Exception, status_code: int):
+        if isinstance(e, httpx.TimeoutException):
+            self.metrics.inc("ollama_proxy_upstream_timeouts_total", model=self.model)
+        reason = "saturated" if isinstance(e, SchedulerSaturated) else type(e).__name__
+        self.metrics.inc("ollama_proxy_errors_total", model=self.model, reason=reason)
+        self.finish(status_code)
+
+    def finish(self, status_code: int):
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.started
+        labels = {"model": self.model}
+        self.metrics.add_gauge("ollama_proxy_inflight_requests", -1, **labels)
+        self.metrics.inc("ollama_proxy_requests_total", model=self.model,
+                         stream=str(self.stream).lower(), status=str(status_code))
+        self.metrics.observe("ollama_proxy_request_duration_seconds", total, **labels)
+        if self.upstream:
+            self.metrics.observe("ollama_proxy_upstream_duration_seconds", self.upstream, **labels)
+            self.metrics.observe("ollama_proxy_overhead_seconds",
+                                 max(total - self.upstream - self.queued, 0.0), **labels)
+
 
 @app.post("/api/chat")
 async def chat(request: Request):
     data = await request.json()
+    stream = bool(data.get("stream", False))
     # Adaptar el payload al formato de Ollama
     payload = {
         "model": data.get("model", "llama3"),
         "messages": data.get("messages", []),
-        "stream": False
+        "stream": stream
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(OLLAMA_URL, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            # Adaptar la respuesta al formato que espera Flutter
-            ai_message = result["choices"][0]["message"]
-            return {"message": ai_message}
+    if stream:
+        # Pide a Ollama el recuento de tokens en el último evento del stream
+        payload["stream_options"] = {"include_usage": True}
+    client: httpx.AsyncClient = request.app.state.client
+    scheduler: Scheduler = request.app.state.scheduler
+    balancer: LoadBalancer = request.app.state.balancer
+    metrics: Metrics = request.app.state.metrics
+    # Etiqueta acotada para métricas y cola; a Ollama se le envía el nombre real
+    model = request.app.state.model_labels(payload["model"])
+    observation = _Observation(metrics, model, stream)
+
+    async def acquire():
+        queued_at = time.perf_counter()
+        try:
+            await scheduler.acquire(model)
+        finally:
+            observation.queued += time.perf_counter() - queued_at
+            metrics.observe("ollama_proxy_queue_wait_seconds", time.perf_counter() - queued_at, model=model)
+
+    if stream:
+        try:
+            await acquire()
+        except SchedulerSaturated as e:
+            error = _upstream_error(e)
+            observation.error(e, error.status_code)
+            raise error
+        upstream_started = time.perf_counter()
+        try:
+            upstream, backend = await balancer.send(client, payload, stream=True)
+            if upstream.is_error:
+                try:
+                    await upstream.aread()
+                finally:
+                    await upstream.aclose()
+                    balancer.done(backend)
+                upstream.raise_for_status()
         except Exception as e:
-            return {"message": {"role": "assistant", "content": f"Error: {str(e)}"}}
+            scheduler.release(model)
+            observation.upstream = time.perf_counter() - upstream_started
+            error = _upstream_error(e)
+            observation.error(e, error.status_code)
+            raise error
+
+        def release():
+            balancer.done(backend)
+            scheduler.release(model)
+            observation.upstream = time.perf_counter() - upstream_started
+            observation.finish(upstream.status_code)
+
+        return StreamingResponse(
+            _stream_upstream(request, upstream, release, lambda usage: _record_usage(metrics, model, usage)),
+            media_type=upstream.headers.get("content-type", "text/event-stream"),
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def fetch():
+        await acquire()
+        try:
+            upstream_started = time.perf_counter()
+            try:
+                response = await balancer.post(client, payload)
+            finally:
+                observation.upstream += time.perf_counter() - upstream_started
+        finally:
+            scheduler.release(model)
+        response.raise_for_status()
+        result = response.json()
+        _record_usage(metrics, model, result.get("usage"))
+        # Adaptar la respuesta al formato que espera Flutter
+        return result["choices"][0]["message"]
+
+    cache: ResponseCache = request.app.state.cache
+    try:
+        if cache.enabled:
+            ai_message = await cache.get_or_fetch(cache.key(payload["model"], payload["messages"]), fetch)
+        else:
+            ai_message = await fetch()
+    except Exception as e:
+        error = _upstream_error(e)
+        observation.error(e, error.status_code)
+        raise error
+    observation.finish(200)
+    return {"message": ai_message}
+
+@app.post("/api/recommend")
+async def recommend(request: Request):
+    """Siguientes categorías recomendadas para un historial ``items`` (+ ``timestamps`` opcionales)."""
+    metrics: Metrics = request.app.state.metrics
+    started = time.perf_counter()
+    status_code = 200
+    try:
+        model: RecommenderModel = request.app.state.recommender
+        if model is None:
+            raise RecommenderUnavailable("El modelo de recomendaciones no está cargado")
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="El cuerpo no es JSON válido")
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=422, detail="El cuerpo debe ser un objeto JSON")
+        items = data.get("items")
+        timestamps = data.get("timestamps")
+        if not isinstance(items, list) or not items:
+            raise HTTPException(status_code=422, detail="'items' debe ser una lista no vacía")
+        if timestamps is not None and (not isinstance(timestamps, list) or len(timestamps) != len(items)):
+            raise HTTPException(status_code=422, detail="'timestamps' debe tener la misma longitud que 'items'")
+        try:
+            k = int(data.get("k", RECOMMENDER_TOP_K))
+            encoded = model.encode(items, timestamps)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=422, detail=f"Entrada inválida: {e}")
+        scores = await request.app.state.batcher.submit(encoded)
+        return {"recommendations": model.top_k(scores, k)}
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    except RecommenderUnavailable as e:
+        status_code = 503
+        raise HTTPException(status_code=503, detail=str(e))
+    except SchedulerSaturated as e:
+        status_code = e.status_code
+        raise _upstream_error(e)
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Error en la inferencia: {type(e).__name__}: {e}")
+    finally:
+        metrics.inc("recommender_requests_total", status=str(status_code))
+        metrics.observe("recommender_request_duration_seconds", time.perf_counter() - started)
+
+@app.get("/api/recommend/stats")
+def recommend_stats(request: Request):
+    batcher = request.app.state.batcher
+    if batcher is None:
+        return {"enabled": False}
+    model = request.app.state.recommender
+    return {"enabled": True, "model": model.model_path, "maxlen": model.maxlen, **batcher.stats()}
+
+@app.get("/api/cache/stats")
+def cache_stats(request: Request):
+    return request.app.state.cache.stats()
+
+@app.get("/api/scheduler/stats")
+def scheduler_stats(request: Request):
+    return request.app.state.scheduler.stats()
+
+@app.get("/api/backends")
+def backends(request: Request):
+    return request.app.state.balancer.stats()
+
+@app.get("/metrics")
+def prometheus_metrics(request: Request):
+    state = request.app.state
+    cache_stats = state.cache.stats()
+    scheduler_stats = state.scheduler.stats()
+    # Totales acumulados desde el arranque: se exponen como counters, no gauges
+    counters = {
+        f"ollama_proxy_cache_{event}_total": {(): cache_stats[event]}
+        for event in ("hits", "misses", "coalesced", "evictions", "expirations")
+    }
+    counters["ollama_proxy_scheduler_rejected_total"] = {(): scheduler_stats["rejected"]}
+    counters["ollama_proxy_scheduler_timed_out_total"] = {(): scheduler_stats["timed_out"]}
+    extra = {
+        "ollama_proxy_cache_entries": {(): cache_stats["entries"]},
+        "ollama_proxy_scheduler_active": {
+            (("model", model),): queue["active"] for model, queue in scheduler_stats["models"].items()
+        },
+        "ollama_proxy_scheduler_queued": {
+            (("model", model),): queue["queued"] for model, queue in scheduler_stats["models"].items()
+        },
+        "ollama_proxy_backend_outstanding": {
+            (("backend", b["url"]),): b["outstanding"] for b in state.balancer.stats()
+        },
+        "ollama_proxy_backend_available": {
+            (("backend", b["url"]),): int(b["available"]) for b in state.balancer.stats()
+        },
+    }
+    if state.batcher is not None:
+        extra["recommender_queue_depth"] = {(): state.batcher.stats()["queued"]}
+    return PlainTextResponse(state.metrics.render(extra, counters), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
-    return {"message": "Ollama proxy backend is running."} 
\ No newline at end of file
+    return {"message": "Ollama proxy backend is running."}
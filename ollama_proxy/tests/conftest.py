@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fakes import BACKEND_A
+
+
+@pytest.fixture
+def proxy():
+    """Configura ``main.app`` como ``lifespan`` pero con Ollama simulado por un ``MockTransport``.
+
+    Devuelve una función ``proxy(handler, **opciones)`` que prepara el estado
+    de la app y devuelve un cliente ``httpx.AsyncClient`` que habla con ella
+    por ``ASGITransport``.
+    """
+    import httpx
+    import main
+
+    def configure(handler, urls=(BACKEND_A,), cache_entries=1024, cache_ttl=300.0,
+                  max_concurrency=2, max_queue=32, queue_timeout=30.0,
+                  eject_after=3, eject_seconds=30.0, max_retries=None):
+        state = main.app.state
+        state.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        state.cache = main.ResponseCache(cache_entries, cache_ttl)
+        state.metrics = main._new_metrics()
+        state.model_labels = main.ModelLabels([], main.MAX_MODEL_LABELS)
+        retries = len(urls) - 1 if max_retries is None else max_retries
+        state.balancer = main.LoadBalancer(list(urls), eject_after, eject_seconds, retries)
+        state.scheduler = main.Scheduler(max_concurrency, max_queue, queue_timeout)
+        state.recommender, state.batcher = None, None
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://proxy")
+
+    return configure
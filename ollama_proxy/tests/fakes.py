@@ -0,0 +1,12 @@
+"""Datos de prueba compartidos: URLs de backends simulados y respuestas de Ollama."""
+
+BACKEND_A = "http://ollama-a:11434/v1/chat/completions"
+BACKEND_B = "http://ollama-b:11434/v1/chat/completions"
+
+
+def chat_reply(content: str) -> dict:
+    """Respuesta de Ollama (formato OpenAI) con un único mensaje."""
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+    }
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+import main
+from fakes import chat_reply
+
+
+def test_identical_concurrent_requests_share_one_upstream_call(proxy):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        body = {"model": "llama3", "messages": [{"role": "user", "content": "¿Qué hago hoy?"}]}
+        async with proxy(handler) as client:
+            responses = await asyncio.gather(*(client.post("/api/chat", json=body) for _ in range(5)))
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 5
+    assert {r.json()["message"]["content"] for r in responses} == {"hola"}
+    assert len(calls) == 1
+    stats = main.app.state.cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_cached_response_is_reused_and_normalized(proxy):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        async with proxy(handler) as client:
+            first = await client.post("/api/chat", json={
+                "model": "llama3", "messages": [{"role": "user", "content": "Hola"}]})
+            second = await client.post("/api/chat", json={
+                "model": "llama3", "messages": [{"role": "USER", "content": "  Hola "}]})
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.json() == second.json()
+    assert len(calls) == 1
+    assert main.app.state.cache.stats()["hits"] == 1
+
+
+def test_failed_fetch_is_not_cached(proxy):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(500)
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        body = {"model": "llama3", "messages": [{"role": "user", "content": "Hola"}]}
+        async with proxy(handler) as client:
+            return await client.post("/api/chat", json=body), await client.post("/api/chat", json=body)
+
+    failed, recovered = asyncio.run(scenario())
+    assert failed.status_code == 502
+    assert recovered.status_code == 200
+    assert len(calls) == 2
+
+
+def test_cache_events_are_exported_as_counters(proxy):
+    def handler(request):
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        body = {"model": "llama3", "messages": [{"role": "user", "content": "Hola"}]}
+        async with proxy(handler) as client:
+            await client.post("/api/chat", json=body)
+            await client.post("/api/chat", json=body)
+            return await client.get("/metrics")
+
+    text = asyncio.run(scenario()).text
+    assert "# TYPE ollama_proxy_cache_hits_total counter" in text
+    assert "ollama_proxy_cache_hits_total 1" in text
+    assert "ollama_proxy_cache_misses_total 1" in text
+
+
+def test_cancelled_leader_does_not_cancel_coalesced_requests():
+    cache = main.ResponseCache(16, 300.0)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"role": "assistant", "content": "hola"}
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_fetch("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_fetch("k", fetch))
+        await asyncio.sleep(0.01)
+        # El cliente del líder se desconecta a mitad de la inferencia
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == {"role": "assistant", "content": "hola"}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["coalesced"] == 1 and stats["entries"] == 1 and stats["inflight"] == 0
+
+
+def test_key_includes_every_message_field():
+    text = [{"role": "user", "content": "¿Qué hay en la imagen?"}]
+    first = [{**text[0], "images": ["aW1hZ2VuMQ=="]}]
+    second = [{**text[0], "images": ["aW1hZ2VuMg=="]}]
+    keys = {main.ResponseCache.key("llava", messages) for messages in (text, first, second)}
+    assert len(keys) == 3
+    assert main.ResponseCache.key("llava", first) == main.ResponseCache.key(
+        "llava", [{"role": " USER", "content": "¿Qué hay en la imagen? ", "images": ["aW1hZ2VuMQ=="]}])
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+import main
+from fakes import BACKEND_A, BACKEND_B, chat_reply
+
+PAYLOAD = {"model": "llama3", "messages": [{"role": "user", "content": "Hola"}], "stream": False}
+
+
+class FakeOllama:
+    """Dos backends simulados; ``down`` indica qué hosts fallan y cómo."""
+
+    def __init__(self):
+        self.down = {}
+        self.calls = []
+
+    def __call__(self, request):
+        self.calls.append(request.url.host)
+        error = self.down.get(request.url.host)
+        if error is not None:
+            raise error("fallo simulado", request=request)
+        return httpx.Response(200, json=chat_reply(request.url.host))
+
+
+def _balancer(eject_after=2, eject_seconds=30.0):
+    return main.LoadBalancer([BACKEND_A, BACKEND_B], eject_after, eject_seconds, max_retries=1)
+
+
+def test_connect_errors_are_retried_and_eject_the_backend():
+    ollama = FakeOllama()
+    ollama.down["ollama-a"] = httpx.ConnectError
+    balancer = _balancer()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(ollama)) as client:
+            return [await balancer.post(client, PAYLOAD) for _ in range(4)]
+
+    responses = asyncio.run(scenario())
+    assert all(r.json()["choices"][0]["message"]["content"] == "ollama-b" for r in responses)
+    a, b = balancer.stats()
+    assert not a["available"] and a["consecutive_failures"] == 2
+    assert b["available"] and b["failures"] == 0
+    # Una vez expulsado, A deja de recibir peticiones
+    assert ollama.calls.count("ollama-a") == 2
+    assert a["outstanding"] == 0 and b["outstanding"] == 0
+
+
+def test_ejected_backend_recovers_after_eject_seconds():
+    ollama = FakeOllama()
+    ollama.down["ollama-a"] = httpx.ConnectTimeout
+    balancer = _balancer(eject_after=1, eject_seconds=0.05)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(ollama)) as client:
+            # Con dos backends en rotación, A recibe una de las dos primeras peticiones
+            for _ in range(2):
+                await balancer.post(client, PAYLOAD)
+            assert not balancer.stats()[0]["available"]
+            ollama.down.clear()
+            await asyncio.sleep(0.1)
+            return [(await balancer.post(client, PAYLOAD)).json() for _ in range(4)]
+
+    replies = asyncio.run(scenario())
+    hosts = {r["choices"][0]["message"]["content"] for r in replies}
+    assert hosts == {"ollama-a", "ollama-b"}
+    a = balancer.stats()[0]
+    assert a["available"] and a["consecutive_failures"] == 0
+
+
+def test_protocol_errors_are_not_retried():
+    ollama = FakeOllama()
+    ollama.down["ollama-a"] = httpx.RemoteProtocolError
+    ollama.down["ollama-b"] = httpx.RemoteProtocolError
+    balancer = _balancer()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(ollama)) as client:
+            await balancer.post(client, PAYLOAD)
+
+    with pytest.raises(httpx.RemoteProtocolError):
+        asyncio.run(scenario())
+    # La petición pudo llegar a Ollama: no se repite en el otro backend
+    assert len(ollama.calls) == 1
+    assert all(b["outstanding"] == 0 for b in balancer.stats())
+
+
+def test_all_backends_down_returns_502(proxy):
+    ollama = FakeOllama()
+    ollama.down["ollama-a"] = httpx.ConnectError
+    ollama.down["ollama-b"] = httpx.ConnectError
+
+    async def scenario():
+        async with proxy(ollama, urls=(BACKEND_A, BACKEND_B)) as client:
+            return await client.post("/api/chat", json=PAYLOAD)
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 502
+    assert sorted(ollama.calls) == ["ollama-a", "ollama-b"]
+
+
+def test_streaming_error_releases_the_backend(proxy):
+    def handler(request):
+        return httpx.Response(503, content=b"sobrecargado")
+
+    async def scenario():
+        async with proxy(handler, max_retries=0) as client:
+            return await client.post("/api/chat", json={**PAYLOAD, "stream": True})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 502
+    assert main.app.state.balancer.stats()[0]["outstanding"] == 0
+    assert main.app.state.scheduler.stats()["models"] == {}
+
+
+def test_unavailable_status_is_retried_on_another_backend():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        if request.url.host == "ollama-a":
+            return httpx.Response(503, content=b"sobrecargado")
+        return httpx.Response(200, json=chat_reply(request.url.host))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [await balancer.post(client, PAYLOAD) for _ in range(2)]
+
+    balancer = _balancer(eject_after=5)
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert calls.count("ollama-a") == 1 and calls.count("ollama-b") == 2
+    a, b = balancer.stats()
+    assert a["failures"] == 1 and a["outstanding"] == 0 and b["outstanding"] == 0
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+import main
+from fakes import chat_reply
+
+
+def test_unknown_models_share_the_other_label(proxy):
+    def handler(request):
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        async with proxy(handler, cache_entries=0) as client:
+            main.app.state.model_labels = main.ModelLabels(["llama3"], main.MAX_MODEL_LABELS)
+            for model in ("llama3", "modelo-a", "modelo-b"):
+                await client.post("/api/chat", json={
+                    "model": model, "messages": [{"role": "user", "content": "Hola"}]})
+            return await client.get("/metrics")
+
+    text = asyncio.run(scenario()).text
+    assert 'model="llama3"' in text
+    assert 'model="other"' in text
+    assert "modelo-a" not in text and "modelo-b" not in text
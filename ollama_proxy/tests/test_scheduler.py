@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+import main
+from fakes import chat_reply
+
+
+def test_full_queue_is_rejected_immediately():
+    async def scenario():
+        scheduler = main.Scheduler(max_concurrency=1, max_queue=1, queue_timeout=5)
+        await scheduler.acquire("llama3")
+        waiter = asyncio.create_task(scheduler.acquire("llama3"))
+        await asyncio.sleep(0)
+        with pytest.raises(main.SchedulerSaturated) as saturated:
+            await scheduler.acquire("llama3")
+        # El hueco pasa directamente al primero de la cola
+        scheduler.release("llama3")
+        await waiter
+        scheduler.release("llama3")
+        return saturated.value, scheduler
+
+    saturated, scheduler = asyncio.run(scenario())
+    assert saturated.status_code == 429
+    assert scheduler.rejected == 1
+    # Las colas inactivas no se quedan en memoria
+    assert scheduler.stats()["models"] == {}
+
+
+def test_queue_wait_times_out_with_503():
+    async def scenario():
+        scheduler = main.Scheduler(max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        await scheduler.acquire("llama3")
+        with pytest.raises(main.SchedulerSaturated) as saturated:
+            await scheduler.acquire("llama3")
+        return saturated.value, scheduler
+
+    saturated, scheduler = asyncio.run(scenario())
+    assert saturated.status_code == 503
+    assert scheduler.timed_out == 1
+    assert scheduler.stats()["models"]["llama3"] == {"active": 1, "queued": 0}
+
+
+def test_saturated_chat_returns_429_with_retry_after(proxy):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=chat_reply("hola"))
+
+    async def scenario():
+        # Sin huecos ni cola: toda petición se rechaza al instante
+        async with proxy(handler, max_concurrency=0, max_queue=0) as client:
+            response = await client.post("/api/chat", json={
+                "model": "llama3", "messages": [{"role": "user", "content": "Hola"}]})
+            metrics = await client.get("/metrics")
+        return response, metrics
+
+    response, metrics = asyncio.run(scenario())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert calls == []
+    assert "ollama_proxy_scheduler_rejected_total 1" in metrics.text
+
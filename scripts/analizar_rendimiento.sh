@@ -39,20 +39,22 @@ adb shell dumpsys gfxinfo $PACKAGE > "$DIRECTORIO/gfxinfo_$FECHA.txt"
 # Capturar uso de CPU
 echo "⚙️ Analizando uso de CPU..."
 adb shell dumpsys cpuinfo > "$DIRECTORIO/cpuinfo_$FECHA.txt"
-CPU_USAGE=$(grep "$PACKAGE" "$DIRECTORIO/cpuinfo_$FECHA.txt" | head -1 | awk '{print $1}')
+CPU_USAGE=$(grep "$PACKAGE" "$DIRECTORIO/cpuinfo_$FECHA.txt" | head -1 | awk '{print $1}' | tr -d '+%')
 
 # Capturar estadísticas de batería
 echo "🔋 Analizando impacto en batería..."
 adb shell dumpsys batterystats $PACKAGE > "$DIRECTORIO/batterystats_$FECHA.txt"
 
-# Extraer FPS promedio
-TOTAL_FRAMES=$(grep -c "Draw" "$DIRECTORIO/gfxinfo_$FECHA.txt" || echo "0")
-JANKY_FRAMES=$(grep -c "Janky" "$DIRECTORIO/gfxinfo_$FECHA.txt" || echo "0")
+# Extraer frames renderizados y lentos (un solo valor por campo para no partir la fila del CSV)
+TOTAL_FRAMES=$(awk '/^Total frames rendered:/ {print $4; exit}' "$DIRECTORIO/gfxinfo_$FECHA.txt")
+JANKY_FRAMES=$(awk '/^Janky frames:/ {print $3; exit}' "$DIRECTORIO/gfxinfo_$FECHA.txt")
 
 # Valores por defecto si no se encuentran
 if [ -z "$TOTAL_PSS" ]; then TOTAL_PSS="0"; fi
 if [ -z "$TOTAL_JAVA_HEAP" ]; then TOTAL_JAVA_HEAP="0"; fi
 if [ -z "$CPU_USAGE" ]; then CPU_USAGE="0"; fi
+if [ -z "$TOTAL_FRAMES" ]; then TOTAL_FRAMES="0"; fi
+if [ -z "$JANKY_FRAMES" ]; then JANKY_FRAMES="0"; fi
 
 # Crear resumen CSV
 echo "Creando resumen..."
@@ -80,4 +82,11 @@ echo "- $DIRECTORIO/memoria_$FECHA.txt"
 echo "- $DIRECTORIO/gfxinfo_$FECHA.txt"
 echo "- $DIRECTORIO/cpuinfo_$FECHA.txt"
 echo "- $DIRECTORIO/batterystats_$FECHA.txt"
-echo "- $DIRECTORIO/resumen_$FECHA.csv" 
\ No newline at end of file
+echo "- $DIRECTORIO/resumen_$FECHA.csv"
+
+# Métricas completas (percentiles de frame, memoria por categoría, CPU y batería).
+# El historial solo procesa los volcados que aún no ha visto (los de esta ejecución).
+if command -v python3 > /dev/null; then
+  python3 "$(dirname "$0")/performance_history.py" --reports-dir "$DIRECTORIO" --package "$PACKAGE" ingest \
+    || echo "⚠️ No se pudieron extraer las métricas detalladas (requiere pandas y numpy)"
+fi
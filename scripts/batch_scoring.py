@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Puntuación offline por lotes de las recomendaciones TiSASRec
+============================================================
+
+Precalcula el top-K de categorías recomendadas para cada usuario con el
+modelo TFLite de TiSASRec, de modo que la app consulte una tabla en vez de
+ejecutar el recomendador en cada apertura. El resultado es un directorio de
+arrays ``.npy``:
+
+    <directorio>/users.npy            int32    ids de usuario ordenados (U)
+    <directorio>/lengths.npy          int64    longitud de la secuencia puntuada (U)
+    <directorio>/last_timestamps.npy  int64    último timestamp puntuado (U)
+    <directorio>/items.npy            int16    top-K ids internos del modelo (U, K; int32 si no caben)
+    <directorio>/scores.npy           float16  probabilidad de cada recomendación (U, K)
+    <directorio>/manifest.json        K, hash del modelo y vocabulario id interno -> categoría
+
+Los ids internos se traducen a los originales con
+``reverse_item_mapping_temposage_unified.json``; el vocabulario se guarda en
+el manifiesto, igual que las columnas categóricas de ``dataset_columnar``.
+
+Solo se vuelven a puntuar los usuarios nuevos o cuya longitud o último
+timestamp cambió desde la ejecución anterior; si cambia el modelo, ``K`` o
+``maxlen`` se puntúa todo.
+
+Uso:
+    python scripts/batch_scoring.py score --k 5
+    python scripts/batch_scoring.py lookup 42
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tflite_utils import input_order, make_interpreter, resize_batch
+from tisasrec_data import (DEFAULT_SOURCE, load_sequence_store, relation_matrices,
+                           sequence_signature, serving_sequences)
+
+MODEL_PATH = os.path.join("assets", "ml_models", "tisasrec", "tisasrec_model.tflite")
+REVERSE_MAPPING_PATH = os.path.join("data", "reverse_item_mapping_temposage_unified.json")
+SCORES_VERSION = 1
+
+
+def default_scores_dir(source: str) -> str:
+    """``temposage_unified.txt`` -> ``temposage_unified_topk/``."""
+    return os.path.splitext(source)[0] + "_topk"
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_vocabulary(reverse_mapping_path: str = REVERSE_MAPPING_PATH, num_items: int = 0) -> List[str]:
+    """Lista ``id interno -> id original``; la posición 0 es el padding."""
+    with open(reverse_mapping_path, "r", encoding="utf-8") as f:
+        reverse = {int(k): str(v) for k, v in json.load(f).items()}
+    size = max(max(reverse, default=0), num_items) + 1
+    return [reverse.get(i, str(i)) if i else "" for i in range(size)]
+
+
+class TiSASRecScorer:
+    """Ejecuta el modelo TFLite de TiSASRec sobre lotes de tamaño fijo."""
+
+    def __init__(self, model_path: str = MODEL_PATH, batch_size: int = 256, time_span: int = 256,
+                 num_threads: int = None):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.time_span = time_span
+        self.interpreter = make_interpreter(model_path, num_threads=num_threads)
+        resize_batch(self.interpreter, batch_size)
+        details = self.interpreter.get_input_details()
+        self._item_input, self._time_input = (details[i] for i in
+                                              input_order(self.interpreter, ["item_seq", "time_matrix"]))
+        self._output = self.interpreter.get_output_details()[0]
+        self.maxlen = int(self._item_input["shape"][1])
+        self.num_outputs = int(self._output["shape"][-1])
+
+    def score(self, item_seqs: np.ndarray, time_seqs: np.ndarray) -> np.ndarray:
+        """Probabilidades ``(B, num_items + 1)`` para cualquier ``B``.
+
+        El último lote se rellena hasta ``batch_size`` para no tener que
+        redimensionar (y reservar) los tensores del intérprete.
+        """
+        results = []
+        for start in range(0, len(item_seqs), self.batch_size):
+            items = item_seqs[start:start + self.batch_size]
+            times = time_seqs[start:start + self.batch_size]
+            count = len(items)
+            if count < self.batch_size:
+                items = np.pad(items, ((0, self.batch_size - count), (0, 0)))
+                times = np.pad(times, ((0, self.batch_size - count), (0, 0)))
+            matrices = relation_matrices(times, self.time_span, np.int32)
+            self.interpreter.set_tensor(self._item_input["index"], items.astype(np.int32, copy=False))
+            self.interpreter.set_tensor(self._time_input["index"], matrices)
+            self.interpreter.invoke()
+            results.append(self.interpreter.get_tensor(self._output["index"])[:count].copy())
+        if not results:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(results)
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ids y puntuaciones de los ``k`` mejores items por fila, ignorando el padding (id 0)."""
+    scores = scores.copy()
+    scores[:, 0] = -np.inf
+    k = min(k, scores.shape[1] - 1)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
+
+def _load_previous(scores_dir: str, manifest: dict):
+    """Resultados anteriores si son compatibles con ``manifest`` (mismo modelo, K y maxlen)."""
+    manifest_path = os.path.join(scores_dir, "manifest.json")
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    for key in ("version", "model_sha256", "k", "maxlen", "time_span"):
+        if previous.get(key) != manifest[key]:
+            return None
+    return {name: np.load(os.path.join(scores_dir, f"{name}.npy"))
+            for name in ("users", "lengths", "last_timestamps", "items", "scores")}
+
+
+def score_users(source: str = DEFAULT_SOURCE, scores_dir: str = None, model_path: str = MODEL_PATH,
+                k: int = 5, batch_size: int = 256, time_span: int = 256, num_threads: int = None,
+                reverse_mapping_path: str = REVERSE_MAPPING_PATH, force: bool = False) -> dict:
+    """Puntúa los usuarios con secuencias nuevas o modificadas y guarda el top-K de todos."""
+    scores_dir = scores_dir or default_scores_dir(source)
+    store = load_sequence_store(source)
+    scorer = TiSASRecScorer(model_path, batch_size, time_span, num_threads)
+    users = np.asarray(store.users)
+    lengths, last = sequence_signature(store)
+    # No hay más de ``num_outputs - 1`` items reales (0 es padding): el buffer (U, k) no debe ser mayor
+    k = min(k, scorer.num_outputs - 1)
+
+    manifest = {
+        "version": SCORES_VERSION,
+        "model": model_path,
+        "model_sha256": _file_sha256(model_path),
+        "k": k,
+        "maxlen": scorer.maxlen,
+        "time_span": time_span,
+    }
+    item_dtype = np.int16 if scorer.num_outputs <= np.iinfo(np.int16).max else np.int32
+    items = np.zeros((len(users), k), dtype=item_dtype)
+    scores = np.zeros((len(users), k), dtype=np.float16)
+    changed = np.ones(len(users), dtype=bool)
+    previous = None if force else _load_previous(scores_dir, manifest)
+    if previous is not None and len(previous["users"]):
+        position = np.minimum(np.searchsorted(previous["users"], users), len(previous["users"]) - 1)
+        same = ((previous["users"][position] == users)
+                & (previous["lengths"][position] == lengths)
+                & (previous["last_timestamps"][position] == last))
+        items[same] = previous["items"][position[same]]
+        scores[same] = previous["scores"][position[same]]
+        changed = ~same
+
+    indices = np.flatnonzero(changed)
+    started = time.perf_counter()
+    # Por bloques de lotes para que la memoria de las probabilidades no dependa de U
+    chunk = batch_size * 16
+    for start in range(0, len(indices), chunk):
+        block = indices[start:start + chunk]
+        item_seqs, time_seqs = serving_sequences(store, block, scorer.maxlen)
+        block_items, block_scores = top_k(scorer.score(item_seqs, time_seqs), k)
+        items[block] = block_items
+        scores[block] = block_scores
+    elapsed = time.perf_counter() - started
+
+    vocabulary = load_vocabulary(reverse_mapping_path, scorer.num_outputs - 1)
+    manifest.update({
+        "num_users": int(len(users)),
+        "rescored_users": int(len(indices)),
+        "scoring_seconds": round(elapsed, 3),
+        "vocabulary": vocabulary,
+    })
+    os.makedirs(scores_dir, exist_ok=True)
+    for name, array in (("users", users.astype(np.int32)), ("lengths", lengths),
+                        ("last_timestamps", last), ("items", items), ("scores", scores)):
+        path = os.path.join(scores_dir, f"{name}.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    # El manifiesto va al final: si falta, la tabla se considera incompleta
+    manifest_path = os.path.join(scores_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+class RecommendationTable:
+    """Consulta de las recomendaciones precalculadas (arrays abiertos con ``mmap``)."""
+
+    def __init__(self, scores_dir: str):
+        with open(os.path.join(scores_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.vocabulary = self.manifest["vocabulary"]
+        self.users = np.load(os.path.join(scores_dir, "users.npy"), mmap_mode="r")
+        self.items = np.load(os.path.join(scores_dir, "items.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(scores_dir, "scores.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def recommendations(self, user_id: int) -> List[Dict[str, object]]:
+        """Top-K de ``user_id`` como ``[{"item": id_original, "score": p}, ...]``."""
+        index = int(np.searchsorted(self.users, user_id))
+        if index >= len(self.users) or self.users[index] != user_id:
+            raise KeyError(user_id)
+        return [{"item": self.vocabulary[int(item)], "score": float(score)}
+                for item, score in zip(self.items[index], self.scores[index])]
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Recomendaciones TiSASRec precalculadas por usuario")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score = subparsers.add_parser("score", help="Puntúa los usuarios cuya secuencia cambió")
+    score.add_argument("source", nargs="?", default=DEFAULT_SOURCE)
+    score.add_argument("--scores-dir", default=None)
+    score.add_argument("--model", default=MODEL_PATH)
+    score.add_argument("--k", type=int, default=5)
+    score.add_argument("--batch-size", type=int, default=256)
+    score.add_argument("--time-span", type=int, default=256)
+    score.add_argument("--threads", type=int, default=None)
+    score.add_argument("--reverse-mapping", default=REVERSE_MAPPING_PATH)
+    score.add_argument("--force", action="store_true", help="Vuelve a puntuar a todos los usuarios")
+
+    lookup = subparsers.add_parser("lookup", help="Muestra las recomendaciones de un usuario")
+    lookup.add_argument("user", type=int)
+    lookup.add_argument("--source", default=DEFAULT_SOURCE)
+    lookup.add_argument("--scores-dir", default=None)
+
+    args = parser.parse_args()
+    if args.command == "lookup":
+        table = RecommendationTable(args.scores_dir or default_scores_dir(args.source))
+        for rank, entry in enumerate(table.recommendations(args.user), start=1):
+            print(f"  {rank}. {entry['item']}  ({entry['score']:.4f})")
+        return
+
+    manifest = score_users(args.source, args.scores_dir, args.model, args.k, args.batch_size,
+                           args.time_span, args.threads, args.reverse_mapping, args.force)
+    scores_dir = args.scores_dir or default_scores_dir(args.source)
+    print(f"✅ Recomendaciones top-{manifest['k']} en {scores_dir}")
+    print(f"  - Usuarios: {manifest['num_users']:,} ({manifest['rescored_users']:,} puntuados)")
+    if manifest["rescored_users"]:
+        rate = manifest["rescored_users"] / max(manifest["scoring_seconds"], 1e-9)
+        print(f"  - Tiempo: {manifest['scoring_seconds']:.2f} s ({rate:,.0f} usuarios/s)")
+
+
+if __name__ == "__main__":
+    main()
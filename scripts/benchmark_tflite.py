@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de inferencia de los modelos TensorFlow Lite de TempoSage
+=========================================================================
+
+Carga cada ``.tflite`` de ``assets/ml_models/`` (``tisasrec_model.tflite``,
+``multitask_model_fp16.tflite``, variantes cuantizadas...) con el intérprete
+TFLite y recorre combinaciones de hilos y tamaños de lote. Para cada
+combinación informa:
+
+- tiempo de carga en frío (crear el intérprete y reservar tensores)
+- tiempo de la primera inferencia
+- latencia p50/p95/p99 de ``invoke`` tras el calentamiento
+- pico de memoria residente (RSS) del proceso
+
+Cada combinación se mide en un proceso nuevo para que la carga sea realmente
+en frío y el pico de RSS no arrastre modelos anteriores. Los resultados se
+guardan en JSON junto con el hash de cada modelo; ``--baseline`` compara con
+un JSON anterior y marca las regresiones de latencia.
+
+Uso:
+    python scripts/benchmark_tflite.py
+    python scripts/benchmark_tflite.py --threads 1 2 4 --batch-sizes 1 8 32 --runs 200
+    python scripts/benchmark_tflite.py --baseline performance_reports/tflite_benchmark_20250601_120000.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+MODELS_DIR = os.path.join("assets", "ml_models")
+OUTPUT_DIR = "performance_reports"
+
+
+def peak_rss_mb() -> float:
+    """Pico de RSS del proceso actual en MB (``ru_maxrss`` va en KB en Linux y en bytes en macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def find_models(models_dir: str = MODELS_DIR) -> List[str]:
+    """Todos los ``.tflite`` bajo ``models_dir``, ordenados."""
+    return sorted(glob.glob(os.path.join(models_dir, "**", "*.tflite"), recursive=True))
+
+
+def model_fingerprint(path: str) -> Dict[str, object]:
+    """Tamaño y SHA-256 del modelo, para saber qué versión se midió."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return {"path": path, "size_bytes": os.path.getsize(path), "sha256": digest.hexdigest()}
+
+
+def _benchmark_config(path: str, num_threads: int, batch_size: int, runs: int, warmup: int) -> dict:
+    """Mide una combinación modelo/hilos/lote. Se ejecuta en un proceso hijo nuevo."""
+    import numpy as np
+    from tflite_utils import make_interpreter, measure_latency, random_inputs, resize_batch
+
+    rss_before = peak_rss_mb()
+    result = {"threads": num_threads, "batch_size": batch_size}
+    try:
+        started = time.perf_counter()
+        interpreter = make_interpreter(path, num_threads=num_threads)
+        resize_batch(interpreter, batch_size)
+        result["cold_load_ms"] = (time.perf_counter() - started) * 1000.0
+
+        inputs = random_inputs(interpreter, batch_size=batch_size)
+        for detail, value in zip(interpreter.get_input_details(), inputs):
+            interpreter.set_tensor(detail["index"], value)
+        started = time.perf_counter()
+        interpreter.invoke()
+        result["first_inference_ms"] = (time.perf_counter() - started) * 1000.0
+
+        latency = measure_latency(interpreter, inputs, runs=runs, warmup=warmup)
+        result["latency"] = latency
+        result["throughput_per_s"] = batch_size * 1000.0 / latency["mean_ms"] if latency["mean_ms"] > 0 else None
+        result["inputs"] = [{"name": d["name"], "shape": [int(s) for s in d["shape"]],
+                             "dtype": np.dtype(d["dtype"]).name}
+                            for d in interpreter.get_input_details()]
+    except Exception as e:
+        # Modelos con lote fijo u operaciones no soportadas: se registra y se sigue
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["baseline_rss_mb"] = rss_before
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(path: str, num_threads: int, batch_size: int, runs: int, warmup: int) -> dict:
+    """Ejecuta ``_benchmark_config`` en un proceso ``spawn`` de un solo uso."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(_benchmark_config, (path, num_threads, batch_size, runs, warmup))
+
+
+def run_benchmark(models: List[str], threads: List[int], batch_sizes: List[int],
+                  runs: int = 100, warmup: int = 10, isolate: bool = True) -> dict:
+    """Recorre modelos x hilos x lotes y devuelve el informe completo."""
+    measure = run_isolated if isolate else _benchmark_config
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "machine": platform.machine(),
+                 "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "config": {"threads": threads, "batch_sizes": batch_sizes, "runs": runs,
+                   "warmup": warmup, "isolated": isolate},
+        "models": [],
+    }
+    for path in models:
+        entry = model_fingerprint(path)
+        entry["results"] = []
+        for num_threads in threads:
+            for batch_size in batch_sizes:
+                result = measure(path, num_threads, batch_size, runs, warmup)
+                entry["results"].append(result)
+                _print_result(os.path.basename(path), result)
+        report["models"].append(entry)
+    return report
+
+
+def _print_result(name: str, result: dict):
+    label = f"  {name:<36} hilos={result['threads']:<2} lote={result['batch_size']:<4}"
+    if "error" in result:
+        print(f"{label} ❌ {result['error']}")
+        return
+    latency = result["latency"]
+    print(f"{label} carga {result['cold_load_ms']:>8.2f}ms  1ª {result['first_inference_ms']:>8.2f}ms"
+          f"  p50 {latency['p50_ms']:>8.3f}ms  p95 {latency['p95_ms']:>8.3f}ms"
+          f"  p99 {latency['p99_ms']:>8.3f}ms  RSS {result['peak_rss_mb']:>7.1f}MB")
+
+
+def _result_key(model: dict, result: dict):
+    return os.path.basename(model["path"]), result["threads"], result["batch_size"]
+
+
+def compare_reports(current: dict, baseline: dict, metric: str = "p50_ms",
+                    tolerance: float = 0.10) -> List[dict]:
+    """Compara ``metric`` entre dos informes; devuelve las combinaciones más lentas que ``tolerance``."""
+    previous = {}
+    for model in baseline.get("models", []):
+        for result in model["results"]:
+            if "latency" in result:
+                previous[_result_key(model, result)] = (model.get("sha256"), result["latency"][metric])
+
+    regressions = []
+    for model in current["models"]:
+        for result in model["results"]:
+            key = _result_key(model, result)
+            if "latency" not in result or key not in previous:
+                continue
+            old_sha, old_value = previous[key]
+            new_value = result["latency"][metric]
+            if old_value > 0 and new_value > old_value * (1.0 + tolerance):
+                regressions.append({
+                    "model": key[0], "threads": key[1], "batch_size": key[2], "metric": metric,
+                    "baseline": old_value, "current": new_value,
+                    "ratio": new_value / old_value, "model_changed": old_sha != model["sha256"],
+                })
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de inferencia de los modelos TFLite de TempoSage")
+    parser.add_argument("models", nargs="*", help=f"Modelos a medir (por defecto todos los de {MODELS_DIR})")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", default=None,
+                        help=f"Ruta del JSON (por defecto {OUTPUT_DIR}/tflite_benchmark_<fecha>.json)")
+    parser.add_argument("--baseline", default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Aumento relativo de p50 que cuenta como regresión")
+    parser.add_argument("--no-isolate", dest="isolate", action="store_false",
+                        help="Mide todo en este proceso (más rápido; carga y RSS dejan de ser en frío)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    models = args.models or find_models(args.models_dir)
+    if not models:
+        print(f"❌ No se encontraron modelos .tflite en {args.models_dir}")
+        sys.exit(1)
+
+    print(f"🔬 Benchmark TFLite: {len(models)} modelos, hilos {args.threads}, lotes {args.batch_sizes}")
+    report = run_benchmark(models, args.threads, args.batch_sizes, args.runs, args.warmup, args.isolate)
+
+    output = args.output or os.path.join(
+        OUTPUT_DIR, f"tflite_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"✅ Resultados guardados en {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regresiones de latencia frente a {args.baseline}:")
+            for r in regressions:
+                changed = " (modelo distinto)" if r["model_changed"] else ""
+                print(f"  {r['model']} hilos={r['threads']} lote={r['batch_size']}: "
+                      f"{r['baseline']:.3f}ms -> {r['current']:.3f}ms (x{r['ratio']:.2f}){changed}")
+            sys.exit(1)
+        print(f"Sin regresiones frente a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,474 @@
 #!/usr/bin/env python3
 """
-Script para generar un modelo TensorFlow Lite simple para recomendaciones.
-Este modelo es un placeholder para demostrar la integración con TensorFlow Lite.
+Entrenamiento del modelo TiSASRec de recomendaciones y exportación a TensorFlow Lite.
+
+Lee el log real de interacciones (``data/temposage_unified.txt``) a través del
+almacén de secuencias de ``tisasrec_data``, genera secuencias de longitud 50
+con sus matrices de intervalos temporales en un pipeline ``tf.data`` (map en
+paralelo y prefetch), entrena un TiSASRec (self-attention con intervalos de
+tiempo), guarda checkpoints por época e informa del throughput en secuencias
+por segundo.
+
+La exportación admite cuantización post-entrenamiento (rango dinámico,
+float16 y entera completa calibrada con secuencias reales de entrenamiento).
+Cada exportación se compara con el modelo float en un informe JSON con
+tamaño de archivo, latencia individual y por lote en el intérprete TFLite y
+deriva de precisión.
+
+Uso:
+    python scripts/create_model.py --epochs 20
+    python scripts/create_model.py --epochs 5 --resume
+    python scripts/create_model.py --epochs 0 --resume --quantize none dynamic float16 int8
 """
 
-import os
+import argparse
 import json
+import os
+import time
+
 import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
 
-# Asegurar que el directorio existe
-os.makedirs("assets/ml_models/tisasrec", exist_ok=True)
-
-# Cargar el mapeo de categorías
-with open("assets/ml_models/tisasrec/item_mapping.json", "r") as f:
-    item_mapping = json.load(f)
-
-num_categories = len(item_mapping)
-sequence_length = 50
-embedding_dim = 32
-
-# Crear un modelo simple de recomendación
-def create_model():
-    inputs = keras.Input(shape=(sequence_length,))
-    
-    # Embedding para las categorías
-    x = layers.Embedding(
-        input_dim=num_categories + 1,  # +1 para el padding (0)
-        output_dim=embedding_dim
-    )(inputs)
-    
-    # LSTM para procesar la secuencia
-    x = layers.LSTM(32)(x)
-    
-    # Capa densa para la salida
-    outputs = layers.Dense(num_categories + 1, activation='softmax')(x)
-    
-    model = keras.Model(inputs=inputs, outputs=outputs)
+from tflite_utils import invoke, make_interpreter, measure_latency, resize_batch
+from tisasrec_data import DEFAULT_SOURCE, load_sequence_store, scaled_times
+
+OUTPUT_DIR = os.path.join("assets", "ml_models", "tisasrec")
+MODEL_PATH = os.path.join(OUTPUT_DIR, "tisasrec_model.tflite")
+CHECKPOINT_DIR = os.path.join("checkpoints", "tisasrec")
+ITEM_MAPPING_PATH = os.path.join("data", "item_mapping_temposage_unified.json")
+QUANTIZATION_MODES = ("none", "dynamic", "float16", "int8")
+
+
+class TimeIntervalAttention(layers.Layer):
+    """Bloque de self-attention de TiSASRec con posiciones absolutas e intervalos."""
+
+    def __init__(self, hidden_units: int, maxlen: int, time_span: int, dropout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.hidden_units = hidden_units
+        self.maxlen = maxlen
+        self.time_span = time_span
+        self.dropout_rate = dropout
+        self.query = layers.Dense(hidden_units)
+        self.key = layers.Dense(hidden_units)
+        self.value = layers.Dense(hidden_units)
+        self.pos_key = layers.Embedding(maxlen, hidden_units)
+        self.pos_value = layers.Embedding(maxlen, hidden_units)
+        self.time_key = layers.Embedding(time_span + 1, hidden_units)
+        self.time_value = layers.Embedding(time_span + 1, hidden_units)
+        self.attention_norm = layers.LayerNormalization(epsilon=1e-8)
+        self.ffn_norm = layers.LayerNormalization(epsilon=1e-8)
+        self.ffn_in = layers.Dense(hidden_units, activation="relu")
+        self.ffn_out = layers.Dense(hidden_units)
+        self.dropout = layers.Dropout(dropout)
+
+    def call(self, x, time_matrix, padding_mask, training=None):
+        positions = tf.range(self.maxlen)
+        q = self.query(self.attention_norm(x))
+        k = self.key(x) + self.pos_key(positions)
+        v = self.value(x) + self.pos_value(positions)
+        time_k = self.time_key(time_matrix)
+        time_v = self.time_value(time_matrix)
+
+        scores = tf.matmul(q, k, transpose_b=True) + tf.einsum("bid,bijd->bij", q, time_k)
+        scores = scores / (self.hidden_units ** 0.5)
+        # Causal: cada posición solo atiende a las anteriores; el padding no se atiende
+        causal = tf.linalg.band_part(tf.ones((self.maxlen, self.maxlen)), -1, 0)
+        allowed = causal[None, :, :] * padding_mask[:, None, :]
+        scores = scores + (1.0 - allowed) * -1e9
+        weights = self.dropout(tf.nn.softmax(scores, axis=-1), training=training)
+
+        attended = tf.matmul(weights, v) + tf.einsum("bij,bijd->bid", weights, time_v)
+        x = q + self.dropout(attended, training=training)
+        ffn = self.ffn_out(self.dropout(self.ffn_in(self.ffn_norm(x)), training=training))
+        x = x + self.dropout(ffn, training=training)
+        return x * padding_mask[:, :, None]
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({"hidden_units": self.hidden_units, "maxlen": self.maxlen,
+                       "time_span": self.time_span, "dropout": self.dropout_rate})
+        return config
+
+
+class TiSASRec(keras.Model):
+    """TiSASRec: devuelve logits sobre todos los items para cada posición."""
+
+    def __init__(self, num_items: int, maxlen: int = 50, time_span: int = 256,
+                 hidden_units: int = 50, num_blocks: int = 2, dropout: float = 0.2, **kwargs):
+        super().__init__(**kwargs)
+        self.num_items = num_items
+        self.maxlen = maxlen
+        self.time_span = time_span
+        self.hidden_units = hidden_units
+        self.item_embedding = layers.Embedding(num_items + 1, hidden_units)
+        self.embedding_dropout = layers.Dropout(dropout)
+        self.blocks = [TimeIntervalAttention(hidden_units, maxlen, time_span, dropout)
+                       for _ in range(num_blocks)]
+        self.final_norm = layers.LayerNormalization(epsilon=1e-8)
+
+    def encode(self, item_seq, time_matrix, training=None):
+        padding_mask = tf.cast(tf.not_equal(item_seq, 0), tf.float32)
+        x = self.item_embedding(item_seq) * (self.hidden_units ** 0.5)
+        x = self.embedding_dropout(x, training=training) * padding_mask[:, :, None]
+        for block in self.blocks:
+            x = block(x, time_matrix, padding_mask, training=training)
+        return self.final_norm(x)
+
+    def call(self, inputs, training=None):
+        hidden = self.encode(inputs["item_seq"], inputs["time_matrix"], training=training)
+        return tf.matmul(hidden, self.item_embedding.embeddings, transpose_b=True)
+
+    def next_item_scores(self, item_seq, time_matrix):
+        """Probabilidades del siguiente item a partir de la última posición."""
+        hidden = self.encode(item_seq, time_matrix, training=False)[:, -1, :]
+        return tf.nn.softmax(tf.matmul(hidden, self.item_embedding.embeddings, transpose_b=True))
+
+
+def build_windows(store, maxlen: int, windows_per_user: int):
+    """Prepara los datos planos y las ventanas ``(inicio, fin)`` de entrenamiento.
+
+    Por usuario se reservan las dos últimas interacciones (validación y test)
+    y se generan hasta ``windows_per_user`` ventanas consecutivas de
+    ``maxlen + 1`` interacciones terminando en el final del tramo de
+    entrenamiento (la más reciente es la misma que usa TiSASRec).
+    """
+    items = np.asarray(store.items, dtype=np.int32)
+    offsets = np.asarray(store.offsets, dtype=np.int64)
+    times = np.zeros(len(items), dtype=np.int64)
+    windows = []
+    for u in range(store.num_users):
+        start, end = offsets[u], offsets[u + 1]
+        times[start:end] = scaled_times(store.timestamps[start:end])
+        train_end = end - 2 if end - start >= 3 else end
+        window_end = train_end
+        for _ in range(windows_per_user):
+            if window_end - start < 2:
+                break
+            windows.append((max(start, window_end - maxlen - 1), window_end))
+            window_end -= maxlen
+    return items, times, np.asarray(windows, dtype=np.int64)
+
+
+def make_dataset(items: np.ndarray, times: np.ndarray, windows: np.ndarray, maxlen: int,
+                 time_span: int, batch_size: int, shuffle: bool = True, seed: int = 42) -> tf.data.Dataset:
+    """Pipeline ``tf.data``: ventana -> secuencia con padding + matriz de intervalos."""
+    all_items = tf.constant(items)
+    all_times = tf.constant(times)
+
+    def to_example(window):
+        start, end = window[0], window[1]
+        seq_items = all_items[start:end]
+        seq_times = all_times[start:end]
+        length = end - start - 1
+        pad = maxlen - length
+        item_seq = tf.pad(seq_items[:-1], [[pad, 0]])
+        target = tf.pad(seq_items[1:], [[pad, 0]])
+        time_seq = tf.pad(seq_times[:-1], [[pad, 0]])
+        time_matrix = tf.minimum(tf.abs(time_seq[:, None] - time_seq[None, :]), time_span)
+        return ({"item_seq": item_seq, "time_matrix": tf.cast(time_matrix, tf.int32)}, target)
+
+    dataset = tf.data.Dataset.from_tensor_slices(windows)
+    if shuffle:
+        dataset = dataset.shuffle(len(windows), seed=seed, reshuffle_each_iteration=True)
+    return (dataset
+            .map(to_example, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def validation_arrays(store, maxlen: int, time_span: int):
+    """Entradas de validación de TiSASRec: historial ``seq[:-2]`` -> objetivo ``seq[-2]``."""
+    item_seqs, time_matrices, targets = [], [], []
+    for u in range(store.num_users):
+        items, timestamps = store.sequence_at(u)
+        if len(items) < 3:
+            continue
+        times = scaled_times(timestamps)
+        history, history_times = np.asarray(items[:-2][-maxlen:]), times[:-2][-maxlen:]
+        pad = maxlen - len(history)
+        item_seqs.append(np.pad(history, (pad, 0)))
+        time_seq = np.pad(history_times, (pad, 0))
+        time_matrices.append(np.minimum(np.abs(time_seq[:, None] - time_seq[None, :]), time_span))
+        targets.append(items[-2])
+    return (np.asarray(item_seqs, dtype=np.int32), np.asarray(time_matrices, dtype=np.int32),
+            np.asarray(targets, dtype=np.int32))
+
+
+class ThroughputCallback(keras.callbacks.Callback):
+    """Mide secuencias por segundo en cada época."""
+
+    def __init__(self, sequences_per_epoch: int):
+        super().__init__()
+        self.sequences_per_epoch = sequences_per_epoch
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        rate = self.sequences_per_epoch / elapsed if elapsed > 0 else float("inf")
+        self.history.append(rate)
+        if logs is not None:
+            logs["sequences_per_second"] = rate
+        print(f"  Época {epoch + 1}: {rate:,.0f} secuencias/s ({elapsed:.1f} s)")
+
+
+def evaluate(model: TiSASRec, store, maxlen: int, time_span: int, k: int = 10) -> dict:
+    """HR@k y NDCG@k sobre el penúltimo item de cada usuario (ranking completo)."""
+    item_seqs, time_matrices, targets = validation_arrays(store, maxlen, time_span)
+    if len(targets) == 0:
+        return {}
+    scores = model.next_item_scores(tf.constant(item_seqs), tf.constant(time_matrices)).numpy()
+    scores[:, 0] = -np.inf
+    target_scores = scores[np.arange(len(targets)), targets]
+    ranks = (scores > target_scores[:, None]).sum(axis=1)
+    hits = ranks < k
+    return {
+        f"hr@{k}": float(hits.mean()),
+        f"ndcg@{k}": float(np.where(hits, 1.0 / np.log2(ranks + 2), 0.0).mean()),
+    }
+
+
+def quantized_path(path: str, quantization: str) -> str:
+    """``tisasrec_model.tflite`` -> ``tisasrec_model_<modo>.tflite`` (salvo ``none``)."""
+    if quantization == "none":
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{quantization}{ext}"
+
+
+def export_tflite(model: TiSASRec, path: str, quantization: str = "none", representative=None):
+    """Exporta la inferencia (última posición) a TensorFlow Lite.
+
+    ``quantization``: ``none`` (float32), ``dynamic`` (pesos int8),
+    ``float16`` (pesos float16) o ``int8`` (entera completa; necesita
+    ``representative``, un generador de listas ``[item_seq, time_matrix]``).
+    La dimensión de lote es dinámica para poder medir inferencia por lotes.
+    """
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, model.maxlen], tf.int32, name="item_seq"),
+        tf.TensorSpec([None, model.maxlen, model.maxlen], tf.int32, name="time_matrix"),
+    ])
+    def serve(item_seq, time_matrix):
+        return {"scores": model.next_item_scores(item_seq, time_matrix)}
+
+    def converter_for(builtins_only: bool):
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()])
+        if quantization != "none":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            if representative is None:
+                raise ValueError("La cuantización int8 necesita un dataset representativo")
+            converter.representative_dataset = representative
+            if builtins_only:
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        return converter
+
+    try:
+        tflite_model = converter_for(builtins_only=True).convert()
+    except Exception as e:
+        if quantization != "int8":
+            raise
+        # Algunas operaciones (einsum, gather) no tienen kernel int8: se permite float para ellas
+        print(f"  ⚠️ int8 estricto no disponible ({type(e).__name__}); se usa int8 con fallback float")
+        tflite_model = converter_for(builtins_only=False).convert()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(tflite_model)
+    return tflite_model
+
+
+def representative_dataset(items: np.ndarray, times: np.ndarray, windows: np.ndarray, maxlen: int,
+                           time_span: int, samples: int):
+    """Generador de calibración con secuencias reales de entrenamiento."""
+    dataset = make_dataset(items, times, windows, maxlen, time_span, batch_size=1, shuffle=False)
+
+    def generate():
+        for features, _ in dataset.take(samples):
+            yield [features["item_seq"].numpy(), features["time_matrix"].numpy()]
+    return generate
+
+
+def _tflite_scores(path: str, item_seqs: np.ndarray, time_matrices: np.ndarray) -> np.ndarray:
+    interpreter = make_interpreter(path)
+    resize_batch(interpreter, len(item_seqs))
+    return invoke(interpreter, [item_seqs, time_matrices])[0]
+
+
+def _ranking_metrics(scores: np.ndarray, targets: np.ndarray, k: int = 10) -> dict:
+    scores = scores.astype(np.float64)
+    scores[:, 0] = -np.inf
+    target_scores = scores[np.arange(len(targets)), targets]
+    ranks = (scores > target_scores[:, None]).sum(axis=1)
+    hits = ranks < k
+    return {f"hr@{k}": float(hits.mean()),
+            f"ndcg@{k}": float(np.where(hits, 1.0 / np.log2(ranks + 2), 0.0).mean())}
+
+
+def quantization_report(model: TiSASRec, exports: dict, store, maxlen: int, time_span: int,
+                        batch_size: int = 32, runs: int = 100) -> dict:
+    """Compara cada exportación TFLite con el modelo float de Keras.
+
+    Informa tamaño, latencia con lote 1 y con ``batch_size`` en el intérprete
+    TFLite, y deriva frente al modelo float sobre las entradas de validación.
+    """
+    item_seqs, time_matrices, targets = validation_arrays(store, maxlen, time_span)
+    reference = model.next_item_scores(tf.constant(item_seqs), tf.constant(time_matrices)).numpy()
+    reference_top1 = reference.argmax(axis=1)
+    report = {
+        "validation_sequences": int(len(targets)),
+        "float_model": _ranking_metrics(reference, targets),
+        "exports": {},
+    }
+    for quantization, path in exports.items():
+        scores = _tflite_scores(path, item_seqs, time_matrices)
+        single = make_interpreter(path)
+        resize_batch(single, 1)
+        batch = make_interpreter(path)
+        resize_batch(batch, batch_size)
+        batch_index = np.arange(batch_size) % len(item_seqs)
+        diff = np.abs(scores - reference)
+        report["exports"][quantization] = {
+            "path": path,
+            "size_bytes": os.path.getsize(path),
+            "latency_single": measure_latency(single, [item_seqs[:1], time_matrices[:1]], runs=runs),
+            "latency_batch": {
+                "batch_size": batch_size,
+                **measure_latency(batch, [item_seqs[batch_index], time_matrices[batch_index]], runs=runs),
+            },
+            "drift": {
+                "max_abs_diff": float(diff.max()),
+                "mean_abs_diff": float(diff.mean()),
+                "top1_agreement": float((scores.argmax(axis=1) == reference_top1).mean()),
+                **_ranking_metrics(scores, targets),
+            },
+        }
+    return report
+
+
+def print_quantization_report(report: dict):
+    print("\n📦 Informe de exportación TFLite:")
+    print(f"  {'modo':<8} {'tamaño':>10} {'lote 1 p50':>11} {'lote N p50':>11} {'máx |Δ|':>9} {'top-1':>6} {'hr@10':>6}")
+    for quantization, entry in report["exports"].items():
+        drift = entry["drift"]
+        print(f"  {quantization:<8} {entry['size_bytes'] / 1024:>8.1f}KB"
+              f" {entry['latency_single']['p50_ms']:>9.3f}ms"
+              f" {entry['latency_batch']['p50_ms']:>9.3f}ms"
+              f" {drift['max_abs_diff']:>9.5f} {drift['top1_agreement']:>6.2f} {drift['hr@10']:>6.3f}")
+    print(f"  modelo float (Keras): hr@10 {report['float_model']['hr@10']:.3f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Entrena TiSASRec con el log real de TempoSage")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Log de interacciones usuario/item/timestamp")
+    parser.add_argument("--maxlen", type=int, default=50)
+    parser.add_argument("--time-span", type=int, default=256)
+    parser.add_argument("--hidden-units", type=int, default=50)
+    parser.add_argument("--num-blocks", type=int, default=2)
+    parser.add_argument("--dropout", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--windows-per-user", type=int, default=8,
+                        help="Ventanas de entrenamiento por usuario (1 = solo la más reciente)")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--resume", action="store_true", help="Continúa desde el último checkpoint")
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-jit", dest="jit", action="store_false", help="Desactiva la compilación XLA")
+    parser.add_argument("--quantize", nargs="+", choices=QUANTIZATION_MODES, default=["none"],
+                        help="Variantes a exportar; cada una se incluye en el informe")
+    parser.add_argument("--representative-samples", type=int, default=200,
+                        help="Secuencias de entrenamiento usadas para calibrar int8")
+    parser.add_argument("--report", default=None,
+                        help="Ruta del informe JSON (por defecto junto al modelo)")
+    parser.add_argument("--report-batch-size", type=int, default=32)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    keras.utils.set_random_seed(args.seed)
+
+    store = load_sequence_store(args.source)
+    num_items = store.num_items
+    if os.path.exists(ITEM_MAPPING_PATH):
+        with open(ITEM_MAPPING_PATH, "r") as f:
+            num_items = max(num_items, max(json.load(f).values()))
+    print(f"Secuencias: {store.num_users:,} usuarios, {store.num_interactions:,} interacciones, {num_items} items")
+
+    items, times, windows = build_windows(store, args.maxlen, args.windows_per_user)
+    dataset = make_dataset(items, times, windows, args.maxlen, args.time_span, args.batch_size, seed=args.seed)
+    print(f"Ventanas de entrenamiento: {len(windows):,}")
+
+    model = TiSASRec(num_items, args.maxlen, args.time_span, args.hidden_units, args.num_blocks, args.dropout)
     model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
+        optimizer=keras.optimizers.Adam(args.learning_rate, beta_2=0.98),
+        loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True, ignore_class=0),
+        jit_compile=args.jit,
     )
-    
-    return model
+    # Construye los pesos con un lote antes de restaurar/entrenar
+    model(next(iter(dataset))[0])
+    print("Modelo creado")
 
-# Crear el modelo
-model = create_model()
-print("Modelo creado")
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.checkpoint_dir, "tisasrec.weights.h5")
+    if args.resume and os.path.exists(checkpoint_path):
+        model.load_weights(checkpoint_path)
+        print(f"Pesos restaurados desde {checkpoint_path}")
 
-# Generar algunos datos de ejemplo para entrenar el modelo
-# Esto es solo para demostración, no tiene sentido real
-X_train = np.random.randint(0, num_categories + 1, size=(100, sequence_length))
-y_train = np.random.randint(0, num_categories + 1, size=(100, 1))
+    if args.epochs > 0:
+        throughput = ThroughputCallback(len(windows))
+        started = time.perf_counter()
+        model.fit(dataset, epochs=args.epochs, verbose=2, callbacks=[
+            keras.callbacks.ModelCheckpoint(checkpoint_path, save_weights_only=True),
+            throughput,
+        ])
+        elapsed = time.perf_counter() - started
+        print("Modelo entrenado")
+        print(f"  - Tiempo total: {elapsed:.1f} s")
+        if throughput.history:
+            print(f"  - Throughput medio: {np.mean(throughput.history):,.0f} secuencias/s")
+    metrics = evaluate(model, store, args.maxlen, args.time_span)
+    for name, value in metrics.items():
+        print(f"  - {name}: {value:.4f}")
 
-# Entrenar el modelo con datos de ejemplo
-model.fit(X_train, y_train, epochs=1, verbose=1)
-print("Modelo entrenado")
+    exports = {}
+    for quantization in args.quantize:
+        path = quantized_path(args.output, quantization)
+        representative = None
+        if quantization == "int8":
+            representative = representative_dataset(items, times, windows, args.maxlen, args.time_span,
+                                                    args.representative_samples)
+        export_tflite(model, path, quantization, representative)
+        exports[quantization] = path
+        print(f"Modelo TensorFlow Lite ({quantization}) guardado en {path}")
 
-# Convertir el modelo a TensorFlow Lite
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-tflite_model = converter.convert()
+    report = quantization_report(model, exports, store, args.maxlen, args.time_span, args.report_batch_size)
+    report_path = args.report or os.path.splitext(args.output)[0] + "_export_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_quantization_report(report)
+    print(f"  Informe: {report_path}")
 
-# Guardar el modelo
-with open("assets/ml_models/tisasrec/tisasrec_model.tflite", "wb") as f:
-    f.write(tflite_model)
+    # Verificar que el modelo se puede cargar
+    interpreter = make_interpreter(next(iter(exports.values())))
+    interpreter.allocate_tensors()
 
-print("Modelo TensorFlow Lite guardado en assets/ml_models/tisasrec/tisasrec_model.tflite")
+    # Obtener información sobre las entradas y salidas
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
 
-# Verificar que el modelo se puede cargar
-interpreter = tf.lite.Interpreter(model_path="assets/ml_models/tisasrec/tisasrec_model.tflite")
-interpreter.allocate_tensors()
+    print("Detalles de entrada:", input_details)
+    print("Detalles de salida:", output_details)
 
-# Obtener información sobre las entradas y salidas
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
+    print("Modelo verificado correctamente")
 
-print("Detalles de entrada:", input_details)
-print("Detalles de salida:", output_details)
 
-print("Modelo verificado correctamente") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Formato columnar binario para el dataset de entrenamiento de TempoSage
+======================================================================
+
+Guarda cada columna de cada split como un archivo ``.npy`` independiente:
+
+    <directorio>/<split>/<columna>.npy
+
+- Las columnas categóricas (títulos, categorías, clima, ubicación, ...) se
+  codifican con diccionario: el ``.npy`` guarda códigos ``int8``/``int16`` y el
+  vocabulario vive en el esquema.
+- Las columnas numéricas se guardan compactas: enteros como ``int32``
+  (``timestamp`` como ``int64``) y reales como ``float32``.
+
+El esquema (columnas, dtypes y vocabularios) se describe en la clave
+``columnar`` de ``dataset_metadata.json``, así que un entrenamiento puede abrir
+solo las columnas que necesita con ``np.load(..., mmap_mode='r')`` sin copiar
+ni parsear texto.
+
+Uso:
+    python scripts/dataset_columnar.py convert data/temposage_unified_training_dataset.csv
+    python scripts/dataset_columnar.py info data/temposage_columnar
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+from typing import Dict, List, Any
+
+import numpy as np
+import pandas as pd
+
+FORMAT_NAME = 'npy-columns'
+FORMAT_VERSION = 1
+
+# Enteros que no caben en int32 a partir de 2038
+WIDE_INT_COLUMNS = {'timestamp'}
+
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    """Dtype más pequeño capaz de representar los códigos de un vocabulario."""
+    return np.dtype(np.int8) if n_categories <= np.iinfo(np.int8).max else np.dtype(np.int16)
+
+
+def build_schema(sample: pd.DataFrame, vocabularies: Dict[str, List[str]] = None) -> List[Dict[str, Any]]:
+    """Construye el esquema columnar a partir de una muestra del dataset.
+
+    Las columnas de texto usan el vocabulario de ``vocabularies`` si existe; si
+    no, el conjunto ordenado de valores de la muestra.
+    """
+    vocabularies = vocabularies or {}
+    schema = []
+    for name in sample.columns:
+        column = sample[name]
+        if name in vocabularies or not pd.api.types.is_numeric_dtype(column):
+            categories = list(vocabularies.get(name) or sorted(column.dropna().astype(str).unique()))
+            schema.append({
+                'name': name,
+                'kind': 'categorical',
+                'dtype': _code_dtype(len(categories)).name,
+                'categories': categories,
+            })
+        elif pd.api.types.is_integer_dtype(column) or pd.api.types.is_bool_dtype(column):
+            dtype = np.int64 if name in WIDE_INT_COLUMNS else np.int32
+            schema.append({'name': name, 'kind': 'numeric', 'dtype': np.dtype(dtype).name})
+        else:
+            schema.append({'name': name, 'kind': 'numeric', 'dtype': 'float32'})
+    return schema
+
+
+def encode_column(values: pd.Series, field: Dict[str, Any]) -> np.ndarray:
+    """Convierte una columna al dtype compacto de su campo del esquema."""
+    if field['kind'] == 'categorical':
+        codes = pd.Categorical(values.astype(str), categories=field['categories']).codes
+        if (codes < 0).any():
+            unknown = sorted(set(values[codes < 0].astype(str)))
+            raise ValueError(f"Valores fuera del vocabulario de '{field['name']}': {unknown[:5]}")
+        return codes.astype(field['dtype'])
+    return values.to_numpy().astype(field['dtype'])
+
+
+class ColumnarWriter:
+    """Escribe splits columnares por fragmentos sobre archivos ``.npy`` preasignados.
+
+    Los tamaños de cada split se conocen de antemano, así que cada columna se
+    abre con ``open_memmap`` y los fragmentos se copian en su posición: la
+    memoria usada depende del fragmento y no del total.
+    """
+
+    def __init__(self, output_dir: str, split_sizes: Dict[str, int],
+                 vocabularies: Dict[str, List[str]] = None):
+        self.output_dir = output_dir
+        self.split_sizes = split_sizes
+        self.vocabularies = vocabularies or {}
+        self.schema = None
+        self._arrays = {}
+        self._offsets = {name: 0 for name in split_sizes}
+
+    def _open(self, sample: pd.DataFrame):
+        self.schema = build_schema(sample, self.vocabularies)
+        for split, size in self.split_sizes.items():
+            split_dir = os.path.join(self.output_dir, split)
+            os.makedirs(split_dir, exist_ok=True)
+            self._arrays[split] = {
+                field['name']: np.lib.format.open_memmap(
+                    os.path.join(split_dir, f"{field['name']}.npy"), mode='w+',
+                    dtype=np.dtype(field['dtype']), shape=(size,)
+                )
+                for field in self.schema
+            }
+
+    def write(self, split: str, chunk: pd.DataFrame):
+        """Añade ``chunk`` a continuación de lo ya escrito en ``split``."""
+        if self.schema is None:
+            self._open(chunk)
+        start = self._offsets[split]
+        end = start + len(chunk)
+        if end > self.split_sizes[split]:
+            raise ValueError(f"El split '{split}' excede su tamaño declarado ({self.split_sizes[split]})")
+        for field in self.schema:
+            self._arrays[split][field['name']][start:end] = encode_column(chunk[field['name']], field)
+        self._offsets[split] = end
+
+    def close(self) -> Dict[str, Any]:
+        """Vacía los memmaps a disco y devuelve la descripción para los metadatos."""
+        for split, arrays in self._arrays.items():
+            if self._offsets[split] != self.split_sizes[split]:
+                raise ValueError(
+                    f"El split '{split}' quedó incompleto: {self._offsets[split]}/{self.split_sizes[split]}"
+                )
+            for array in arrays.values():
+                array.flush()
+        self._arrays = {}
+        return {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'path': os.path.basename(os.path.normpath(self.output_dir)),
+            'splits': dict(self.split_sizes),
+            'schema': self.schema or [],
+        }
+
+
+def write_columnar(splits: Dict[str, pd.DataFrame], output_dir: str,
+                   vocabularies: Dict[str, List[str]] = None) -> Dict[str, Any]:
+    """Escribe DataFrames ya en memoria (uno por split) en formato columnar."""
+    writer = ColumnarWriter(output_dir, {name: len(df) for name, df in splits.items()}, vocabularies)
+    for name, df in splits.items():
+        writer.write(name, df)
+    return writer.close()
+
+
+class AppendJournal:
+    """Registra el estado de los archivos antes de añadirles datos para poder deshacerlo.
+
+    ``track`` guarda el tamaño y el inicio (cabecera) del archivo original;
+    ``backup`` guarda una copia completa para los archivos que se reescriben.
+    Si algo falla a mitad, ``rollback`` deja todos los archivos como estaban.
+    """
+
+    PREFIX_BYTES = 4096
+
+    def __init__(self):
+        self._tracked = {}
+        self._backups = {}
+
+    def track(self, path: str):
+        if path in self._tracked or path in self._backups or not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            prefix = f.read(self.PREFIX_BYTES)
+        self._tracked[path] = (os.path.getsize(path), prefix)
+
+    def backup(self, path: str):
+        if path in self._backups:
+            return
+        self._tracked.pop(path, None)
+        shutil.copyfile(path, path + '.bak')
+        self._backups[path] = path + '.bak'
+
+    def rollback(self):
+        for path, (size, prefix) in self._tracked.items():
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+                f.seek(0)
+                f.write(prefix)
+        for path, backup in self._backups.items():
+            os.replace(backup, path)
+        self._tracked, self._backups = {}, {}
+
+    def commit(self):
+        for backup in self._backups.values():
+            os.remove(backup)
+        self._tracked, self._backups = {}, {}
+
+
+def append_npy(path: str, values: np.ndarray, journal: AppendJournal = None):
+    """Añade ``values`` al final de un ``.npy`` 1-D sin reescribir los datos existentes.
+
+    Se escriben primero los datos y después la cabecera con la nueva forma. Si
+    la cabecera nueva no cabe en el hueco de la original (muy raro: el relleno
+    es de 64 bytes), el archivo se reescribe completo.
+    """
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_start = f.tell()
+    values = np.ascontiguousarray(values, dtype=dtype)
+    new_shape = (shape[0] + len(values),) + tuple(shape[1:])
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': fortran_order,
+        'shape': new_shape,
+    })
+    header = header.getvalue()
+
+    if version == (1, 0) and len(header) == data_start:
+        if journal is not None:
+            journal.track(path)
+        with open(path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            f.write(values.tobytes())
+            f.seek(0)
+            f.write(header)
+        return
+    if journal is not None:
+        journal.backup(path)
+    existing = np.load(path, mmap_mode='r')
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, np.concatenate([existing, values]))
+    del existing
+    os.replace(path + '.tmp', path)
+
+
+def append_columnar(columnar: Dict[str, Any], root: str, split: str, chunk: pd.DataFrame,
+                    journal: AppendJournal = None) -> Dict[str, Any]:
+    """Añade ``chunk`` a un split columnar existente y actualiza su tamaño en ``columnar``."""
+    split_dir = os.path.join(root, split)
+    for field in columnar['schema']:
+        append_npy(os.path.join(split_dir, f"{field['name']}.npy"),
+                   encode_column(chunk[field['name']], field), journal)
+    columnar['splits'][split] = columnar['splits'].get(split, 0) + len(chunk)
+    return columnar
+
+
+def read_schema(path: str) -> Dict[str, Any]:
+    """Lee la descripción columnar de ``dataset_metadata.json``.
+
+    ``path`` puede ser el propio JSON, su directorio o el directorio columnar.
+    """
+    candidates = [path, os.path.join(path, 'dataset_metadata.json'),
+                  os.path.join(os.path.dirname(os.path.normpath(path)), 'dataset_metadata.json')]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            with open(candidate, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            if 'columnar' in metadata:
+                columnar = dict(metadata['columnar'])
+                columnar['root'] = os.path.join(os.path.dirname(candidate), columnar['path'])
+                return columnar
+    raise FileNotFoundError(f"No se encontró un esquema columnar en {path}")
+
+
+def load_columnar(path: str, split: str = 'train', columns: List[str] = None,
+                  mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Carga columnas de un split como arrays NumPy.
+
+    Con ``mmap=True`` los arrays se abren con ``mmap_mode='r'``: no se lee nada
+    del disco hasta que se accede a los datos. Las categóricas se devuelven
+    como códigos; usa ``decode_column`` o ``to_dataframe`` para obtener texto.
+    """
+    columnar = read_schema(path)
+    fields = {field['name']: field for field in columnar['schema']}
+    names = columns or list(fields)
+    missing = [name for name in names if name not in fields]
+    if missing:
+        raise KeyError(f"Columnas inexistentes en el dataset columnar: {missing}")
+    split_dir = os.path.join(columnar['root'], split)
+    return {
+        name: np.load(os.path.join(split_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        for name in names
+    }
+
+
+def decode_column(codes: np.ndarray, field: Dict[str, Any]) -> pd.Categorical:
+    """Convierte códigos de diccionario en un ``pd.Categorical``."""
+    return pd.Categorical.from_codes(np.asarray(codes), categories=field['categories'])
+
+
+def to_dataframe(path: str, split: str = 'train', columns: List[str] = None) -> pd.DataFrame:
+    """Carga un split columnar como DataFrame con categóricas decodificadas."""
+    columnar = read_schema(path)
+    fields = {field['name']: field for field in columnar['schema']}
+    arrays = load_columnar(path, split, columns, mmap=True)
+    return pd.DataFrame({
+        name: decode_column(values, fields[name]) if fields[name]['kind'] == 'categorical' else values
+        for name, values in arrays.items()
+    })
+
+
+def convert_csv(csv_path: str, output_dir: str, metadata_path: str = None,
+                split: str = 'full', chunk_size: int = 100000) -> Dict[str, Any]:
+    """Convierte un CSV existente a formato columnar como un único split.
+
+    Los vocabularios se toman de un primer recorrido por el CSV, de modo que
+    el segundo recorrido (la escritura) funciona por fragmentos.
+    """
+    total = 0
+    values: Dict[str, set] = {}
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        total += len(chunk)
+        for name in chunk.columns:
+            if not pd.api.types.is_numeric_dtype(chunk[name]):
+                values.setdefault(name, set()).update(chunk[name].dropna().astype(str))
+    vocabularies = {name: sorted(vals) for name, vals in values.items()}
+
+    writer = ColumnarWriter(output_dir, {split: total}, vocabularies)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        writer.write(split, chunk)
+    columnar = writer.close()
+
+    metadata_path = metadata_path or os.path.join(os.path.dirname(os.path.normpath(output_dir)),
+                                                  'dataset_metadata.json')
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    metadata['columnar'] = columnar
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    return columnar
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Dataset columnar (.npy) de TempoSage")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help="Convierte un CSV a formato columnar")
+    convert.add_argument('csv', help="CSV de entrada")
+    convert.add_argument('--output-dir', default=os.path.join('data', 'temposage_columnar'))
+    convert.add_argument('--metadata', default=None,
+                         help="dataset_metadata.json a actualizar (por defecto junto al directorio de salida)")
+    convert.add_argument('--split', default='full', help="Nombre del split generado")
+
+    info = subparsers.add_parser('info', help="Muestra el esquema de un dataset columnar")
+    info.add_argument('path', help="Directorio columnar o dataset_metadata.json")
+
+    args = parser.parse_args()
+    if args.command == 'convert':
+        columnar = convert_csv(args.csv, args.output_dir, args.metadata, args.split)
+        print(f"✅ Dataset columnar guardado en {args.output_dir}")
+        print(f"  - Registros: {sum(columnar['splits'].values()):,}")
+        print(f"  - Columnas: {len(columnar['schema'])}")
+    else:
+        columnar = read_schema(args.path)
+        print(f"Formato: {columnar['format']} v{columnar['version']} ({columnar['root']})")
+        for split, size in columnar['splits'].items():
+            print(f"  - {split}: {size:,} registros")
+        for field in columnar['schema']:
+            extra = f" ({len(field['categories'])} categorías)" if field['kind'] == 'categorical' else ""
+            print(f"    {field['name']}: {field['dtype']}{extra}")
+
+
+if __name__ == "__main__":
+    main()
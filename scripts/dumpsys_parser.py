@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parser de capturas dumpsys de TempoSage
+=======================================
+
+Convierte los volcados crudos que deja ``analizar_rendimiento.sh`` en
+``performance_reports/`` en una tabla tipada con una fila por captura:
+
+- ``memoria_*.txt`` (``dumpsys meminfo``): PSS por categoría, resumen de la app
+  (Java Heap, Native Heap, Graphics...) y totales PSS/RSS/Swap.
+- ``gfxinfo_*.txt`` (``dumpsys gfxinfo``): frames totales y lentos, contadores
+  de causas, histograma de tiempos de frame y percentiles p50/p90/p95/p99
+  (los informados por Android y los recalculados desde el histograma).
+- ``cpuinfo_*.txt`` (``dumpsys cpuinfo``): CPU de la app (usuario/kernel,
+  fallos de página), CPU total del sistema, carga y la lista por proceso
+  (``dumpsys cpuinfo`` no desglosa por hilo).
+- ``batterystats_*.txt`` (``dumpsys batterystats``): capacidad, descarga
+  calculada y real, descarga con pantalla encendida/apagada y consumo estimado
+  del UID de la app.
+
+Cada archivo se lee una sola vez línea a línea y los archivos se procesan en
+paralelo. Los volcados vacíos o con errores (``No process found``) producen
+valores nulos en lugar de fallar.
+
+Uso:
+    python scripts/dumpsys_parser.py
+    python scripts/dumpsys_parser.py --reports-dir performance_reports --workers 4
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+REPORTS_DIR = 'performance_reports'
+DEFAULT_PACKAGE = 'com.example.temposage'
+CAPTURE_FILE = re.compile(r'^(memoria|gfxinfo|cpuinfo|batterystats)_(\d{8}_\d{6})\.txt$')
+PERCENTILES = (50, 90, 95, 99)
+
+# Columnas fijas de la tabla de capturas y su tipo. Las columnas por categoría
+# de memoria (``mem_<categoria>_pss_kb``) se añaden dinámicamente como float64.
+CAPTURE_DTYPES = {
+    'fecha': 'string',
+    'timestamp': 'datetime64[ns]',
+    'pss_kb': 'Int64',
+    'rss_kb': 'Int64',
+    'swap_pss_kb': 'Int64',
+    'java_heap_kb': 'Int64',
+    'native_heap_kb': 'Int64',
+    'code_kb': 'Int64',
+    'stack_kb': 'Int64',
+    'graphics_kb': 'Int64',
+    'private_other_kb': 'Int64',
+    'system_kb': 'Int64',
+    'total_frames': 'Int64',
+    'janky_frames': 'Int64',
+    'janky_percent': 'float64',
+    'missed_vsync': 'Int64',
+    'high_input_latency': 'Int64',
+    'slow_ui_thread': 'Int64',
+    'slow_bitmap_uploads': 'Int64',
+    'slow_draw_commands': 'Int64',
+    'frame_deadline_missed': 'Int64',
+    **{f'frame_p{q}_ms': 'float64' for q in PERCENTILES},
+    **{f'reported_p{q}_ms': 'float64' for q in PERCENTILES},
+    **{f'gpu_p{q}_ms': 'float64' for q in PERCENTILES},
+    'cpu_percent': 'float64',
+    'cpu_user_percent': 'float64',
+    'cpu_kernel_percent': 'float64',
+    'cpu_minor_faults': 'Int64',
+    'cpu_major_faults': 'Int64',
+    'cpu_total_percent': 'float64',
+    'cpu_iowait_percent': 'float64',
+    'load_1m': 'float64',
+    'load_5m': 'float64',
+    'load_15m': 'float64',
+    'battery_capacity_mah': 'Int64',
+    'computed_drain_mah': 'float64',
+    'actual_drain_min_mah': 'float64',
+    'actual_drain_max_mah': 'float64',
+    'discharge_mah': 'Int64',
+    'screen_on_discharge_mah': 'Int64',
+    'screen_off_discharge_mah': 'Int64',
+    'app_uid': 'string',
+    'app_power_mah': 'float64',
+}
+
+# --- meminfo ---------------------------------------------------------------
+
+APP_SUMMARY = {
+    'Java Heap': 'java_heap_kb',
+    'Native Heap': 'native_heap_kb',
+    'Code': 'code_kb',
+    'Stack': 'stack_kb',
+    'Graphics': 'graphics_kb',
+    'Private Other': 'private_other_kb',
+    'System': 'system_kb',
+}
+MEM_ROW = re.compile(r'^\s*(\S.*?)\s+(\d+(?:\s+\d+)*)\s*$')
+MEM_SUMMARY = re.compile(r'^\s*([A-Za-z ]+):\s+(\d+)')
+MEM_TOTALS = re.compile(r'TOTAL (PSS|RSS|SWAP PSS):\s+(\d+)')
+
+# --- gfxinfo ---------------------------------------------------------------
+
+GFX_COUNTERS = {
+    'Total frames rendered': 'total_frames',
+    'Janky frames': 'janky_frames',
+    'Number Missed Vsync': 'missed_vsync',
+    'Number High input latency': 'high_input_latency',
+    'Number Slow UI thread': 'slow_ui_thread',
+    'Number Slow bitmap uploads': 'slow_bitmap_uploads',
+    'Number Slow issue draw commands': 'slow_draw_commands',
+    'Number Frame deadline missed': 'frame_deadline_missed',
+}
+GFX_COUNTER = re.compile(r'^([A-Za-z ]+):\s+(\d+)')
+GFX_PERCENTILE = re.compile(r'^(\d+)th (gpu )?percentile:\s+(\d+)ms')
+HISTOGRAM_BUCKET = re.compile(r'(\d+)ms=(\d+)')
+
+# --- cpuinfo ---------------------------------------------------------------
+
+CPU_PROCESS = re.compile(
+    r'^\s*\+?([\d.]+)% (\d+)/(.+?): ([\d.]+)% user \+ ([\d.]+)% kernel'
+    r'(?: / faults: (\d+) minor(?: (\d+) major)?)?')
+CPU_TOTAL = re.compile(r'^\s*([\d.]+)% TOTAL: ([\d.]+)% user \+ ([\d.]+)% kernel(?: \+ ([\d.]+)% iowait)?')
+CPU_LOAD = re.compile(r'^Load: ([\d.]+) / ([\d.]+) / ([\d.]+)')
+
+# --- batterystats ----------------------------------------------------------
+
+BATTERY_CAPACITY = re.compile(r'Capacity: (\d+),.*Computed drain: ([\d.]+), actual drain: ([\d.]+)(?:-([\d.]+))?')
+BATTERY_DISCHARGE = re.compile(r'^\s*(Discharge|Screen on discharge|Screen off discharge): (\d+) mAh')
+BATTERY_UID_POWER = re.compile(r'^\s*UID (\S+): ([\d.]+)')
+BATTERY_UID_SECTION = re.compile(r'^  (u\d+a\d+|\d+):$')
+BATTERY_DISCHARGE_COLUMNS = {
+    'Discharge': 'discharge_mah',
+    'Screen on discharge': 'screen_on_discharge_mah',
+    'Screen off discharge': 'screen_off_discharge_mah',
+}
+
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def _lines(path: str) -> Iterable[str]:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def parse_meminfo(path: str) -> Dict[str, Any]:
+    """``dumpsys meminfo <paquete>``: categorías, resumen de la app y totales."""
+    row: Dict[str, Any] = {}
+    categories: List[Dict[str, Any]] = []
+    header: Optional[List[str]] = None
+    previous: Tuple[str, str] = ('', '')
+    in_table = False
+    for line in _lines(path):
+        stripped = line.strip()
+        if header is None and stripped.startswith('------'):
+            # Las dos líneas previas son la cabecera: "Pss Private ..." / "Total Dirty ..."
+            first, second = previous[0].split(), previous[1].split()
+            if first and len(first) == len(second):
+                header = [_slug(f'{a} {b}') + '_kb' for a, b in zip(first, second)]
+                in_table = True
+            continue
+        if in_table:
+            match = MEM_ROW.match(line)
+            if match and match.group(1) != 'TOTAL':
+                values = [int(v) for v in match.group(2).split()]
+                categories.append({'category': match.group(1), **dict(zip(header, values))})
+                continue
+            in_table = False
+        match = MEM_SUMMARY.match(line)
+        if match and match.group(1).strip() in APP_SUMMARY:
+            row[APP_SUMMARY[match.group(1).strip()]] = int(match.group(2))
+        for label, value in MEM_TOTALS.findall(line):
+            row[{'PSS': 'pss_kb', 'RSS': 'rss_kb', 'SWAP PSS': 'swap_pss_kb'}[label]] = int(value)
+        previous = (previous[1], line)
+    for category in categories:
+        pss = category.get('pss_total_kb')
+        if pss is not None:
+            row[f"mem_{_slug(category['category'])}_pss_kb"] = float(pss)
+    return {'row': row, 'memory': categories}
+
+
+def histogram_percentiles(histogram: List[Tuple[int, int]],
+                          percentiles: Iterable[int] = PERCENTILES) -> Dict[int, float]:
+    """Percentiles de tiempo de frame (ms) a partir de los buckets ``(ms, frames)``."""
+    if not histogram:
+        return {q: np.nan for q in percentiles}
+    buckets = np.array([ms for ms, _ in histogram], dtype=np.float64)
+    counts = np.cumsum([count for _, count in histogram])
+    total = counts[-1]
+    if total == 0:
+        return {q: np.nan for q in percentiles}
+    # Igual que Android: primer bucket cuya frecuencia acumulada alcanza el percentil
+    return {q: float(buckets[np.searchsorted(counts, total * q / 100.0)]) for q in percentiles}
+
+
+def parse_gfxinfo(path: str) -> Dict[str, Any]:
+    """``dumpsys gfxinfo <paquete>``: contadores, histograma y percentiles de frame."""
+    row: Dict[str, Any] = {}
+    histogram: List[Tuple[int, int]] = []
+    for line in _lines(path):
+        if line.startswith('HISTOGRAM:'):
+            histogram = [(int(ms), int(count)) for ms, count in HISTOGRAM_BUCKET.findall(line)]
+            continue
+        match = GFX_PERCENTILE.match(line)
+        if match:
+            prefix = 'gpu' if match.group(2) else 'reported'
+            row[f'{prefix}_p{match.group(1)}_ms'] = float(match.group(3))
+            continue
+        match = GFX_COUNTER.match(line)
+        if match and match.group(1) in GFX_COUNTERS:
+            row.setdefault(GFX_COUNTERS[match.group(1)], int(match.group(2)))
+    computed = histogram_percentiles(histogram)
+    for q in PERCENTILES:
+        row[f'frame_p{q}_ms'] = computed[q]
+    if not row.get('total_frames'):
+        # Sin frames, Android informa el bucket máximo (4950 ms): no es un dato real
+        for key in [k for k in row if k.startswith(('reported_p', 'gpu_p'))]:
+            row[key] = np.nan
+    if row.get('total_frames'):
+        row['janky_percent'] = 100.0 * row.get('janky_frames', 0) / row['total_frames']
+    return {'row': row, 'histogram': histogram}
+
+
+def parse_cpuinfo(path: str, package: str = DEFAULT_PACKAGE) -> Dict[str, Any]:
+    """``dumpsys cpuinfo``: CPU de la app, total del sistema, carga y lista por proceso."""
+    row: Dict[str, Any] = {}
+    processes: List[Dict[str, Any]] = []
+    for line in _lines(path):
+        match = CPU_PROCESS.match(line)
+        if match:
+            total, pid, name, user, kernel, minor, major = match.groups()
+            processes.append({
+                'pid': int(pid), 'process': name, 'cpu_percent': float(total),
+                'user_percent': float(user), 'kernel_percent': float(kernel),
+                'minor_faults': int(minor) if minor else 0, 'major_faults': int(major) if major else 0,
+            })
+            if name == package and 'cpu_percent' not in row:
+                row.update({
+                    'cpu_percent': float(total), 'cpu_user_percent': float(user),
+                    'cpu_kernel_percent': float(kernel),
+                    'cpu_minor_faults': int(minor) if minor else 0,
+                    'cpu_major_faults': int(major) if major else 0,
+                })
+            continue
+        match = CPU_TOTAL.match(line)
+        if match:
+            row['cpu_total_percent'] = float(match.group(1))
+            if match.group(4):
+                row['cpu_iowait_percent'] = float(match.group(4))
+            continue
+        match = CPU_LOAD.match(line)
+        if match:
+            row['load_1m'], row['load_5m'], row['load_15m'] = map(float, match.groups())
+    if processes and 'cpu_percent' not in row:
+        # La app no aparece en la ventana medida: no consumió CPU
+        row.update({'cpu_percent': 0.0, 'cpu_user_percent': 0.0, 'cpu_kernel_percent': 0.0})
+    return {'row': row, 'processes': processes}
+
+
+def parse_batterystats(path: str, package: str = DEFAULT_PACKAGE) -> Dict[str, Any]:
+    """``dumpsys batterystats <paquete>``: descarga del dispositivo y consumo del UID de la app."""
+    row: Dict[str, Any] = {}
+    uid_power: Dict[str, float] = {}
+    section = None
+    app_uid = None
+    for line in _lines(path):
+        match = BATTERY_UID_SECTION.match(line)
+        if match:
+            section = match.group(1)
+            continue
+        if section is not None and app_uid is None and line.strip() == f'Proc {package}:':
+            app_uid = section
+            continue
+        match = BATTERY_UID_POWER.match(line)
+        if match:
+            uid_power.setdefault(match.group(1), float(match.group(2)))
+            continue
+        match = BATTERY_DISCHARGE.match(line)
+        if match:
+            row.setdefault(BATTERY_DISCHARGE_COLUMNS[match.group(1)], int(match.group(2)))
+            continue
+        match = BATTERY_CAPACITY.search(line)
+        if match and 'battery_capacity_mah' not in row:
+            capacity, computed, low, high = match.groups()
+            row['battery_capacity_mah'] = int(capacity)
+            row['computed_drain_mah'] = float(computed)
+            row['actual_drain_min_mah'] = float(low)
+            row['actual_drain_max_mah'] = float(high or low)
+    if app_uid is not None:
+        row['app_uid'] = app_uid
+        row['app_power_mah'] = uid_power.get(app_uid, 0.0)
+    return {'row': row}
+
+
+def _parse_file(task: Tuple[str, str, str, str]) -> Tuple[str, str, Dict[str, Any]]:
+    kind, fecha, path, package = task
+    if kind == 'memoria':
+        result = parse_meminfo(path)
+    elif kind == 'gfxinfo':
+        result = parse_gfxinfo(path)
+    elif kind == 'cpuinfo':
+        result = parse_cpuinfo(path, package)
+    else:
+        result = parse_batterystats(path, package)
+    return kind, fecha, result
+
+
+def discover_captures(reports_dir: str = REPORTS_DIR) -> List[Tuple[str, str, str]]:
+    """``(tipo, fecha, ruta)`` de los volcados con nombre ``<tipo>_AAAAMMDD_HHMMSS.txt``."""
+    captures = []
+    for name in sorted(os.listdir(reports_dir)):
+        match = CAPTURE_FILE.match(name)
+        if match:
+            captures.append((match.group(1), match.group(2), os.path.join(reports_dir, name)))
+    return captures
+
+
+def capture_table(rows: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Tabla de capturas con los tipos de ``CAPTURE_DTYPES`` a partir de filas ``dict``."""
+    captures = pd.DataFrame(list(rows))
+    if 'fecha' not in captures:
+        captures['fecha'] = pd.Series(dtype='string')
+    captures = captures.reindex(columns=list(CAPTURE_DTYPES) + sorted(
+        c for c in captures.columns if c not in CAPTURE_DTYPES))
+    captures['timestamp'] = pd.to_datetime(captures['fecha'], format='%Y%m%d_%H%M%S')
+    return captures.astype({**CAPTURE_DTYPES, **{
+        c: 'float64' for c in captures.columns if c not in CAPTURE_DTYPES}})
+
+
+def parse_files(files: Iterable[Tuple[str, str, str]], package: str = DEFAULT_PACKAGE,
+                workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """Procesa en paralelo los volcados ``(tipo, fecha, ruta)`` indicados.
+
+    Devuelve ``captures`` (una fila tipada por captura) y las tablas de detalle
+    ``memory``, ``frame_histogram`` y ``cpu_processes`` en formato largo.
+    """
+    tasks = [(kind, fecha, path, package) for kind, fecha, path in files]
+    workers = workers or min(len(tasks), os.cpu_count() or 1) or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_parse_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_parse_file(task) for task in tasks]
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    memory, histogram, processes = [], [], []
+    for kind, fecha, result in results:
+        rows.setdefault(fecha, {'fecha': fecha}).update(result['row'])
+        memory += [{'fecha': fecha, **item} for item in result.get('memory', [])]
+        histogram += [{'fecha': fecha, 'frame_ms': ms, 'frames': count} for ms, count in result.get('histogram', [])]
+        processes += [{'fecha': fecha, **item} for item in result.get('processes', [])]
+
+    return {
+        'captures': capture_table(rows[fecha] for fecha in sorted(rows)),
+        'memory': pd.DataFrame(memory),
+        'frame_histogram': pd.DataFrame(histogram, columns=['fecha', 'frame_ms', 'frames']).astype(
+            {'frame_ms': 'int32', 'frames': 'int64'}),
+        'cpu_processes': pd.DataFrame(processes),
+    }
+
+
+def parse_captures(reports_dir: str = REPORTS_DIR, package: str = DEFAULT_PACKAGE,
+                   workers: Optional[int] = None, fechas: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    """Procesa los volcados de ``reports_dir`` (solo los de ``fechas`` si se indica).
+
+    Para consultas repetidas usa el historial de ``performance_history.py``,
+    que guarda las filas ya procesadas y solo analiza los volcados nuevos.
+    """
+    wanted = set(fechas) if fechas is not None else None
+    files = [(kind, fecha, path) for kind, fecha, path in discover_captures(reports_dir)
+             if wanted is None or fecha in wanted]
+    return parse_files(files, package, workers)
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Extrae métricas de los volcados dumpsys de TempoSage")
+    parser.add_argument('--reports-dir', default=REPORTS_DIR)
+    parser.add_argument('--package', default=DEFAULT_PACKAGE)
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directorio de salida de las tablas CSV (por defecto, <reports-dir>/metricas)")
+    args = parser.parse_args()
+
+    tables = parse_captures(args.reports_dir, args.package, args.workers)
+    captures = tables['captures']
+    if captures.empty:
+        print(f"No se encontraron volcados dumpsys en {args.reports_dir}")
+        return
+
+    output_dir = args.output_dir or os.path.join(args.reports_dir, 'metricas')
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in tables.items():
+        table.to_csv(os.path.join(output_dir, f'{name}.csv'), index=False)
+
+    columns = ['fecha', 'pss_kb', 'java_heap_kb', 'cpu_percent', 'total_frames',
+               'janky_percent', 'frame_p50_ms', 'frame_p95_ms', 'frame_p99_ms', 'app_power_mah']
+    print(f"✅ {len(captures)} capturas procesadas")
+    print(captures[columns].to_string(index=False))
+    print(f"Tablas guardadas en {output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
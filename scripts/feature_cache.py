@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Caché de features precalculadas del dataset unificado de TempoSage
+==================================================================
+
+Cada entrenamiento del modelo multitarea reconstruía las mismas entradas a
+partir de ``temposage_unified_training_dataset.csv`` y ``dataset_metadata.json``:
+codificación de ``activity_category``, ``weather_condition`` y
+``location_type``, normalización de las columnas numéricas y selección de los
+objetivos de las 5 tareas. Este módulo lo calcula una sola vez y lo guarda en
+arrays ``.npy``. Acepta tanto la salida de
+``generate_perfect_training_dataset.py`` (``temposage_full_dataset.csv``) como
+CSVs con los nombres heredados ``user_*``/``habit_*`` (ver ``COLUMN_ALIASES``):
+
+    <cache>/<clave>/features.npy          float32 [N, F]  numéricas normalizadas (+ one-hot)
+    <cache>/<clave>/categorical.npy       int16   [N, C]  índices (solo con codificación 'index')
+    <cache>/<clave>/targets_<tarea>.npy   float32 [N, k]  objetivos de regresión/probabilidad
+    <cache>/<clave>/labels_<tarea>.npy    int16   [N, c]  clases (solo tareas con clasificación)
+    <cache>/<clave>/manifest.json         nombres de columnas, estadísticas y configuración
+
+La clave es un hash del contenido del CSV, de los vocabularios tomados de los
+metadatos y de la configuración de codificación: si cualquiera cambia, la
+clave cambia y la caché se reconstruye sola. El hash del CSV se memoriza por
+tamaño y fecha de modificación, así que un arranque con la caché válida solo
+abre los arrays con ``mmap_mode='r'``.
+
+Uso:
+    python scripts/feature_cache.py build
+    python scripts/feature_cache.py build --encoding index --normalization minmax
+    python scripts/feature_cache.py info
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CSV = os.path.join("data", "temposage_unified_training_dataset.csv")
+DEFAULT_METADATA = os.path.join("data", "dataset_metadata.json")
+DEFAULT_CACHE_DIR = os.path.join("data", "feature_cache")
+CACHE_VERSION = 1
+
+# Columnas categóricas de entrada y la clave de dataset_metadata.json con su vocabulario
+CATEGORICAL_FEATURES = {
+    'activity_category': 'categories',
+    'weather_condition': 'weather_conditions',
+    'location_type': 'locations',
+}
+
+# Nombres de columnas de ``generate_perfect_training_dataset.py`` (los de
+# ``dataset_metadata.json``). El CSV unificado heredado usa prefijos
+# ``user_``/``habit_`` en algunas; ``COLUMN_ALIASES`` las traduce al leer.
+NUMERIC_FEATURES = [
+    # Temporales
+    'weekday', 'hour_of_day', 'day_of_year', 'month', 'is_weekend', 'is_holiday', 'season',
+    'time_since_last_activity',
+    # Usuario
+    'energy_level', 'mood', 'stress_level', 'focus_capacity',
+    'sleep_quality', 'exercise_level', 'social_interaction',
+    # Actividad
+    'activity_priority', 'activity_duration', 'activity_complexity', 'activity_energy_required',
+    'activity_focus_required', 'activity_deadline_pressure',
+    # Hábito
+    'streak', 'frequency', 'success_rate', 'days_since_last_completion',
+    'difficulty', 'importance', 'time_consistency',
+    # Históricas
+    'completion_rate_last_week', 'completion_rate_last_month', 'productivity_score_last_week',
+    'productivity_score_last_month', 'optimal_time_blocks_morning', 'optimal_time_blocks_afternoon',
+    'optimal_time_blocks_evening', 'energy_patterns_peak', 'energy_patterns_low',
+    'focus_patterns_peak', 'focus_patterns_low',
+    # Contexto
+    'device_usage_pattern', 'social_context', 'work_context', 'study_context', 'personal_context',
+]
+
+COLUMN_ALIASES = {
+    'user_energy_level': 'energy_level',
+    'user_mood': 'mood',
+    'user_stress_level': 'stress_level',
+    'user_focus_capacity': 'focus_capacity',
+    'user_sleep_quality': 'sleep_quality',
+    'user_exercise_level': 'exercise_level',
+    'user_social_interaction': 'social_interaction',
+    'habit_streak': 'streak',
+    'habit_frequency': 'frequency',
+    'habit_success_rate': 'success_rate',
+    'habit_difficulty': 'difficulty',
+    'habit_importance': 'importance',
+    'habit_time_consistency': 'time_consistency',
+}
+
+# Objetivos de cada tarea (ver docs/MODELO_ML_OPTIMO_TEMPOSAGE.md). Las columnas
+# de ``labels`` son categóricas y se guardan como índice de su vocabulario.
+TASK_TARGETS = {
+    'activity_recommendation': {
+        'targets': ['activity_completed', 'activity_success_probability', 'optimal_activity_time',
+                    'activity_duration_predicted', 'energy_required_predicted',
+                    'focus_required_predicted', 'deadline_pressure_predicted'],
+    },
+    'habit_success_prediction': {
+        'targets': ['habit_completed', 'habit_success_probability', 'optimal_habit_time',
+                    'habit_duration_predicted', 'streak_maintenance_probability'],
+    },
+    'timeblock_optimization': {
+        'targets': ['timeblock_completed', 'timeblock_efficiency', 'timeblock_priority_score',
+                    'timeblock_optimization_score'],
+    },
+    'energy_level_prediction': {
+        'targets': ['energy_level_predicted', 'fatigue_probability', 'optimal_break_time',
+                    'energy_peak_time', 'focus_peak_time', 'productivity_peak_time', 'rest_optimal_time'],
+    },
+    'productivity_pattern_recognition': {
+        'targets': ['burnout_risk'],
+        'labels': {'productivity_pattern': 'productivity_patterns',
+                   'recommendation_type': 'recommendation_types'},
+    },
+}
+
+DEFAULT_CONFIG = {
+    'encoding': 'onehot',          # 'onehot' (en features.npy) o 'index' (categorical.npy)
+    'normalization': 'zscore',     # 'zscore', 'minmax' o 'none'
+    'numeric_features': NUMERIC_FEATURES,
+    'categorical_features': list(CATEGORICAL_FEATURES),
+    'tasks': TASK_TARGETS,
+}
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def source_sha256(csv_path: str, cache_dir: str = DEFAULT_CACHE_DIR, persist: bool = True) -> str:
+    """Hash del CSV, reutilizado mientras no cambien su tamaño ni su fecha de modificación.
+
+    Con ``persist=False`` no actualiza ``sources.json`` (consultas de solo lectura).
+    """
+    index_path = os.path.join(cache_dir, 'sources.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    key = os.path.abspath(csv_path)
+    signature = _source_signature(csv_path)
+    entry = index.get(key)
+    if entry and entry['signature'] == signature:
+        return entry['sha256']
+    digest = _file_sha256(csv_path)
+    if not persist:
+        return digest
+    index[key] = {'signature': signature, 'sha256': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_path + '.tmp', index_path)
+    return digest
+
+
+def resolve_config(metadata_path: str = DEFAULT_METADATA, config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Configuración completa con los vocabularios de ``dataset_metadata.json`` resueltos."""
+    config = json.loads(json.dumps({**DEFAULT_CONFIG, **(config or {})}))
+    if config['encoding'] not in ('onehot', 'index'):
+        raise ValueError(f"Codificación desconocida: {config['encoding']}")
+    if config['normalization'] not in ('zscore', 'minmax', 'none'):
+        raise ValueError(f"Normalización desconocida: {config['normalization']}")
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    sources = dict(CATEGORICAL_FEATURES)
+    for task in config['tasks'].values():
+        sources.update(task.get('labels', {}))
+    config['vocabularies'] = {}
+    for column in config['categorical_features'] + [c for t in config['tasks'].values() for c in t.get('labels', {})]:
+        vocabulary = metadata.get(sources.get(column, ''))
+        if not vocabulary:
+            raise KeyError(f"dataset_metadata.json no tiene vocabulario para '{column}'")
+        config['vocabularies'][column] = list(vocabulary)
+    return config
+
+
+def cache_key(source_digest: str, config: Dict[str, Any]) -> str:
+    """Clave de la caché: versión, contenido del CSV y configuración resuelta."""
+    payload = json.dumps({'version': CACHE_VERSION, 'source': source_digest, 'config': config},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _codes(values: pd.Series, vocabulary: List[str], column: str) -> np.ndarray:
+    codes = pd.Categorical(values.astype(str), categories=vocabulary).codes
+    if (codes < 0).any():
+        unknown = sorted(set(values[codes < 0].astype(str)))
+        raise ValueError(f"Valores fuera del vocabulario de '{column}': {unknown[:5]}")
+    return codes.astype(np.int16)
+
+
+def required_columns(config: Dict[str, Any]) -> List[str]:
+    """Columnas canónicas que necesita ``build_cache`` con ``config``."""
+    columns = list(config['numeric_features']) + list(config['categorical_features'])
+    for spec in config['tasks'].values():
+        columns += spec['targets'] + list(spec.get('labels', {}))
+    return list(dict.fromkeys(columns))
+
+
+def source_columns(csv_path: str, columns: List[str], sample_rows: int = 1000) -> Dict[str, str]:
+    """``{columna del CSV: nombre canónico}`` para cada una de ``columns``.
+
+    Antes comprueba que las primeras filas tengan tantos campos como la
+    cabecera: con campos de más, pandas usaría los primeros como índice y
+    desplazaría el resto de columnas sin avisar.
+    """
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"{csv_path} no tiene cabecera")
+        for number, row in enumerate(itertools.islice(reader, sample_rows), start=1):
+            if row and len(row) != len(header):
+                raise ValueError(f"{csv_path} está mal formado: el registro {number} tiene {len(row)} "
+                                 f"campos y la cabecera {len(header)}")
+    present = set(header)
+    mapping = {}
+    for name in header:
+        canonical = COLUMN_ALIASES.get(name, name)
+        if canonical in columns and (canonical == name or canonical not in present):
+            mapping[name] = canonical
+    missing = [column for column in columns if column not in mapping.values()]
+    if missing:
+        raise ValueError(f"A {csv_path} le faltan {len(missing)} columnas: {', '.join(missing)}")
+    return mapping
+
+
+def _numeric_stats(csv_path: str, columns: List[str], mapping: Dict[str, str],
+                   chunk_size: int) -> Dict[str, Any]:
+    """Primer recorrido: filas y estadísticas (media, desviación, mínimo, máximo) en float64."""
+    rows = 0
+    total = np.zeros(len(columns))
+    squares = np.zeros(len(columns))
+    low = np.full(len(columns), np.inf)
+    high = np.full(len(columns), -np.inf)
+    usecols = [name for name, column in mapping.items() if column in columns]
+    for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunk_size):
+        values = chunk.rename(columns=mapping)[columns].to_numpy(dtype=np.float64)
+        rows += len(values)
+        total += values.sum(axis=0)
+        squares += np.square(values).sum(axis=0)
+        low = np.minimum(low, values.min(axis=0))
+        high = np.maximum(high, values.max(axis=0))
+    mean = total / max(rows, 1)
+    std = np.sqrt(np.maximum(squares / max(rows, 1) - np.square(mean), 0.0))
+    return {'rows': rows, 'mean': mean, 'std': std, 'min': low, 'max': high}
+
+
+def _scaling(stats: Dict[str, Any], normalization: str):
+    """``(desplazamiento, escala)`` por columna; las constantes no se escalan."""
+    if normalization == 'zscore':
+        offset, scale = stats['mean'], stats['std']
+    elif normalization == 'minmax':
+        offset, scale = stats['min'], stats['max'] - stats['min']
+    else:
+        offset, scale = np.zeros_like(stats['mean']), np.ones_like(stats['mean'])
+    return offset, np.where(scale > 0, scale, 1.0)
+
+
+def build_cache(csv_path: str, config: Dict[str, Any], output_dir: str,
+                chunk_size: int = 100000) -> Dict[str, Any]:
+    """Calcula features y objetivos por fragmentos sobre arrays ``.npy`` preasignados."""
+    numeric = config['numeric_features']
+    categorical = config['categorical_features']
+    vocabularies = config['vocabularies']
+    mapping = source_columns(csv_path, required_columns(config))
+    stats = _numeric_stats(csv_path, numeric, mapping, chunk_size)
+    offset, scale = _scaling(stats, config['normalization'])
+    rows = stats['rows']
+
+    feature_names = list(numeric)
+    if config['encoding'] == 'onehot':
+        feature_names += [f'{column}={value}' for column in categorical for value in vocabularies[column]]
+
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {'features': np.lib.format.open_memmap(
+        os.path.join(tmp_dir, 'features.npy'), mode='w+', dtype=np.float32, shape=(rows, len(feature_names)))}
+    if config['encoding'] == 'index':
+        arrays['categorical'] = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, 'categorical.npy'), mode='w+', dtype=np.int16, shape=(rows, len(categorical)))
+    for task, spec in config['tasks'].items():
+        arrays[f'targets_{task}'] = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, f'targets_{task}.npy'), mode='w+', dtype=np.float32,
+            shape=(rows, len(spec['targets'])))
+        if spec.get('labels'):
+            arrays[f'labels_{task}'] = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, f'labels_{task}.npy'), mode='w+', dtype=np.int16,
+                shape=(rows, len(spec['labels'])))
+
+    start = 0
+    for chunk in pd.read_csv(csv_path, usecols=list(mapping), chunksize=chunk_size):
+        chunk = chunk.rename(columns=mapping)
+        end = start + len(chunk)
+        features = arrays['features']
+        features[start:end, :len(numeric)] = (chunk[numeric].to_numpy(dtype=np.float64) - offset) / scale
+        codes = {column: _codes(chunk[column], vocabularies[column], column) for column in categorical}
+        if config['encoding'] == 'onehot':
+            column_start = len(numeric)
+            for column in categorical:
+                size = len(vocabularies[column])
+                block = np.zeros((len(chunk), size), dtype=np.float32)
+                block[np.arange(len(chunk)), codes[column]] = 1.0
+                features[start:end, column_start:column_start + size] = block
+                column_start += size
+        else:
+            arrays['categorical'][start:end] = np.stack([codes[column] for column in categorical], axis=1)
+        for task, spec in config['tasks'].items():
+            arrays[f'targets_{task}'][start:end] = chunk[spec['targets']].to_numpy(dtype=np.float32)
+            if spec.get('labels'):
+                arrays[f'labels_{task}'][start:end] = np.stack(
+                    [_codes(chunk[column], vocabularies[column], column) for column in spec['labels']], axis=1)
+        start = end
+    for array in arrays.values():
+        array.flush()
+    arrays.clear()
+
+    manifest = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(csv_path),
+        'rows': rows,
+        'config': config,
+        'feature_names': feature_names,
+        'categorical_names': categorical if config['encoding'] == 'index' else [],
+        'normalization': {
+            'columns': numeric,
+            'offset': offset.tolist(),
+            'scale': scale.tolist(),
+        },
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return manifest
+
+
+class FeatureSet:
+    """Features y objetivos de una entrada de la caché, abiertos con mmap."""
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        mode = 'r' if mmap else None
+        self.features = np.load(os.path.join(path, 'features.npy'), mmap_mode=mode)
+        categorical_path = os.path.join(path, 'categorical.npy')
+        self.categorical = np.load(categorical_path, mmap_mode=mode) if os.path.exists(categorical_path) else None
+        self.targets = {}
+        self.labels = {}
+        for task, spec in self.manifest['config']['tasks'].items():
+            self.targets[task] = np.load(os.path.join(path, f'targets_{task}.npy'), mmap_mode=mode)
+            if spec.get('labels'):
+                self.labels[task] = np.load(os.path.join(path, f'labels_{task}.npy'), mmap_mode=mode)
+
+    def __len__(self) -> int:
+        return self.manifest['rows']
+
+    @property
+    def key(self) -> str:
+        return os.path.basename(os.path.normpath(self.path))
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.manifest['feature_names']
+
+    def target_names(self, task: str) -> List[str]:
+        return self.manifest['config']['tasks'][task]['targets']
+
+
+def find_features(csv_path: str = DEFAULT_CSV, metadata_path: str = DEFAULT_METADATA,
+                  config: Dict[str, Any] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                  mmap: bool = True) -> Optional[FeatureSet]:
+    """Entrada válida de la caché para ``csv_path`` o ``None``, sin escribir nada."""
+    resolved = resolve_config(metadata_path, config)
+    path = os.path.join(cache_dir, cache_key(source_sha256(csv_path, cache_dir, persist=False), resolved))
+    if not os.path.exists(os.path.join(path, 'manifest.json')):
+        return None
+    return FeatureSet(path, mmap)
+
+
+def _remove_stale(cache_dir: str, csv_path: str, config: Dict[str, Any], key: str):
+    """Borra las entradas de versiones anteriores de ``csv_path`` con la misma configuración.
+
+    Las de otros CSVs o de otras codificaciones del mismo CSV se quedan.
+    """
+    source = os.path.abspath(csv_path)
+    for name in os.listdir(cache_dir):
+        manifest_path = os.path.join(cache_dir, name, 'manifest.json')
+        if name == key or not os.path.exists(manifest_path):
+            continue
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('source') != source or manifest.get('config') != config:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def load_features(csv_path: str = DEFAULT_CSV, metadata_path: str = DEFAULT_METADATA,
+                  config: Dict[str, Any] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                  rebuild: bool = False, keep_stale: bool = False, mmap: bool = True) -> FeatureSet:
+    """Devuelve las features de ``csv_path``, calculándolas solo si la caché no es válida.
+
+    Al reconstruir se borran las entradas de versiones anteriores de este
+    mismo CSV con la misma configuración salvo con ``keep_stale=True``; las de
+    otros CSVs u otras configuraciones no se tocan.
+    """
+    resolved = resolve_config(metadata_path, config)
+    key = cache_key(source_sha256(csv_path, cache_dir), resolved)
+    path = os.path.join(cache_dir, key)
+    if rebuild or not os.path.exists(os.path.join(path, 'manifest.json')):
+        build_cache(csv_path, resolved, path)
+        if not keep_stale:
+            _remove_stale(cache_dir, csv_path, resolved, key)
+    return FeatureSet(path, mmap)
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Caché de features del dataset unificado de TempoSage")
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--metadata', default=DEFAULT_METADATA)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--encoding', choices=['onehot', 'index'], default=DEFAULT_CONFIG['encoding'])
+    parser.add_argument('--normalization', choices=['zscore', 'minmax', 'none'],
+                        default=DEFAULT_CONFIG['normalization'])
+    parser.add_argument('--rebuild', action='store_true', help="Recalcula aunque la caché sea válida")
+    parser.add_argument('--keep-stale', action='store_true', help="No borra las entradas obsoletas")
+    args = parser.parse_args()
+
+    config = {'encoding': args.encoding, 'normalization': args.normalization}
+    if args.command == 'info':
+        feature_set = find_features(args.csv, args.metadata, config, args.cache_dir)
+        if feature_set is None:
+            print(f"❌ No hay caché de features de {args.csv} ({args.encoding}, {args.normalization}) "
+                  f"en {args.cache_dir}; créala con 'build'")
+            raise SystemExit(1)
+    else:
+        feature_set = load_features(args.csv, args.metadata, config, args.cache_dir,
+                                    rebuild=args.rebuild, keep_stale=args.keep_stale)
+    print(f"✅ Caché de features {feature_set.key} en {feature_set.path}")
+    print(f"  - Registros: {len(feature_set):,}")
+    print(f"  - Features: {feature_set.features.shape[1]} ({args.encoding}, {args.normalization})")
+    if feature_set.categorical is not None:
+        print(f"  - Categóricas (índice): {', '.join(feature_set.manifest['categorical_names'])}")
+    for task, targets in feature_set.targets.items():
+        labels = feature_set.labels.get(task)
+        extra = f" + {labels.shape[1]} etiquetas" if labels is not None else ""
+        print(f"  - {task}: {targets.shape[1]} objetivos{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,21 +15,72 @@ Características del Dataset:
 - Distribución balanceada de categorías y patrones
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
+
+from dataset_columnar import AppendJournal, ColumnarWriter, append_columnar, write_columnar
+from generator_profiling import NullProfiler, StageProfiler, compare_profiles
 import warnings
 warnings.filterwarnings('ignore')
 
+# Fin de la ventana temporal por defecto (UTC): misma fecha que el dataset incluido
+DEFAULT_REFERENCE_DATE = '2025-10-20'
+SECONDS_PER_DAY = 24 * 3600
+TIME_WINDOW_SECONDS = 365 * SECONDS_PER_DAY
+
+
+def reference_timestamp(date: str) -> int:
+    """``'AAAA-MM-DD'`` (o ISO con hora) -> segundos epoch UTC."""
+    return int(np.datetime64(date, 's').astype(np.int64))
+
+
+def calendar_features(timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+    """Deriva los campos de calendario de segundos epoch (UTC) con aritmética vectorizada.
+
+    No crea objetos ``datetime``: día de la semana y hora salen de divisiones
+    enteras y mes/día del año de ``datetime64`` truncado a año y mes.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    days = timestamps // SECONDS_PER_DAY
+    weekday = (days + 3) % 7  # 1970-01-01 fue jueves; 0 = lunes
+    day_dates = days.astype('datetime64[D]')
+    years = day_dates.astype('datetime64[Y]')
+    month = (day_dates.astype('datetime64[M]') - years.astype('datetime64[M]')).astype(np.int64) + 1
+    return {
+        'weekday': weekday,
+        'hour_of_day': (timestamps % SECONDS_PER_DAY) // 3600,
+        'day_of_year': (day_dates - years.astype('datetime64[D]')).astype(np.int64) + 1,
+        'month': month,
+        'is_weekend': (weekday >= 5).astype(np.int64),
+        'season': (month - 1) // 3,
+    }
+
 class TempoSageDatasetGenerator:
-    def __init__(self, seed: int = 42):
-        """Inicializa el generador de dataset con semilla para reproducibilidad."""
+    def __init__(self, seed: int = 42, reference_date: str = DEFAULT_REFERENCE_DATE):
+        """Inicializa el generador de dataset con semilla para reproducibilidad.
+
+        ``reference_date`` fija el final de la ventana de un año de la que se
+        muestrean los timestamps, de modo que la misma semilla y la misma fecha
+        producen exactamente el mismo dataset.
+        """
         np.random.seed(seed)
         random.seed(seed)
+        self.seed = seed
+        # Generador independiente para el modo columnar (no depende del estado global)
+        self.rng = np.random.default_rng(seed)
+        # Fin de la ventana temporal, fijo para todos los registros, lotes y fragmentos
+        self.reference_timestamp = reference_timestamp(reference_date)
+        # Instrumentación por etapas (ver enable_profiling)
+        self.profiler = NullProfiler()
+        self._profiled_methods = []
         
         # Configuración del dataset
         self.total_records = 65000  # 50k train + 10k val + 5k test
@@ -60,11 +111,71 @@ class TempoSageDatasetGenerator:
             'Actividad', 'Hábito', 'TimeBlock', 'Descanso', 'Optimización'
         ]
         
+        # Títulos y descripciones por categoría
+        self.activity_templates = {
+            'Trabajo': [
+                ('Reunión de planificación', 'Reunión para planificar objetivos y tareas'),
+                ('Análisis de datos', 'Análisis detallado de métricas y tendencias'),
+                ('Seguimiento de proyectos', 'Revisión del progreso y seguimiento'),
+                ('Finalizar informe', 'Completar y revisar informe'),
+                ('Revisar tareas pendientes', 'Revisión y organización de tareas')
+            ],
+            'Estudio': [
+                ('Estudiar conceptos teóricos', 'Estudio de conceptos teóricos para examen'),
+                ('Continuar lecturas', 'Continuación de lecturas obligatorias'),
+                ('Repasar contenido', 'Repaso intensivo para examen'),
+                ('Investigación para proyecto', 'Investigación profunda para proyecto'),
+                ('Preparación para clases', 'Preparación de material para clases')
+            ],
+            'Salud': [
+                ('Rutina de ejercicio cardiovascular', 'Entrenamiento cardiovascular'),
+                ('Entrenamiento de fuerza', 'Entrenamiento de fuerza y musculación'),
+                ('Yoga y estiramiento', 'Sesión de yoga y estiramientos'),
+                ('Entrenamiento completo', 'Entrenamiento intensivo'),
+                ('Caminata de recuperación', 'Caminata suave de recuperación')
+            ],
+            'Hogar': [
+                ('Limpieza de cocina y baño', 'Limpieza profunda de cocina y baños'),
+                ('Organización de armarios', 'Organización y limpieza de armarios'),
+                ('Limpieza general', 'Limpieza general y profunda'),
+                ('Preparación de comidas', 'Preparación de comidas para la semana'),
+                ('Mantenimiento del hogar', 'Tareas de mantenimiento y reparación')
+            ],
+            'Finanzas': [
+                ('Revisión de gastos', 'Revisión y análisis de gastos'),
+                ('Pago de facturas', 'Pago de facturas mensuales'),
+                ('Planificación financiera', 'Planificación financiera mensual'),
+                ('Inversiones', 'Revisión y análisis de inversiones'),
+                ('Presupuesto', 'Elaboración y revisión de presupuesto')
+            ]
+        }
+        
         # Patrones temporales realistas
         self.energy_patterns = self._generate_energy_patterns()
         self.focus_patterns = self._generate_focus_patterns()
         self.optimal_time_blocks = self._generate_optimal_time_blocks()
         
+    # Etapas medidas por enable_profiling
+    PROFILED_METHODS = [
+        '_generate_user_context', '_generate_activity_features', '_generate_habit_features',
+        '_generate_temporal_features', '_generate_historical_features',
+        '_generate_contextual_features', '_generate_targets', 'generate_batch',
+    ]
+
+    def enable_profiling(self, memory: bool = True, cprofile: bool = False) -> StageProfiler:
+        """Activa la medición de tiempo y memoria por etapa y devuelve el perfilador."""
+        self.profiler = StageProfiler(memory=memory, cprofile=cprofile)
+        self.profiler.instrument(self, self.PROFILED_METHODS)
+        self._profiled_methods = list(self.PROFILED_METHODS)
+        return self.profiler
+
+    def __getstate__(self):
+        # Los procesos del pool reciben el generador sin perfilador ni métodos envueltos
+        state = {k: v for k, v in self.__dict__.items() if k not in self._profiled_methods}
+        state['profiler'] = NullProfiler()
+        state['_profiled_methods'] = []
+        return state
+
     def _generate_energy_patterns(self) -> Dict[str, List[float]]:
         """Genera patrones de energía realistas por hora del día."""
         patterns = {
@@ -114,48 +225,9 @@ class TempoSageDatasetGenerator:
     
     def _generate_activity_features(self, category: str) -> Dict[str, Any]:
         """Genera características de actividad basadas en la categoría."""
-        # Títulos y descripciones por categoría
-        activity_templates = {
-            'Trabajo': [
-                ('Reunión de planificación', 'Reunión para planificar objetivos y tareas'),
-                ('Análisis de datos', 'Análisis detallado de métricas y tendencias'),
-                ('Seguimiento de proyectos', 'Revisión del progreso y seguimiento'),
-                ('Finalizar informe', 'Completar y revisar informe'),
-                ('Revisar tareas pendientes', 'Revisión y organización de tareas')
-            ],
-            'Estudio': [
-                ('Estudiar conceptos teóricos', 'Estudio de conceptos teóricos para examen'),
-                ('Continuar lecturas', 'Continuación de lecturas obligatorias'),
-                ('Repasar contenido', 'Repaso intensivo para examen'),
-                ('Investigación para proyecto', 'Investigación profunda para proyecto'),
-                ('Preparación para clases', 'Preparación de material para clases')
-            ],
-            'Salud': [
-                ('Rutina de ejercicio cardiovascular', 'Entrenamiento cardiovascular'),
-                ('Entrenamiento de fuerza', 'Entrenamiento de fuerza y musculación'),
-                ('Yoga y estiramiento', 'Sesión de yoga y estiramientos'),
-                ('Entrenamiento completo', 'Entrenamiento intensivo'),
-                ('Caminata de recuperación', 'Caminata suave de recuperación')
-            ],
-            'Hogar': [
-                ('Limpieza de cocina y baño', 'Limpieza profunda de cocina y baños'),
-                ('Organización de armarios', 'Organización y limpieza de armarios'),
-                ('Limpieza general', 'Limpieza general y profunda'),
-                ('Preparación de comidas', 'Preparación de comidas para la semana'),
-                ('Mantenimiento del hogar', 'Tareas de mantenimiento y reparación')
-            ],
-            'Finanzas': [
-                ('Revisión de gastos', 'Revisión y análisis de gastos'),
-                ('Pago de facturas', 'Pago de facturas mensuales'),
-                ('Planificación financiera', 'Planificación financiera mensual'),
-                ('Inversiones', 'Revisión y análisis de inversiones'),
-                ('Presupuesto', 'Elaboración y revisión de presupuesto')
-            ]
-        }
-        
         # Seleccionar template aleatorio para la categoría
-        if category in activity_templates:
-            title, description = random.choice(activity_templates[category])
+        if category in self.activity_templates:
+            title, description = random.choice(self.activity_templates[category])
         else:
             title = f"Actividad de {category}"
             description = f"Descripción de actividad de {category}"
@@ -199,33 +271,34 @@ class TempoSageDatasetGenerator:
             'time_consistency': time_consistency
         }
     
-    def _generate_temporal_features(self) -> Dict[str, Any]:
-        """Genera características temporales realistas."""
-        # Generar timestamp aleatorio en el último año
-        start_date = datetime.now() - timedelta(days=365)
-        end_date = datetime.now()
-        random_timestamp = start_date + timedelta(
-            seconds=random.randint(0, int((end_date - start_date).total_seconds()))
-        )
-        
-        weekday = random_timestamp.weekday()  # 0-6 (lunes-domingo)
-        hour = random_timestamp.hour
-        day_of_year = random_timestamp.timetuple().tm_yday
-        month = random_timestamp.month
-        is_weekend = weekday >= 5
+    def temporal_calendar(self, timestamps: np.ndarray) -> List[Dict[str, int]]:
+        """Timestamp y campos de calendario por registro, calculados de una vez para todo el array."""
+        calendar = {'timestamp': np.asarray(timestamps, dtype=np.int64), **calendar_features(timestamps)}
+        keys = list(calendar)
+        return [dict(zip(keys, row)) for row in zip(*(calendar[key].tolist() for key in keys))]
+
+    def _generate_temporal_features(self, calendar: Dict[str, int] = None) -> Dict[str, Any]:
+        """Genera características temporales realistas.
+
+        ``calendar`` son el timestamp y los campos de calendario ya derivados
+        en bloque (ver ``temporal_calendar``); sin él se muestrea un timestamp
+        del último año antes de ``reference_timestamp``.
+        """
+        if calendar is None:
+            timestamp = self.reference_timestamp - random.randint(0, TIME_WINDOW_SECONDS)
+            calendar = self.temporal_calendar(np.array([timestamp]))[0]
         is_holiday = random.random() < 0.05  # 5% de probabilidad de ser festivo
-        season = (month - 1) // 3  # 0-3 (invierno, primavera, verano, otoño)
         time_since_last = np.random.exponential(60)  # Exponencial para tiempo entre actividades
         
         return {
-            'timestamp': int(random_timestamp.timestamp()),
-            'weekday': weekday,
-            'hour_of_day': hour,
-            'day_of_year': day_of_year,
-            'month': month,
-            'is_weekend': int(is_weekend),
+            'timestamp': calendar['timestamp'],
+            'weekday': calendar['weekday'],  # 0-6 (lunes-domingo)
+            'hour_of_day': calendar['hour_of_day'],
+            'day_of_year': calendar['day_of_year'],
+            'month': calendar['month'],
+            'is_weekend': calendar['is_weekend'],
             'is_holiday': int(is_holiday),
-            'season': season,
+            'season': calendar['season'],  # 0-3 (invierno, primavera, verano, otoño)
             'time_since_last_activity': time_since_last
         }
     
@@ -384,8 +457,11 @@ class TempoSageDatasetGenerator:
             'model_confidence_score': np.random.beta(3, 1)
         }
     
-    def generate_record(self) -> Dict[str, Any]:
-        """Genera un registro completo del dataset."""
+    def generate_record(self, calendar: Dict[str, int] = None) -> Dict[str, Any]:
+        """Genera un registro completo del dataset.
+
+        ``calendar`` permite pasar el bloque temporal ya calculado en lote.
+        """
         # IDs únicos
         user_id = np.random.randint(1, 1001)  # 1000 usuarios únicos
         activity_id = np.random.randint(1, 10001)
@@ -399,7 +475,7 @@ class TempoSageDatasetGenerator:
         user_context = self._generate_user_context()
         activity_features = self._generate_activity_features(category)
         habit_features = self._generate_habit_features(category)
-        temporal_features = self._generate_temporal_features()
+        temporal_features = self._generate_temporal_features(calendar)
         historical_features = self._generate_historical_features()
         contextual_features = self._generate_contextual_features()
         
@@ -433,29 +509,655 @@ class TempoSageDatasetGenerator:
         
         return record
     
-    def generate_dataset(self) -> pd.DataFrame:
-        """Genera el dataset completo."""
-        print(f"Generando dataset de {self.total_records} registros...")
-        
+    def generate_batch(self, n_records: int, rng: np.random.Generator = None) -> Dict[str, np.ndarray]:
+        """Genera un lote completo de registros como columnas NumPy.
+
+        Equivalente vectorizado de ``generate_record``: cada característica y
+        cada target se muestrea de una sola vez para todo el lote, con las
+        mismas distribuciones que el modo registro a registro. Los timestamps
+        se anclan a ``reference_timestamp`` (no al reloj), así que el lote
+        depende solo del estado de ``rng`` y de ``reference_date``.
+        """
+        rng = self.rng if rng is None else rng
+        n = n_records
+
+        # IDs únicos
+        user_id = rng.integers(1, 1001, size=n)
+        activity_id = rng.integers(1, 10001, size=n)
+        habit_id = rng.integers(1, 5001, size=n)
+        timeblock_id = rng.integers(1, 20001, size=n)
+
+        # Categoría principal (índices sobre self.categories)
+        category_idx = rng.integers(0, len(self.categories), size=n)
+        categories = np.array(self.categories, dtype=object)
+        category = categories[category_idx]
+
+        # Temporales: timestamp aleatorio en el último año antes de la fecha de referencia
+        end_ts = self.reference_timestamp
+        timestamp = rng.integers(end_ts - TIME_WINDOW_SECONDS, end_ts + 1, size=n)
+        calendar = calendar_features(timestamp)
+        temporal = {
+            'timestamp': timestamp,
+            'weekday': calendar['weekday'],
+            'hour_of_day': calendar['hour_of_day'],
+            'day_of_year': calendar['day_of_year'],
+            'month': calendar['month'],
+            'is_weekend': calendar['is_weekend'],
+            'is_holiday': (rng.random(n) < 0.05).astype(int),
+            'season': calendar['season'],
+            'time_since_last_activity': rng.exponential(60, size=n),
+        }
+        hour = temporal['hour_of_day']
+
+        # Contexto del usuario
+        user_context = {
+            'energy_level': rng.beta(2, 2, size=n),
+            'mood': rng.beta(2, 2, size=n),
+            'stress_level': rng.beta(2, 3, size=n),
+            'focus_capacity': rng.beta(2, 2, size=n),
+            'sleep_quality': rng.beta(2, 2, size=n),
+            'exercise_level': rng.beta(2, 3, size=n),
+            'social_interaction': rng.beta(2, 3, size=n),
+        }
+
+        # Actividad: tabla de plantillas (categoría x plantilla)
+        max_templates = max(len(t) for t in self.activity_templates.values())
+        title_table = np.empty((len(self.categories), max_templates), dtype=object)
+        description_table = np.empty_like(title_table)
+        template_counts = np.ones(len(self.categories), dtype=int)
+        for i, cat in enumerate(self.categories):
+            templates = self.activity_templates.get(
+                cat, [(f"Actividad de {cat}", f"Descripción de actividad de {cat}")]
+            )
+            template_counts[i] = len(templates)
+            for j in range(max_templates):
+                title_table[i, j], description_table[i, j] = templates[j % len(templates)]
+        template_idx = (rng.random(n) * template_counts[category_idx]).astype(int)
+
+        priority = rng.choice([1, 2, 3, 4, 5], size=n, p=[0.1, 0.2, 0.4, 0.2, 0.1])
+        duration = rng.choice([15, 30, 45, 60, 90, 120, 180], size=n,
+                              p=[0.1, 0.2, 0.2, 0.2, 0.15, 0.1, 0.05])
+        activity = {
+            'activity_title': title_table[category_idx, template_idx],
+            'activity_description': description_table[category_idx, template_idx],
+            'activity_category': category,
+            'activity_priority': priority,
+            'activity_duration': duration,
+            'activity_complexity': rng.beta(2, 2, size=n),
+            'activity_energy_required': rng.beta(2, 2, size=n),
+            'activity_focus_required': rng.beta(2, 2, size=n),
+            'activity_deadline_pressure': rng.beta(2, 3, size=n),
+        }
+
+        # Hábito
+        habit = {
+            'streak': np.minimum(rng.poisson(7, size=n), 365),
+            'frequency': rng.beta(2, 2, size=n),
+            'success_rate': rng.beta(3, 1, size=n),
+            'days_since_last_completion': rng.poisson(1, size=n),
+            'difficulty': rng.beta(2, 2, size=n),
+            'importance': rng.beta(2, 1, size=n),
+            'time_consistency': rng.beta(2, 2, size=n),
+        }
+
+        # Históricas
+        historical = {
+            'completion_rate_last_week': rng.beta(3, 1, size=n),
+            'completion_rate_last_month': rng.beta(3, 1, size=n),
+            'productivity_score_last_week': rng.beta(3, 1, size=n),
+            'productivity_score_last_month': rng.beta(3, 1, size=n),
+            'optimal_time_blocks_morning': rng.beta(2, 2, size=n),
+            'optimal_time_blocks_afternoon': rng.beta(2, 2, size=n),
+            'optimal_time_blocks_evening': rng.beta(2, 2, size=n),
+            'energy_patterns_peak': rng.beta(2, 2, size=n),
+            'energy_patterns_low': rng.beta(2, 2, size=n),
+            'focus_patterns_peak': rng.beta(2, 2, size=n),
+            'focus_patterns_low': rng.beta(2, 2, size=n),
+        }
+
+        # Contextuales
+        context_weights = rng.dirichlet([1, 1, 1, 1], size=n)
+        contextual = {
+            'weather_condition': np.array(self.weather_conditions, dtype=object)[
+                rng.integers(0, len(self.weather_conditions), size=n)],
+            'location_type': np.array(self.locations, dtype=object)[
+                rng.integers(0, len(self.locations), size=n)],
+            'device_usage_pattern': rng.beta(2, 2, size=n),
+            'social_context': context_weights[:, 0],
+            'work_context': context_weights[:, 1],
+            'study_context': context_weights[:, 2],
+            'personal_context': context_weights[:, 3],
+        }
+
+        # Targets (misma fórmula que _generate_targets)
+        energy_factor = user_context['energy_level']
+        mood_factor = user_context['mood']
+        stress_factor = 1 - user_context['stress_level']
+        focus_factor = user_context['focus_capacity']
+
+        activity_success = np.clip(energy_factor * 0.3 + mood_factor * 0.2 +
+                                   stress_factor * 0.3 + focus_factor * 0.2, 0.1, 0.95)
+        habit_success = np.clip(habit['success_rate'] * 0.4 + habit['streak'] / 30 * 0.2 +
+                                energy_factor * 0.2 + mood_factor * 0.2, 0.1, 0.95)
+        timeblock_efficiency = np.clip(activity_success * 0.4 + habit_success * 0.3 +
+                                       energy_factor * 0.2 + focus_factor * 0.1, 0.1, 0.95)
+        energy_predicted = np.clip(energy_factor * 0.6 + mood_factor * 0.4, 0.1, 0.95)
+        fatigue_probability = np.clip((1 - energy_factor) * 0.5 + stress_factor * 0.3 +
+                                      (1 - user_context['sleep_quality']) * 0.2, 0.05, 0.9)
+
+        productivity_score = (activity_success + habit_success + timeblock_efficiency) / 3
+        pattern = np.select(
+            [productivity_score > 0.8, productivity_score > 0.6,
+             productivity_score > 0.4, productivity_score > 0.2],
+            ['Productivo', 'Moderado', 'Variable', 'Bajo'],
+            default='Burnout'
+        ).astype(object)
+        burnout_risk = np.clip(fatigue_probability * 0.4 + stress_factor * 0.3 +
+                               (1 - productivity_score) * 0.3, 0.05, 0.9)
+
+        targets = {
+            'activity_completed': (rng.random(n) < activity_success).astype(int),
+            'habit_completed': (rng.random(n) < habit_success).astype(int),
+            'timeblock_completed': (rng.random(n) < timeblock_efficiency).astype(int),
+            'activity_success_probability': activity_success,
+            'habit_success_probability': habit_success,
+            'timeblock_efficiency': timeblock_efficiency,
+            'energy_level_predicted': energy_predicted,
+            'fatigue_probability': fatigue_probability,
+            'productivity_pattern': pattern,
+            'recommendation_type': np.array(self.recommendation_types, dtype=object)[
+                rng.integers(0, len(self.recommendation_types), size=n)],
+            'burnout_risk': burnout_risk,
+            'optimal_activity_time': np.clip(hour + rng.normal(0, 2, size=n), 0, 23),
+            'optimal_habit_time': np.clip(hour + rng.normal(0, 1, size=n), 0, 23),
+            'optimal_break_time': np.clip(hour + rng.normal(0, 3, size=n), 0, 23),
+            'activity_duration_predicted': np.maximum(5, duration + rng.normal(0, 10, size=n)),
+            'habit_duration_predicted': np.maximum(
+                5, rng.choice([15, 30, 45, 60], size=n) + rng.normal(0, 5, size=n)),
+            'energy_required_predicted': activity['activity_energy_required'],
+            'focus_required_predicted': activity['activity_focus_required'],
+            'deadline_pressure_predicted': activity['activity_deadline_pressure'],
+            'streak_maintenance_probability': habit_success,
+            'timeblock_priority_score': priority / 5.0,
+            'energy_peak_time': hour + rng.normal(0, 2, size=n),
+            'focus_peak_time': hour + rng.normal(0, 1, size=n),
+            'productivity_peak_time': hour + rng.normal(0, 1.5, size=n),
+            'rest_optimal_time': hour + rng.normal(0, 3, size=n),
+            'activity_category_confidence': rng.beta(3, 1, size=n),
+            'habit_completion_confidence': rng.beta(3, 1, size=n),
+            'timeblock_optimization_score': timeblock_efficiency,
+            'energy_prediction_accuracy': rng.beta(3, 1, size=n),
+            'fatigue_prediction_accuracy': rng.beta(3, 1, size=n),
+            'pattern_recognition_confidence': rng.beta(3, 1, size=n),
+            'burnout_prediction_confidence': rng.beta(3, 1, size=n),
+            'recommendation_quality_score': rng.beta(3, 1, size=n),
+            'overall_success_probability': productivity_score,
+            'user_satisfaction_score': rng.beta(3, 1, size=n),
+            'model_confidence_score': rng.beta(3, 1, size=n),
+        }
+
+        # Mismo orden de columnas que generate_record
+        return {
+            'user_id': user_id,
+            'activity_id': activity_id,
+            'habit_id': habit_id,
+            'timeblock_id': timeblock_id,
+            **temporal,
+            **user_context,
+            **activity,
+            **habit,
+            'habit_category': category,
+            **historical,
+            **contextual,
+            **targets
+        }
+
+    def _generate_columnar(self, n_records: int, rng: np.random.Generator,
+                           batch_size: int, verbose: bool = True) -> pd.DataFrame:
+        """Genera ``n_records`` registros en lotes de ``batch_size`` con ``rng``."""
+        frames = []
+        generated = 0
+        while generated < n_records:
+            n = min(batch_size, n_records - generated)
+            columns = self.generate_batch(n, rng)
+            with self.profiler.stage('dataframe'):
+                frames.append(pd.DataFrame(columns))
+            generated += n
+            if verbose:
+                print(f"Generados {generated} registros...")
+        if len(frames) == 1:
+            return frames[0]
+        with self.profiler.stage('concat'):
+            return pd.concat(frames, ignore_index=True)
+
+    def shard_sizes(self, shards: int) -> List[int]:
+        """Reparte ``total_records`` en ``shards`` fragmentos lo más parejos posible."""
+        base, extra = divmod(self.total_records, shards)
+        return [base + (1 if i < extra else 0) for i in range(shards)]
+
+    def shard_rngs(self, shards: int) -> List[np.random.Generator]:
+        """Crea un generador independiente por fragmento derivado de la semilla."""
+        return [np.random.default_rng(seq) for seq in np.random.SeedSequence(self.seed).spawn(shards)]
+
+    def generate_dataset(self, mode: str = 'record', batch_size: int = 100000,
+                         shards: int = 1, workers: int = None) -> pd.DataFrame:
+        """Genera el dataset completo.
+
+        ``mode='record'`` genera registro a registro con ``generate_record``;
+        ``mode='columnar'`` genera lotes de ``batch_size`` registros con
+        ``generate_batch`` y construye el DataFrame directamente desde las columnas.
+
+        Con ``shards > 1`` (solo modo columnar) el total se divide en fragmentos,
+        cada uno con su propio generador derivado de ``SeedSequence(seed)``, y se
+        generan en paralelo con un pool de ``workers`` procesos. Los fragmentos se
+        concatenan en orden y todos comparten ``reference_timestamp``, así que el
+        resultado es idéntico para la misma semilla, número de fragmentos y
+        ``reference_date`` sin importar el número de procesos ni el día en que
+        se genere.
+        """
+        print(f"Generando dataset de {self.total_records} registros (modo {mode})...")
+
+        if mode == 'columnar' and shards > 1:
+            sizes = self.shard_sizes(shards)
+            rngs = self.shard_rngs(shards)
+            workers = workers or min(shards, os.cpu_count() or 1)
+            print(f"Usando {shards} fragmentos en {workers} procesos...")
+            with self.profiler.stage('shards'), ProcessPoolExecutor(max_workers=workers) as executor:
+                frames = list(executor.map(
+                    _generate_shard,
+                    [self] * shards, sizes, rngs, [batch_size] * shards
+                ))
+            with self.profiler.stage('concat'):
+                df = pd.concat(frames, ignore_index=True)
+            print(f"Dataset generado con {len(df)} registros y {len(df.columns)} características")
+            return df
+        if mode == 'columnar':
+            df = self._generate_columnar(self.total_records, self.rng, batch_size)
+            print(f"Dataset generado con {len(df)} registros y {len(df.columns)} características")
+            return df
+        if mode != 'record':
+            raise ValueError(f"Modo de generación desconocido: {mode}")
+
+        # Bloque temporal en lote: timestamps enteros y calendario vectorizado
+        timestamps = self.reference_timestamp - np.random.randint(
+            0, TIME_WINDOW_SECONDS + 1, size=self.total_records, dtype=np.int64)
+        calendars = self.temporal_calendar(timestamps)
         records = []
         for i in range(self.total_records):
             if (i + 1) % 10000 == 0:
                 print(f"Generados {i + 1} registros...")
-            records.append(self.generate_record())
+            records.append(self.generate_record(calendars[i]))
         
-        df = pd.DataFrame(records)
+        with self.profiler.stage('dataframe'):
+            df = pd.DataFrame(records)
         print(f"Dataset generado con {len(df)} registros y {len(df.columns)} características")
         
         return df
     
-    def save_dataset(self, df: pd.DataFrame, output_dir: str = "data"):
-        """Guarda el dataset en archivos CSV separados."""
+    def generator_state(self) -> Dict[str, Any]:
+        """Semilla, estado del generador columnar y fecha de referencia para poder reanudar."""
+        return {
+            'seed': self.seed,
+            'reference_timestamp': self.reference_timestamp,
+            'rng_state': self.rng.bit_generator.state,
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Reanuda el generador columnar justo donde lo dejó ``generator_state``."""
+        self.seed = state['seed']
+        self.reference_timestamp = int(state['reference_timestamp'])
+        self.rng.bit_generator.state = state['rng_state']
+
+    @staticmethod
+    def _write_json_atomic(path: str, data: Dict[str, Any]):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _write_metadata(self, output_dir: str, total: int, train: int, validation: int,
+                        test: int, features: List[str], **extra) -> str:
+        """Escribe ``dataset_metadata.json`` y devuelve su ruta."""
+        metadata = {
+            'total_records': total,
+            'train_records': train,
+            'validation_records': validation,
+            'test_records': test,
+            'features': features,
+            'categories': self.categories,
+            'weather_conditions': self.weather_conditions,
+            'locations': self.locations,
+            'productivity_patterns': self.productivity_patterns,
+            'recommendation_types': self.recommendation_types,
+            'generated_at': datetime.now().isoformat(),
+            'description': 'Dataset completo para entrenamiento del modelo ML unificado de TempoSage',
+            'generator': self.generator_state(),
+            **extra
+        }
+        
+        metadata_path = os.path.join(output_dir, "dataset_metadata.json")
+        self._write_json_atomic(metadata_path, metadata)
+        return metadata_path
+
+    def categorical_vocabularies(self) -> Dict[str, List[str]]:
+        """Vocabularios de las columnas de texto para la codificación con diccionario."""
+        titles, descriptions = [], []
+        for category in self.categories:
+            templates = self.activity_templates.get(
+                category, [(f"Actividad de {category}", f"Descripción de actividad de {category}")]
+            )
+            titles.extend(title for title, _ in templates)
+            descriptions.extend(description for _, description in templates)
+        return {
+            'activity_title': list(dict.fromkeys(titles)),
+            'activity_description': list(dict.fromkeys(descriptions)),
+            'activity_category': self.categories,
+            'habit_category': self.categories,
+            'weather_condition': self.weather_conditions,
+            'location_type': self.locations,
+            'productivity_pattern': self.productivity_patterns,
+            'recommendation_type': self.recommendation_types,
+        }
+
+    def split_bounds(self, n_records: int = None) -> List[tuple]:
+        """Devuelve (nombre, inicio, fin) de cada split sobre ``n_records`` (por defecto ``total_records``).
+
+        Los tamaños se escalan con la misma proporción que ``append_split_sizes``,
+        así que ``--records`` distinto de 65000 no deja casi todo en test.
+        """
+        n_records = self.total_records if n_records is None else n_records
+        sizes = self.append_split_sizes(n_records)
+        train_end = sizes['train']
+        val_end = train_end + sizes['validation']
+        return [
+            ('train', 0, train_end),
+            ('validation', train_end, val_end),
+            ('test', val_end, n_records),
+        ]
+
+    def save_dataset_streaming(self, output_dir: str = "data", chunk_size: int = 50000,
+                               full: str = 'manifest', fmt: str = 'csv') -> Dict[str, Any]:
+        """Genera y guarda el dataset por fragmentos sin mantenerlo completo en memoria.
+
+        Cada fragmento de ``chunk_size`` registros se genera en modo columnar y se
+        añade al CSV del split que le corresponde (mismos límites que
+        ``save_dataset``), así que la memoria pico depende de ``chunk_size`` y no
+        del total. ``full`` controla el dataset completo: ``'manifest'`` escribe un
+        JSON con los splits en orden, ``'csv'`` añade también cada fragmento a
+        ``temposage_full_dataset.csv`` y ``'none'`` lo omite.
+
+        ``fmt`` elige la salida: ``'csv'``, ``'npy'`` (columnar binario, ver
+        ``dataset_columnar``) o ``'both'``.
+        """
+        if full not in ('manifest', 'csv', 'none'):
+            raise ValueError(f"Opción de dataset completo desconocida: {full}")
+        if fmt not in ('csv', 'npy', 'both'):
+            raise ValueError(f"Formato de salida desconocido: {fmt}")
+        write_csv = fmt in ('csv', 'both')
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"Generando y guardando {self.total_records} registros en fragmentos de {chunk_size}...")
+
+        paths = {
+            'train': os.path.join(output_dir, "temposage_train.csv"),
+            'validation': os.path.join(output_dir, "temposage_validation.csv"),
+            'test': os.path.join(output_dir, "temposage_test.csv"),
+        }
+        full_path = None
+        if full == 'csv':
+            full_path = os.path.join(output_dir, "temposage_full_dataset.csv")
+        elif full == 'manifest':
+            full_path = os.path.join(output_dir, "temposage_full_dataset.manifest.json")
+
+        bounds = self.split_bounds()
+        columnar_writer = None
+        if fmt in ('npy', 'both'):
+            columnar_writer = ColumnarWriter(
+                os.path.join(output_dir, "temposage_columnar"),
+                {name: end - start for name, start, end in bounds},
+                self.categorical_vocabularies()
+            )
+        counts = {name: 0 for name, _, _ in bounds}
+        written = set()
+        features = None
+        user_ids = np.empty(0, dtype=np.int64)
+        category_counts = pd.Series(dtype=np.int64)
+        pattern_counts = pd.Series(dtype=np.int64)
+
+        generated = 0
+        while generated < self.total_records:
+            n = min(chunk_size, self.total_records - generated)
+            columns = self.generate_batch(n)
+            with self.profiler.stage('dataframe'):
+                chunk = pd.DataFrame(columns)
+            features = features or list(chunk.columns)
+
+            for name, start, end in bounds:
+                lo, hi = max(start, generated), min(end, generated + n)
+                if lo >= hi:
+                    continue
+                part = chunk.iloc[lo - generated:hi - generated]
+                if write_csv:
+                    with self.profiler.stage(f'to_csv:{name}'):
+                        part.to_csv(paths[name], mode='a' if name in written else 'w',
+                                    header=name not in written, index=False)
+                if columnar_writer:
+                    with self.profiler.stage('columnar'):
+                        columnar_writer.write(name, part)
+                written.add(name)
+                counts[name] += len(part)
+            if full == 'csv' and write_csv:
+                with self.profiler.stage('to_csv:full'):
+                    chunk.to_csv(full_path, mode='a' if generated else 'w',
+                                 header=not generated, index=False)
+
+            # Estadísticas acumuladas (acotadas por el número de categorías/usuarios)
+            user_ids = np.union1d(user_ids, chunk['user_id'].to_numpy())
+            category_counts = category_counts.add(chunk['activity_category'].value_counts(), fill_value=0)
+            pattern_counts = pattern_counts.add(chunk['productivity_pattern'].value_counts(), fill_value=0)
+
+            generated += n
+            del chunk
+            print(f"Guardados {generated} registros...")
+
+        # Un split vacío sigue teniendo su archivo con cabecera
+        for name in paths:
+            if write_csv and name not in written:
+                pd.DataFrame(columns=features).to_csv(paths[name], index=False)
+
+        extra_metadata = {}
+        if columnar_writer:
+            extra_metadata['columnar'] = columnar_writer.close()
+        if not write_csv:
+            paths = {name: None for name in paths}
+            full_path = None
+
+        if full_path and full == 'manifest':
+            manifest = {
+                'total_records': generated,
+                'files': [
+                    {'split': name, 'path': os.path.basename(paths[name]), 'records': counts[name]}
+                    for name, _, _ in bounds
+                ],
+            }
+            with open(full_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        print("Dataset guardado en:")
+        if write_csv:
+            print(f"  - Entrenamiento: {paths['train']} ({counts['train']} registros)")
+            print(f"  - Validación: {paths['validation']} ({counts['validation']} registros)")
+            print(f"  - Prueba: {paths['test']} ({counts['test']} registros)")
+        if full_path:
+            print(f"  - Completo: {full_path} ({generated} registros)")
+
+        metadata_path = self._write_metadata(
+            output_dir, generated, counts['train'], counts['validation'], counts['test'], features,
+            **extra_metadata
+        )
+        if columnar_writer:
+            print(f"  - Columnar: {os.path.join(output_dir, 'temposage_columnar')}")
+        print(f"  - Metadatos: {metadata_path}")
+
+        return {
+            **paths,
+            'full': full_path,
+            'metadata': metadata_path,
+            'stats': {
+                'total_records': generated,
+                'features': len(features),
+                'unique_users': len(user_ids),
+                'category_counts': category_counts.astype(np.int64).sort_values(ascending=False),
+                'pattern_counts': pattern_counts.astype(np.int64).sort_values(ascending=False),
+            }
+        }
+
+    def append_split_sizes(self, n_records: int, split: str = 'proportional') -> Dict[str, int]:
+        """Reparte ``n_records`` nuevos entre los splits.
+
+        ``'proportional'`` mantiene la proporción train/validation/test de
+        ``train_size``/``val_size``/``test_size`` (restos al mayor resto); con
+        el nombre de un split todos los registros van a ese split.
+        """
+        names = ['train', 'validation', 'test']
+        if split != 'proportional':
+            if split not in names:
+                raise ValueError(f"Split desconocido: {split}")
+            return {name: n_records if name == split else 0 for name in names}
+        weights = np.array([self.train_size, self.val_size, self.test_size], dtype=np.float64)
+        exact = n_records * weights / weights.sum()
+        sizes = np.floor(exact).astype(np.int64)
+        for i in np.argsort(-(exact - sizes), kind='stable')[:n_records - sizes.sum()]:
+            sizes[i] += 1
+        return dict(zip(names, (int(size) for size in sizes)))
+
+    def append_dataset(self, n_records: int, output_dir: str = "data", chunk_size: int = 50000,
+                       split: str = 'proportional') -> Dict[str, Any]:
+        """Añade ``n_records`` registros nuevos a un dataset ya generado.
+
+        Reanuda el generador columnar desde el estado guardado en
+        ``dataset_metadata.json`` (semilla, estado del RNG y fecha de
+        referencia), así que los registros nuevos continúan la misma secuencia
+        aleatoria y el coste depende solo de ``n_records``. Los registros se
+        añaden al final de los CSV de cada split (y de
+        ``temposage_full_dataset.csv``, el manifiesto y el formato columnar si
+        existen). Si algo falla, los archivos vuelven a su estado anterior; los
+        metadatos se sustituyen de forma atómica al final.
+        """
+        metadata_path = os.path.join(output_dir, "dataset_metadata.json")
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if 'generator' not in metadata:
+            raise ValueError(f"{metadata_path} no guarda el estado del generador; no se puede reanudar")
+        self.restore_state(metadata['generator'])
+        features = metadata['features']
+
+        paths = {
+            'train': os.path.join(output_dir, "temposage_train.csv"),
+            'validation': os.path.join(output_dir, "temposage_validation.csv"),
+            'test': os.path.join(output_dir, "temposage_test.csv"),
+        }
+        write_csv = all(os.path.exists(path) for path in paths.values())
+        full_csv = os.path.join(output_dir, "temposage_full_dataset.csv")
+        full_manifest = os.path.join(output_dir, "temposage_full_dataset.manifest.json")
+        columnar = metadata.get('columnar')
+        columnar_root = os.path.join(output_dir, columnar['path']) if columnar else None
+        if not write_csv and not columnar:
+            raise FileNotFoundError(f"No hay splits CSV ni columnares en {output_dir}")
+
+        sizes = self.append_split_sizes(n_records, split)
+        bounds, start = [], 0
+        for name in ('train', 'validation', 'test'):
+            bounds.append((name, start, start + sizes[name]))
+            start += sizes[name]
+        print(f"Añadiendo {n_records} registros a {output_dir} "
+              f"(train {sizes['train']}, validación {sizes['validation']}, prueba {sizes['test']})...")
+
+        journal = AppendJournal()
+        category_counts = pd.Series(dtype=np.int64)
+        pattern_counts = pd.Series(dtype=np.int64)
+        user_ids = np.empty(0, dtype=np.int64)
+        generated = 0
+        try:
+            while generated < n_records:
+                n = min(chunk_size, n_records - generated)
+                columns = self.generate_batch(n)
+                with self.profiler.stage('dataframe'):
+                    chunk = pd.DataFrame(columns)
+                if list(chunk.columns) != features:
+                    raise ValueError("Las columnas generadas no coinciden con las del dataset existente")
+                for name, lo_split, hi_split in bounds:
+                    lo, hi = max(lo_split, generated), min(hi_split, generated + n)
+                    if lo >= hi:
+                        continue
+                    part = chunk.iloc[lo - generated:hi - generated]
+                    if write_csv:
+                        journal.track(paths[name])
+                        with self.profiler.stage(f'to_csv:{name}'):
+                            part.to_csv(paths[name], mode='a', header=False, index=False)
+                    if columnar:
+                        with self.profiler.stage('columnar'):
+                            append_columnar(columnar, columnar_root, name, part, journal)
+                if write_csv and os.path.exists(full_csv):
+                    journal.track(full_csv)
+                    with self.profiler.stage('to_csv:full'):
+                        chunk.to_csv(full_csv, mode='a', header=False, index=False)
+
+                user_ids = np.union1d(user_ids, chunk['user_id'].to_numpy())
+                category_counts = category_counts.add(chunk['activity_category'].value_counts(), fill_value=0)
+                pattern_counts = pattern_counts.add(chunk['productivity_pattern'].value_counts(), fill_value=0)
+                generated += n
+                del chunk
+                print(f"Añadidos {generated} registros...")
+        except BaseException:
+            journal.rollback()
+            raise
+        journal.commit()
+
+        if write_csv and os.path.exists(full_manifest):
+            with open(full_manifest, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            for entry in manifest['files']:
+                entry['records'] += sizes[entry['split']]
+            manifest['total_records'] += n_records
+            self._write_json_atomic(full_manifest, manifest)
+
+        metadata['total_records'] += n_records
+        metadata['train_records'] += sizes['train']
+        metadata['validation_records'] += sizes['validation']
+        metadata['test_records'] += sizes['test']
+        if columnar:
+            metadata['columnar'] = columnar
+        metadata['generator'] = self.generator_state()
+        metadata['generated_at'] = datetime.now().isoformat()
+        metadata.setdefault('appends', []).append({
+            'records': n_records, 'splits': sizes, 'appended_at': metadata['generated_at'],
+        })
+        self._write_json_atomic(metadata_path, metadata)
+        print(f"  - Metadatos: {metadata_path} ({metadata['total_records']} registros en total)")
+
+        return {
+            **{name: paths[name] if write_csv else None for name in paths},
+            'metadata': metadata_path,
+            'stats': {
+                'total_records': generated,
+                'features': len(features),
+                'unique_users': len(user_ids),
+                'category_counts': category_counts.astype(np.int64).sort_values(ascending=False),
+                'pattern_counts': pattern_counts.astype(np.int64).sort_values(ascending=False),
+            }
+        }
+
+    def save_dataset(self, df: pd.DataFrame, output_dir: str = "data", fmt: str = 'csv'):
+        """Guarda el dataset en archivos CSV separados.
+
+        Con ``fmt='npy'`` o ``'both'`` escribe también (o solo) el formato
+        columnar binario en ``temposage_columnar/`` y describe su esquema en
+        los metadatos.
+        """
         os.makedirs(output_dir, exist_ok=True)
         
-        # Dividir en train, validation y test
-        train_df = df.iloc[:self.train_size]
-        val_df = df.iloc[self.train_size:self.train_size + self.val_size]
-        test_df = df.iloc[self.train_size + self.val_size:]
+        # Dividir en train, validation y test en proporción al tamaño del dataset
+        train_df, val_df, test_df = (df.iloc[start:end] for _, start, end in self.split_bounds(len(df)))
         
         # Guardar archivos
         train_path = os.path.join(output_dir, "temposage_train.csv")
@@ -463,36 +1165,35 @@ class TempoSageDatasetGenerator:
         test_path = os.path.join(output_dir, "temposage_test.csv")
         full_path = os.path.join(output_dir, "temposage_full_dataset.csv")
         
-        train_df.to_csv(train_path, index=False)
-        val_df.to_csv(val_path, index=False)
-        test_df.to_csv(test_path, index=False)
-        df.to_csv(full_path, index=False)
+        print("Dataset guardado en:")
+        if fmt in ('csv', 'both'):
+            for name, part, path in (('train', train_df, train_path), ('validation', val_df, val_path),
+                                     ('test', test_df, test_path), ('full', df, full_path)):
+                with self.profiler.stage(f'to_csv:{name}'):
+                    part.to_csv(path, index=False)
+            
+            print(f"  - Entrenamiento: {train_path} ({len(train_df)} registros)")
+            print(f"  - Validación: {val_path} ({len(val_df)} registros)")
+            print(f"  - Prueba: {test_path} ({len(test_df)} registros)")
+            print(f"  - Completo: {full_path} ({len(df)} registros)")
+        else:
+            train_path = val_path = test_path = full_path = None
         
-        print(f"Dataset guardado en:")
-        print(f"  - Entrenamiento: {train_path} ({len(train_df)} registros)")
-        print(f"  - Validación: {val_path} ({len(val_df)} registros)")
-        print(f"  - Prueba: {test_path} ({len(test_df)} registros)")
-        print(f"  - Completo: {full_path} ({len(df)} registros)")
+        extra_metadata = {}
+        if fmt in ('npy', 'both'):
+            columnar_dir = os.path.join(output_dir, "temposage_columnar")
+            with self.profiler.stage('columnar'):
+                extra_metadata['columnar'] = write_columnar(
+                    {'train': train_df, 'validation': val_df, 'test': test_df},
+                    columnar_dir, self.categorical_vocabularies()
+                )
+            print(f"  - Columnar: {columnar_dir}")
         
         # Guardar metadatos
-        metadata = {
-            'total_records': len(df),
-            'train_records': len(train_df),
-            'validation_records': len(val_df),
-            'test_records': len(test_df),
-            'features': list(df.columns),
-            'categories': self.categories,
-            'weather_conditions': self.weather_conditions,
-            'locations': self.locations,
-            'productivity_patterns': self.productivity_patterns,
-            'recommendation_types': self.recommendation_types,
-            'generated_at': datetime.now().isoformat(),
-            'description': 'Dataset completo para entrenamiento del modelo ML unificado de TempoSage'
-        }
-        
-        metadata_path = os.path.join(output_dir, "dataset_metadata.json")
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        metadata_path = self._write_metadata(
+            output_dir, len(df), len(train_df), len(val_df), len(test_df), list(df.columns),
+            **extra_metadata
+        )
         
         print(f"  - Metadatos: {metadata_path}")
         
@@ -504,40 +1205,136 @@ class TempoSageDatasetGenerator:
             'metadata': metadata_path
         }
 
-def main():
-    """Función principal para generar el dataset."""
-    print("🚀 Generador del Dataset Perfecto para TempoSage ML Model")
-    print("=" * 60)
-    
-    # Crear generador
-    generator = TempoSageDatasetGenerator(seed=42)
-    
-    # Generar dataset
-    df = generator.generate_dataset()
-    
-    # Guardar dataset
-    file_paths = generator.save_dataset(df)
-    
-    # Mostrar estadísticas
+def _generate_shard(generator: TempoSageDatasetGenerator, n_records: int,
+                    rng: np.random.Generator, batch_size: int) -> pd.DataFrame:
+    """Genera un fragmento del dataset dentro de un proceso del pool."""
+    return generator._generate_columnar(n_records, rng, batch_size, verbose=False)
+
+def print_statistics(total: int, n_features: int, unique_users: int,
+                     category_dist: pd.Series, pattern_dist: pd.Series):
+    """Muestra las estadísticas y distribuciones del dataset generado."""
     print("\n📊 Estadísticas del Dataset:")
-    print(f"  - Total de registros: {len(df):,}")
-    print(f"  - Total de características: {len(df.columns)}")
-    print(f"  - Usuarios únicos: {df['user_id'].nunique()}")
-    print(f"  - Categorías: {df['activity_category'].nunique()}")
-    print(f"  - Patrones de productividad: {df['productivity_pattern'].nunique()}")
+    print(f"  - Total de registros: {total:,}")
+    print(f"  - Total de características: {n_features}")
+    print(f"  - Usuarios únicos: {unique_users}")
+    print(f"  - Categorías: {len(category_dist)}")
+    print(f"  - Patrones de productividad: {len(pattern_dist)}")
     
     print("\n📈 Distribución por categoría:")
-    category_dist = df['activity_category'].value_counts()
     for category, count in category_dist.items():
-        percentage = (count / len(df)) * 100
+        percentage = (count / total) * 100
         print(f"  - {category}: {count:,} ({percentage:.1f}%)")
     
     print("\n🎯 Distribución de patrones de productividad:")
-    pattern_dist = df['productivity_pattern'].value_counts()
     for pattern, count in pattern_dist.items():
-        percentage = (count / len(df)) * 100
+        percentage = (count / total) * 100
         print(f"  - {pattern}: {count:,} ({percentage:.1f}%)")
+
+def parse_args():
+    """Parsea los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Generador del dataset de entrenamiento de TempoSage")
+    parser.add_argument('--mode', choices=['columnar', 'record'], default='columnar',
+                        help="columnar: lotes vectorizados con NumPy (rápido); record: registro a registro")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla para reproducibilidad")
+    parser.add_argument('--reference-date', default=DEFAULT_REFERENCE_DATE,
+                        help="Fin (UTC) de la ventana de un año de los timestamps, AAAA-MM-DD")
+    parser.add_argument('--batch-size', type=int, default=100000,
+                        help="Registros por lote en modo columnar")
+    parser.add_argument('--records', type=int, default=None,
+                        help="Total de registros a generar (por defecto 65,000)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Fragmentos con semilla propia generados en paralelo (modo columnar)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos del pool (por defecto min(fragmentos, CPUs))")
+    parser.add_argument('--stream', action='store_true',
+                        help="Genera y escribe por fragmentos de --batch-size con memoria constante")
+    parser.add_argument('--full', choices=['manifest', 'csv', 'none'], default='manifest',
+                        help="Dataset completo en modo --stream: manifiesto JSON, CSV o nada")
+    parser.add_argument('--format', choices=['csv', 'npy', 'both'], default='csv',
+                        help="csv, columnar binario (.npy por columna, categóricas codificadas) o ambos")
+    parser.add_argument('--output-dir', default="data", help="Directorio de salida")
+    parser.add_argument('--append', type=int, default=None, metavar='N',
+                        help="Añade N registros al dataset existente reanudando el RNG guardado en los metadatos")
+    parser.add_argument('--append-split', choices=['proportional', 'train', 'validation', 'test'],
+                        default='proportional',
+                        help="Split que recibe los registros añadidos (por defecto, proporcional)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Mide tiempo y memoria por etapa e imprime un resumen al final")
+    parser.add_argument('--profile-no-memory', dest='profile_memory', action='store_false',
+                        help="Con --profile, mide solo tiempos (sin tracemalloc, menos sobrecoste)")
+    parser.add_argument('--profile-dump', default=None, metavar='DIR',
+                        help="Con --profile, vuelca cProfile y la instantánea de tracemalloc en DIR")
+    parser.add_argument('--profile-json', default=None,
+                        help="Resumen JSON del perfil (por defecto <output-dir>/generator_profile.json)")
+    parser.add_argument('--profile-baseline', default=None,
+                        help="JSON de perfil de referencia; sale con error si hay regresiones")
+    parser.add_argument('--profile-tolerance', type=float, default=0.2,
+                        help="Empeoramiento relativo tolerado frente a --profile-baseline")
+    return parser.parse_args()
+
+def main():
+    """Función principal para generar el dataset."""
+    args = parse_args()
+    print("🚀 Generador del Dataset Perfecto para TempoSage ML Model")
+    print("=" * 60)
+    
+    # Crear generador
+    generator = TempoSageDatasetGenerator(seed=args.seed, reference_date=args.reference_date)
+    if args.records:
+        generator.total_records = args.records
+    profiler = None
+    if args.profile or args.profile_dump or args.profile_baseline:
+        profiler = generator.enable_profiling(memory=args.profile_memory, cprofile=bool(args.profile_dump))
+        profiler.start()
     
+    if args.append:
+        # Reanudar desde el estado guardado y añadir solo los registros nuevos
+        result = generator.append_dataset(args.append, output_dir=args.output_dir,
+                                          chunk_size=args.batch_size, split=args.append_split)
+        stats = result['stats']
+        print_statistics(stats['total_records'], stats['features'], stats['unique_users'],
+                         stats['category_counts'], stats['pattern_counts'])
+    elif args.stream:
+        # Generar y guardar por fragmentos con memoria acotada
+        result = generator.save_dataset_streaming(output_dir=args.output_dir,
+                                                  chunk_size=args.batch_size, full=args.full,
+                                                  fmt=args.format)
+        stats = result['stats']
+        print_statistics(stats['total_records'], stats['features'], stats['unique_users'],
+                         stats['category_counts'], stats['pattern_counts'])
+    else:
+        # Generar dataset
+        df = generator.generate_dataset(mode=args.mode, batch_size=args.batch_size,
+                                        shards=args.shards, workers=args.workers)
+        
+        # Guardar dataset
+        generator.save_dataset(df, output_dir=args.output_dir, fmt=args.format)
+        
+        print_statistics(len(df), len(df.columns), df['user_id'].nunique(),
+                         df['activity_category'].value_counts(),
+                         df['productivity_pattern'].value_counts())
+    
+    if profiler is not None:
+        profiler.stop()
+        profiler.records = args.append or generator.total_records
+        profiler.print_table()
+        profile_path = args.profile_json or os.path.join(args.output_dir, "generator_profile.json")
+        summary = profiler.write_json(profile_path)
+        print(f"  Perfil JSON: {profile_path}")
+        if args.profile_dump:
+            for path in profiler.dump(args.profile_dump):
+                print(f"  Volcado: {path}")
+        profiler.close()
+        if args.profile_baseline:
+            with open(args.profile_baseline, 'r', encoding='utf-8') as f:
+                problems = compare_profiles(summary, json.load(f), args.profile_tolerance)
+            if problems:
+                print(f"\n❌ Regresiones de rendimiento frente a {args.profile_baseline}:")
+                for problem in problems:
+                    print(f"  - {problem}")
+                sys.exit(1)
+            print(f"Sin regresiones frente a {args.profile_baseline}")
+
     print("\n✅ Dataset generado exitosamente!")
     print("El dataset está listo para entrenar el modelo ML unificado de TempoSage.")
 
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Instrumentación por etapas del generador de datasets de TempoSage
+==================================================================
+
+``StageProfiler`` mide tiempo de pared y memoria asignada (``tracemalloc``)
+de cada etapa del generador: los métodos ``_generate_*``, ``generate_batch``,
+la construcción del DataFrame y cada ``to_csv``. Al final imprime una tabla y
+guarda un JSON con el resumen; opcionalmente vuelca también las estadísticas
+de ``cProfile`` y una instantánea de ``tracemalloc``.
+
+Las etapas no deben anidarse: la memoria pico se mide reiniciando el pico de
+``tracemalloc`` al entrar en cada etapa.
+
+Uso (desde el generador):
+    python scripts/generate_perfect_training_dataset.py --profile --records 10000
+    python scripts/generate_perfect_training_dataset.py --profile --profile-dump profiling/
+    python scripts/generate_perfect_training_dataset.py --profile --profile-baseline ci/generator_profile.json
+"""
+
+import cProfile
+import functools
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, List
+
+
+class NullProfiler:
+    """Perfilador desactivado: las etapas no cuestan nada."""
+
+    enabled = False
+
+    def stage(self, name: str):
+        return nullcontext()
+
+
+class _StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated = 0
+        self.peak = 0
+
+
+class StageProfiler:
+    """Acumula tiempo y memoria por etapa con nombre."""
+
+    enabled = True
+
+    def __init__(self, memory: bool = True, cprofile: bool = False):
+        self.memory = memory
+        self.cprofile = cprofile
+        self._stages: Dict[str, _StageStats] = {}
+        self._profile = cProfile.Profile() if cprofile else None
+        self._started = None
+        self._elapsed = 0.0
+        self._own_tracemalloc = False
+        self.records = 0
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        if self._profile is not None:
+            self._profile.enable()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self._elapsed = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+
+    @contextmanager
+    def stage(self, name: str):
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = _StageStats()
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.seconds += time.perf_counter() - started
+            stats.calls += 1
+            if tracing:
+                after, peak = tracemalloc.get_traced_memory()
+                stats.allocated += after - before
+                stats.peak = max(stats.peak, peak - before)
+
+    def instrument(self, obj, names: Iterable[str]):
+        """Sustituye los métodos ``names`` de la instancia ``obj`` por versiones medidas."""
+        for name in names:
+            setattr(obj, name, self._wrap(getattr(obj, name), name))
+
+    def _wrap(self, method, name: str):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return method(*args, **kwargs)
+        return wrapper
+
+    def summary(self) -> Dict[str, Any]:
+        total = self._elapsed or sum(s.seconds for s in self._stages.values())
+        stages = {}
+        for name, s in sorted(self._stages.items(), key=lambda item: -item[1].seconds):
+            stages[name] = {
+                'calls': s.calls,
+                'seconds': s.seconds,
+                'mean_ms': s.seconds * 1000.0 / s.calls if s.calls else 0.0,
+                'share': s.seconds / total if total else 0.0,
+            }
+            if self.memory:
+                stages[name]['allocated_bytes'] = s.allocated
+                stages[name]['peak_bytes'] = s.peak
+        return {
+            'total_seconds': total,
+            'records': self.records,
+            'records_per_second': self.records / total if total else None,
+            'memory': self.memory,
+            'stages': stages,
+        }
+
+    def print_table(self):
+        summary = self.summary()
+        print("\n⏱️ Perfil por etapas del generador:")
+        header = f"  {'etapa':<32} {'llamadas':>9} {'total s':>9} {'media ms':>10} {'%':>6}"
+        if self.memory:
+            header += f" {'neto MB':>9} {'pico MB':>9}"
+        print(header)
+        for name, stage in summary['stages'].items():
+            line = (f"  {name:<32} {stage['calls']:>9,} {stage['seconds']:>9.3f}"
+                    f" {stage['mean_ms']:>10.4f} {stage['share'] * 100:>5.1f}%")
+            if self.memory:
+                line += f" {stage['allocated_bytes'] / 2**20:>9.2f} {stage['peak_bytes'] / 2**20:>9.2f}"
+            print(line)
+        rate = summary['records_per_second']
+        print(f"  Total: {summary['total_seconds']:.3f} s"
+              + (f" ({rate:,.0f} registros/s)" if rate else ""))
+
+    def write_json(self, path: str) -> Dict[str, Any]:
+        summary = self.summary()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+    def dump(self, output_dir: str) -> List[str]:
+        """Vuelca ``cProfile`` (``.prof`` y texto) y la instantánea de ``tracemalloc``."""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        if self._profile is not None:
+            prof_path = os.path.join(output_dir, 'generator.prof')
+            self._profile.dump_stats(prof_path)
+            text_path = os.path.join(output_dir, 'generator_cprofile.txt')
+            with open(text_path, 'w', encoding='utf-8') as f:
+                pstats.Stats(self._profile, stream=f).sort_stats('cumulative').print_stats(50)
+            paths += [prof_path, text_path]
+        if self.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            snapshot_path = os.path.join(output_dir, 'generator.tracemalloc')
+            snapshot.dump(snapshot_path)
+            top_path = os.path.join(output_dir, 'generator_tracemalloc_top.txt')
+            with open(top_path, 'w', encoding='utf-8') as f:
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+            paths += [snapshot_path, top_path]
+        return paths
+
+    def close(self):
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+
+def compare_profiles(current: Dict[str, Any], baseline: Dict[str, Any],
+                     tolerance: float = 0.2) -> List[str]:
+    """Regresiones de ``current`` frente a ``baseline`` (registros/s y etapas más lentas)."""
+    problems = []
+    old_rate, new_rate = baseline.get('records_per_second'), current.get('records_per_second')
+    if old_rate and new_rate and new_rate < old_rate * (1.0 - tolerance):
+        problems.append(f"registros/s: {old_rate:,.0f} -> {new_rate:,.0f}")
+    for name, stage in current['stages'].items():
+        old = baseline.get('stages', {}).get(name)
+        if not old or not old['calls'] or not stage['calls']:
+            continue
+        if stage['mean_ms'] > old['mean_ms'] * (1.0 + tolerance):
+            problems.append(f"{name}: {old['mean_ms']:.4f} ms -> {stage['mean_ms']:.4f} ms por llamada")
+    return problems
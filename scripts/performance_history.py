@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Historial incremental de rendimiento de TempoSage
+=================================================
+
+Guarda los resúmenes ``performance_reports/resumen_*.csv`` y las métricas de
+los volcados dumpsys (ver ``dumpsys_parser.py``) en una base SQLite local
+(``performance_reports/historial_rendimiento.sqlite``) con un índice por fecha.
+Cada ejecución solo procesa los archivos que no ha visto antes (o que
+cambiaron de tamaño o fecha de modificación), así que el coste de carga ya no
+crece con el historial; el visualizador y la detección de regresiones
+consultan solo el rango de fechas que necesitan.
+
+El lector de resúmenes tolera los CSV que genera ``analizar_rendimiento.sh``
+con valores vacíos, ``%`` en la CPU y los ``0`` duplicados de ``grep -c || echo 0``
+que parten la fila en varias líneas.
+
+Uso:
+    python scripts/performance_history.py ingest
+    python scripts/performance_history.py query --desde 2025-05-01 --hasta 2025-06-01
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dumpsys_parser import CAPTURE_DTYPES, DEFAULT_PACKAGE, capture_table, discover_captures, parse_files
+
+REPORTS_DIR = 'performance_reports'
+DEFAULT_DB = os.path.join(REPORTS_DIR, 'historial_rendimiento.sqlite')
+SUMMARY_PATTERN = 'resumen_*.csv'
+DATE_FORMAT = '%Y%m%d_%H%M%S'
+ROW_START = re.compile(r'(?m)^(?=\d{8}_\d{6},)')
+
+# Columnas del resumen -> columnas de la tabla
+SUMMARY_COLUMNS = {
+    'Memoria_Total_PSS': 'pss_kb',
+    'Java_Heap': 'java_heap_kb',
+    'CPU_Usage': 'cpu_percent',
+    'Total_Frames': 'total_frames',
+    'Janky_Frames': 'janky_frames',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    rows        INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    fecha        TEXT PRIMARY KEY,
+    timestamp    INTEGER NOT NULL,
+    pss_kb       REAL,
+    java_heap_kb REAL,
+    cpu_percent  REAL,
+    total_frames INTEGER,
+    janky_frames INTEGER,
+    source       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+"""
+
+# Columnas fijas de las capturas dumpsys; las de memoria por categoría
+# (``mem_<categoria>_pss_kb``) varían entre dispositivos y van en ``memory_json``.
+SQL_TYPES = {'Int64': 'INTEGER', 'float64': 'REAL', 'string': 'TEXT'}
+CAPTURE_COLUMNS = [name for name in CAPTURE_DTYPES if name not in ('fecha', 'timestamp')]
+CAPTURES_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS captures (
+    fecha       TEXT PRIMARY KEY,
+    timestamp   INTEGER NOT NULL,
+    {''.join(f"{name} {SQL_TYPES[CAPTURE_DTYPES[name]]},{chr(10)}    " for name in CAPTURE_COLUMNS)}memory_json TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_timestamp ON captures (timestamp);
+"""
+
+
+def _number(value: str) -> Optional[float]:
+    """``'7.2%'`` -> 7.2; vacío o no numérico -> ``None``."""
+    value = value.strip().rstrip('%').strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_summary_csv(path: str) -> List[Dict[str, object]]:
+    """Lee un ``resumen_*.csv`` tolerando filas partidas y valores vacíos.
+
+    ``analizar_rendimiento.sh`` escribe ``$TOTAL_FRAMES`` y ``$JANKY_FRAMES``
+    como ``"0\\n0"`` cuando ``grep -c`` no encuentra nada, lo que parte la fila.
+    Por eso se separa el cuerpo por comas (no por líneas) y de cada campo se
+    toma la primera línea.
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        header = f.readline().strip().split(',')
+        body = f.read().strip()
+    if not body or 'Fecha' not in header:
+        return []
+    rows = []
+    width = len(header)
+    # Un resumen puede acumular varias ejecuciones: cada una empieza por una fecha al inicio de línea
+    for record in ROW_START.split(body):
+        chunk = [field.strip().split('\n')[0].strip() for field in record.split(',')[:width]]
+        chunk += [''] * (width - len(chunk))
+        values = dict(zip(header, chunk))
+        try:
+            when = datetime.strptime(values['Fecha'], DATE_FORMAT)
+        except ValueError:
+            continue
+        row = {'fecha': values['Fecha'], 'timestamp': int(pd.Timestamp(when).timestamp())}
+        for column, name in SUMMARY_COLUMNS.items():
+            number = _number(values.get(column, ''))
+            if name in ('total_frames', 'janky_frames') and number is not None:
+                number = int(number)
+            row[name] = number
+        rows.append(row)
+    return rows
+
+
+class PerformanceHistory:
+    """Historial de resúmenes de rendimiento en SQLite."""
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA + CAPTURES_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _known_files(self) -> Dict[str, tuple]:
+        cursor = self.connection.execute('SELECT path, size, mtime_ns FROM ingested_files')
+        return {path: (size, mtime_ns) for path, size, mtime_ns in cursor}
+
+    def ingest(self, reports_dir: str = REPORTS_DIR, pattern: str = SUMMARY_PATTERN,
+               package: str = DEFAULT_PACKAGE, workers: int = None) -> Dict[str, int]:
+        """Ingiere los resúmenes y volcados dumpsys nuevos o modificados de ``reports_dir``.
+
+        Si cambia cualquier volcado de una captura se vuelven a procesar los
+        cuatro de esa fecha, porque juntos forman una sola fila.
+        """
+        known = self._known_files()
+
+        def changed(path):
+            stat = os.stat(path)
+            key = os.path.relpath(path, reports_dir)
+            return key, stat, known.get(key) != (stat.st_size, stat.st_mtime_ns)
+
+        paths = sorted(glob.glob(os.path.join(reports_dir, pattern)))
+        pending = []
+        for path in paths:
+            key, stat, is_new = changed(path)
+            if is_new:
+                pending.append((path, key, stat))
+
+        dumps = discover_captures(reports_dir)
+        fechas = {fecha for _, fecha, path in dumps if changed(path)[2]}
+        dump_files = [(kind, fecha, path) for kind, fecha, path in dumps if fecha in fechas]
+        captures = parse_files(dump_files, package, workers)['captures'] if dump_files else None
+
+        runs = 0
+        with self.connection:
+            for path, key, stat in pending:
+                rows = parse_summary_csv(path)
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO runs (fecha, timestamp, pss_kb, java_heap_kb, cpu_percent,'
+                    ' total_frames, janky_frames, source) VALUES (:fecha, :timestamp, :pss_kb,'
+                    ' :java_heap_kb, :cpu_percent, :total_frames, :janky_frames, :source)',
+                    [{**row, 'source': key} for row in rows])
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO ingested_files (path, size, mtime_ns, rows, ingested_at)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (key, stat.st_size, stat.st_mtime_ns, len(rows), datetime.now().isoformat()))
+                runs += len(rows)
+            if captures is not None:
+                records = [_capture_record(row) for row in captures.to_dict('records')]
+                columns = ['fecha', 'timestamp'] + CAPTURE_COLUMNS + ['memory_json']
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO captures ({', '.join(columns)})"
+                    f" VALUES ({', '.join(':' + c for c in columns)})", records)
+            for _, _, path in dump_files:
+                key, stat, _ = changed(path)
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO ingested_files (path, size, mtime_ns, rows, ingested_at)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (key, stat.st_size, stat.st_mtime_ns, 1, datetime.now().isoformat()))
+        return {'files': len(pending) + len(dump_files), 'runs': runs, 'captures': len(fechas),
+                'skipped': len(paths) + len(dumps) - len(pending) - len(dump_files)}
+
+    @staticmethod
+    def _range(start: datetime = None, end: datetime = None, limit: int = None):
+        """``WHERE`` y ``ORDER BY``/``LIMIT`` de una consulta por rango de fechas."""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(int(pd.Timestamp(start).timestamp()))
+        if end is not None:
+            clauses.append('timestamp <= ?')
+            params.append(int(pd.Timestamp(end).timestamp()))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = 'ORDER BY timestamp'
+        if limit:
+            # Las últimas ``limit`` filas; el llamador las reordena cronológicamente
+            order = f'ORDER BY timestamp DESC LIMIT {int(limit)}'
+        return where, order, params
+
+    def _select(self, table: str, expressions: Dict[str, str], start: datetime = None, end: datetime = None,
+                limit: int = None, max_points: int = None):
+        """Ejecuta ``SELECT fecha, timestamp, <expresión> AS <alias>...`` sobre el rango pedido.
+
+        Con ``max_points`` la reducción se hace en SQLite: las filas consecutivas
+        se agrupan en ``max_points`` grupos como máximo que conservan la primera
+        fecha y el máximo de cada expresión, para que los picos (las
+        regresiones) sigan visibles sin cargar el historial completo.
+        """
+        where, order, params = self._range(start, end, limit)
+        source = f'(SELECT * FROM {table} {where} {order})'
+        if not max_points:
+            columns = ', '.join(f'{expression} AS {alias}' for alias, expression in expressions.items())
+            return self.connection.execute(f'SELECT fecha, timestamp, {columns} FROM {source}', params)
+        columns = ', '.join(f'MAX({expression}) AS {alias}' for alias, expression in expressions.items())
+        return self.connection.execute(
+            f'SELECT MIN(fecha) AS fecha, MIN(timestamp) AS timestamp, {columns} FROM ('
+            f' SELECT *, ROW_NUMBER() OVER (ORDER BY timestamp) - 1 AS bucket_row,'
+            f' COUNT(*) OVER () AS bucket_rows FROM {source})'
+            f' GROUP BY bucket_row * ? / bucket_rows ORDER BY timestamp',
+            params + [int(max_points)])
+
+    def query(self, start: datetime = None, end: datetime = None, limit: int = None,
+              max_points: int = None) -> pd.DataFrame:
+        """Ejecuciones entre ``start`` y ``end`` (incluidos) con las columnas del resumen original.
+
+        Incluye ``Janky_Percent``; con ``max_points`` devuelve la serie reducida (ver ``_select``).
+        """
+        expressions = dict(SUMMARY_COLUMNS)
+        expressions['Janky_Percent'] = '100.0 * janky_frames / NULLIF(total_frames, 0)'
+        cursor = self._select('runs', expressions, start, end, limit, max_points)
+        data = pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+        data = data.rename(columns={'fecha': 'Fecha'}).astype({'Janky_Percent': 'float64'})
+        data = data.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        data['Timestamp'] = pd.to_datetime(data.pop('timestamp'), unit='s')
+        return data
+
+    def query_captures(self, start: datetime = None, end: datetime = None, limit: int = None,
+                       columns: List[str] = None, max_points: int = None) -> pd.DataFrame:
+        """Capturas dumpsys ya procesadas entre ``start`` y ``end``, con los tipos de ``CAPTURE_DTYPES``.
+
+        Con ``columns`` solo se leen esas columnas (además de la fecha). Con
+        ``max_points`` devuelve la serie reducida (ver ``_select``) sin las
+        columnas de memoria por categoría.
+        """
+        selected = list(columns) if columns is not None else CAPTURE_COLUMNS + ([] if max_points else ['memory_json'])
+        cursor = self._select('captures', {name: name for name in selected}, start, end, limit, max_points)
+        names = [description[0] for description in cursor.description]
+        rows = []
+        for values in cursor:
+            row = dict(zip(names, values))
+            row.update(json.loads(row.pop('memory_json', None) or '{}'))
+            rows.append(row)
+        captures = capture_table(sorted(rows, key=lambda row: row['fecha']))
+        if columns is not None:
+            captures = captures[['fecha', 'timestamp'] + list(columns)]
+        return captures.reset_index(drop=True)
+
+    def count(self, start: datetime = None, end: datetime = None) -> int:
+        where, _, params = self._range(start, end)
+        return self.connection.execute(f'SELECT COUNT(*) FROM runs {where}', params).fetchone()[0]
+
+
+def _capture_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fila de ``capture_table`` -> parámetros del ``INSERT`` en ``captures``."""
+    record = {'fecha': row['fecha'], 'timestamp': int(pd.Timestamp(row['timestamp']).timestamp())}
+    memory = {}
+    for name, value in row.items():
+        if name in ('fecha', 'timestamp'):
+            continue
+        value = None if pd.isna(value) else (value.item() if hasattr(value, 'item') else value)
+        if name in CAPTURE_DTYPES:
+            record[name] = value
+        elif value is not None:
+            memory[name] = value
+    record['memory_json'] = json.dumps(memory) if memory else None
+    return record
+
+
+def parse_date(value: str) -> datetime:
+    """Fechas de línea de comandos: ``AAAA-MM-DD``, ISO o el formato ``AAAAMMDD_HHMMSS`` de los informes."""
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Historial de rendimiento de TempoSage en SQLite")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--reports-dir', default=REPORTS_DIR)
+    parser.add_argument('--package', default=DEFAULT_PACKAGE)
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para los volcados dumpsys nuevos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('ingest', help="Ingiere los resúmenes CSV y volcados dumpsys nuevos")
+    query = subparsers.add_parser('query', help="Muestra las ejecuciones de un rango de fechas")
+    query.add_argument('--desde', type=parse_date, default=None)
+    query.add_argument('--hasta', type=parse_date, default=None)
+    query.add_argument('--ultimas', type=int, default=None, help="Solo las N ejecuciones más recientes")
+
+    args = parser.parse_args()
+    with PerformanceHistory(args.db) as history:
+        result = history.ingest(args.reports_dir, package=args.package, workers=args.workers)
+        if args.command == 'ingest':
+            print(f"✅ {result['files']} archivos nuevos ({result['runs']} ejecuciones,"
+                  f" {result['captures']} capturas dumpsys) en {args.db}")
+            print(f"  - Total en el historial: {history.count()} ejecuciones")
+            return
+        data = history.query(args.desde, args.hasta, args.ultimas)
+        print(data.to_string(index=False) if len(data) else "Sin ejecuciones en el rango indicado")
+
+
+if __name__ == "__main__":
+    main()
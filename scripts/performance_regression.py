@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Detección de regresiones de rendimiento de TempoSage
+====================================================
+
+Compara la última captura con una línea base móvil formada por las ejecuciones
+anteriores del historial (``performance_history.py``), que guarda tanto los
+resúmenes como las métricas de los volcados dumpsys (``dumpsys_parser.py``). Para cada métrica (PSS, Java heap, CPU,
+porcentaje de frames lentos y percentiles de tiempo de frame) comprueba:
+
+- el presupuesto absoluto (``max``): superarlo siempre es un fallo;
+- la regresión frente a la línea base: la subida debe superar la tolerancia
+  relativa (``tolerance``) y ser estadísticamente significativa, con una
+  puntuación z robusta (mediana y MAD de la línea base) mayor que
+  ``z_threshold``.
+
+Sale con código 1 si alguna métrica falla, para que una caída de rendimiento
+bloquee la publicación.
+
+Uso:
+    python scripts/performance_regression.py
+    python scripts/performance_regression.py --budgets performance_budgets.json --window 20
+    python scripts/performance_regression.py --json performance_reports/regresiones.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dumpsys_parser import CAPTURE_DTYPES, DEFAULT_PACKAGE
+from performance_history import DEFAULT_DB, REPORTS_DIR, PerformanceHistory
+
+# Presupuestos por defecto. Todas las métricas empeoran al subir.
+DEFAULT_BUDGETS = {
+    'window': 10,
+    'min_baseline': 3,
+    'z_threshold': 3.0,
+    'metrics': {
+        'pss_kb': {'max': 300000, 'tolerance': 0.10},
+        'java_heap_kb': {'max': 65536, 'tolerance': 0.15},
+        'cpu_percent': {'max': 30.0, 'tolerance': 0.25},
+        'janky_percent': {'max': 16.0, 'tolerance': 0.25},
+        'frame_p50_ms': {'max': 16.0, 'tolerance': 0.15},
+        'frame_p90_ms': {'max': 24.0, 'tolerance': 0.15},
+        'frame_p95_ms': {'max': 32.0, 'tolerance': 0.15},
+        'frame_p99_ms': {'max': 50.0, 'tolerance': 0.20},
+    },
+}
+
+# Factor que convierte la MAD en una estimación de la desviación típica
+MAD_SCALE = 1.4826
+
+
+def load_budgets(path: Optional[str] = None) -> Dict[str, Any]:
+    """Presupuestos por defecto, sobrescritos por los del JSON ``path`` si se indica.
+
+    El JSON tiene la forma de ``DEFAULT_BUDGETS`` y puede ser parcial, p. ej.
+    ``{"window": 20, "metrics": {"pss_kb": {"max": 250000}}}``.
+    """
+    budgets = json.loads(json.dumps(DEFAULT_BUDGETS))
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        for key, value in custom.items():
+            if key == 'metrics':
+                for metric, limits in value.items():
+                    budgets['metrics'].setdefault(metric, {}).update(limits)
+            else:
+                budgets[key] = value
+    return budgets
+
+
+def load_runs(db_path: str = DEFAULT_DB, reports_dir: str = REPORTS_DIR,
+              package: str = DEFAULT_PACKAGE, limit: Optional[int] = None) -> pd.DataFrame:
+    """Una fila por ejecución con las métricas de los resúmenes y de los volcados dumpsys.
+
+    Cuando una ejecución tiene volcados, sus valores sustituyen a los del
+    resumen CSV, que solo guarda seis columnas y puede estar incompleto.
+    Todo se lee del historial, que solo procesa los archivos nuevos; con
+    ``limit`` solo se cargan las ``limit`` ejecuciones más recientes.
+    """
+    columns = [c for c in DEFAULT_BUDGETS['metrics'] if c in CAPTURE_DTYPES]
+    with PerformanceHistory(db_path) as history:
+        history.ingest(reports_dir, package=package)
+        summaries = history.query(limit=limit)
+        captures = history.query_captures(limit=limit, columns=columns)
+    runs = pd.DataFrame({
+        'fecha': summaries['Fecha'].astype('string'),
+        'timestamp': summaries['Timestamp'],
+        'pss_kb': summaries['Memoria_Total_PSS'],
+        'java_heap_kb': summaries['Java_Heap'],
+        'cpu_percent': summaries['CPU_Usage'],
+        'janky_percent': summaries['Janky_Percent'],
+    })
+    if not captures.empty:
+        dumps = captures.astype({c: 'float64' for c in columns})
+        runs = dumps.set_index('fecha').combine_first(runs.set_index('fecha')).reset_index()
+    # Un 0 en el resumen es el valor por defecto de analizar_rendimiento.sh, no una medida
+    for column in ('pss_kb', 'java_heap_kb'):
+        if column in runs:
+            runs[column] = runs[column].where(runs[column] > 0)
+    runs = runs.sort_values('timestamp', kind='stable')
+    return (runs.tail(limit) if limit else runs).reset_index(drop=True)
+
+
+def robust_zscore(value: float, baseline: np.ndarray) -> float:
+    """Puntuación z de ``value`` frente a la mediana y la MAD de ``baseline``."""
+    median = np.median(baseline)
+    spread = MAD_SCALE * np.median(np.abs(baseline - median))
+    if spread == 0:
+        spread = np.std(baseline, ddof=1) if len(baseline) > 1 else 0.0
+    if spread == 0:
+        return 0.0 if value == median else float(np.sign(value - median)) * np.inf
+    return float((value - median) / spread)
+
+
+def detect_regressions(runs: pd.DataFrame, budgets: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Evalúa la última ejecución de ``runs`` frente a las ``window`` anteriores."""
+    if runs.empty:
+        return []
+    latest = runs.iloc[-1]
+    history = runs.iloc[:-1].tail(budgets['window'])
+    results = []
+    for metric, limits in budgets['metrics'].items():
+        value = latest.get(metric, np.nan)
+        baseline = history[metric].dropna().to_numpy(dtype=np.float64) if metric in history else np.array([])
+        result = {'metric': metric, 'value': None if pd.isna(value) else float(value),
+                  'baseline_median': float(np.median(baseline)) if len(baseline) else None,
+                  'baseline_runs': int(len(baseline)), 'change': None, 'zscore': None, 'status': 'ok'}
+        if pd.isna(value):
+            result['status'] = 'sin_datos'
+            results.append(result)
+            continue
+        if limits.get('max') is not None and value > limits['max']:
+            result['status'] = 'presupuesto'
+        if len(baseline) >= budgets['min_baseline']:
+            median = result['baseline_median']
+            change = (value - median) / median if median else (np.inf if value > 0 else 0.0)
+            zscore = robust_zscore(value, baseline)
+            result['change'], result['zscore'] = float(change), zscore
+            if change > limits.get('tolerance', 0.0) and zscore > budgets['z_threshold'] and result['status'] == 'ok':
+                result['status'] = 'regresion'
+        elif result['status'] == 'ok':
+            result['status'] = 'linea_base_insuficiente'
+        results.append(result)
+    return results
+
+
+def print_report(latest: str, results: List[Dict[str, Any]]):
+    print(f"\n📉 Regresiones de rendimiento (captura {latest}):")
+    print(f"  {'métrica':<16} {'valor':>12} {'mediana base':>14} {'n':>4} {'cambio':>9} {'z':>7}  estado")
+    icons = {'ok': '✅', 'regresion': '❌', 'presupuesto': '❌', 'sin_datos': '⚪', 'linea_base_insuficiente': '⚪'}
+    for r in results:
+        value = f"{r['value']:,.1f}" if r['value'] is not None else '-'
+        median = f"{r['baseline_median']:,.1f}" if r['baseline_median'] is not None else '-'
+        change = f"{r['change'] * 100:+.1f}%" if r['change'] is not None and np.isfinite(r['change']) else '-'
+        zscore = f"{r['zscore']:.1f}" if r['zscore'] is not None and np.isfinite(r['zscore']) else '-'
+        print(f"  {r['metric']:<16} {value:>12} {median:>14} {r['baseline_runs']:>4} {change:>9} {zscore:>7}"
+              f"  {icons[r['status']]} {r['status']}")
+
+
+def failures(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [r for r in results if r['status'] in ('regresion', 'presupuesto')]
+
+
+def run_check(db_path: str = DEFAULT_DB, reports_dir: str = REPORTS_DIR, package: str = DEFAULT_PACKAGE,
+              budgets_path: Optional[str] = None, window: Optional[int] = None,
+              json_path: Optional[str] = None) -> int:
+    """Ejecuta la comprobación completa y devuelve el código de salida (1 si hay fallos)."""
+    budgets = load_budgets(budgets_path)
+    if window:
+        budgets['window'] = window
+    # Solo hacen falta la última ejecución y las ``window`` anteriores
+    runs = load_runs(db_path, reports_dir, package, limit=budgets['window'] + 1)
+    if runs.empty:
+        print("No hay ejecuciones de rendimiento que analizar.")
+        return 0
+    latest = str(runs['fecha'].iloc[-1])
+    results = detect_regressions(runs, budgets)
+    print_report(latest, results)
+    if json_path:
+        os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'latest': latest, 'budgets': budgets, 'results': results}, f, indent=2, ensure_ascii=False)
+    failed = failures(results)
+    if failed:
+        print(f"\n❌ {len(failed)} métricas fuera de presupuesto o con regresión: "
+              + ', '.join(r['metric'] for r in failed))
+        return 1
+    print("\n✅ Sin regresiones de rendimiento")
+    return 0
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Detecta regresiones de rendimiento frente a una línea base móvil")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--reports-dir', default=REPORTS_DIR)
+    parser.add_argument('--package', default=DEFAULT_PACKAGE)
+    parser.add_argument('--budgets', default=None, help="JSON con presupuestos que sobrescriben los de por defecto")
+    parser.add_argument('--window', type=int, default=None, help="Ejecuciones anteriores en la línea base")
+    parser.add_argument('--json', default=None, help="Guarda el resultado en este JSON")
+    args = parser.parse_args()
+    sys.exit(run_check(args.db, args.reports_dir, args.package, args.budgets, args.window, args.json))
+
+
+if __name__ == "__main__":
+    main()
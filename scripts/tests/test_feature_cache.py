@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from feature_cache import COLUMN_ALIASES, NUMERIC_FEATURES, TASK_TARGETS, find_features, load_features
+from generate_perfect_training_dataset import TempoSageDatasetGenerator
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Dataset completo y metadatos escritos por el generador, como en ``data/``."""
+    generator = TempoSageDatasetGenerator(seed=3)
+    generator.total_records = 300
+    generator.save_dataset_streaming(str(tmp_path), chunk_size=120, full='csv')
+    return str(tmp_path / 'temposage_full_dataset.csv'), str(tmp_path / 'dataset_metadata.json')
+
+
+def test_cache_builds_from_generator_output(tmp_path, generated):
+    csv_path, metadata_path = generated
+    features = load_features(csv_path, metadata_path, cache_dir=str(tmp_path / 'cache'))
+    assert len(features) == 300
+    assert features.features.shape == (300, len(features.feature_names))
+    assert features.feature_names[:len(NUMERIC_FEATURES)] == NUMERIC_FEATURES
+    df = pd.read_csv(csv_path)
+    stats = features.manifest['normalization']
+    expected = (df[NUMERIC_FEATURES].to_numpy() - stats['offset']) / stats['scale']
+    np.testing.assert_allclose(features.features[:, :len(NUMERIC_FEATURES)], expected, rtol=1e-5, atol=1e-5)
+    for task, spec in TASK_TARGETS.items():
+        np.testing.assert_allclose(features.targets[task], df[spec['targets']].to_numpy(), rtol=1e-6)
+
+
+def test_legacy_column_names_are_mapped(tmp_path, generated):
+    csv_path, metadata_path = generated
+    legacy = tmp_path / 'legacy.csv'
+    pd.read_csv(csv_path).rename(columns={v: k for k, v in COLUMN_ALIASES.items()}).to_csv(legacy, index=False)
+    cache_dir = str(tmp_path / 'cache')
+    original = load_features(csv_path, metadata_path, cache_dir=cache_dir)
+    renamed = load_features(str(legacy), metadata_path, cache_dir=cache_dir)
+    np.testing.assert_array_equal(original.features, renamed.features)
+
+
+def test_malformed_and_incomplete_csv_are_reported(tmp_path, generated):
+    csv_path, metadata_path = generated
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        header, first = f.readline(), f.readline()
+    widened = tmp_path / 'widened.csv'
+    widened.write_text(header + first.rstrip('\n') + ',extra\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='mal formado'):
+        load_features(str(widened), metadata_path, cache_dir=str(tmp_path / 'cache'))
+
+    incomplete = tmp_path / 'incomplete.csv'
+    pd.read_csv(csv_path).drop(columns=['mood', 'burnout_risk']).to_csv(incomplete, index=False)
+    with pytest.raises(ValueError, match='faltan 2 columnas: mood, burnout_risk'):
+        load_features(str(incomplete), metadata_path, cache_dir=str(tmp_path / 'cache'))
+
+
+def test_rebuild_only_removes_entries_of_the_same_csv(tmp_path, generated):
+    csv_path, metadata_path = generated
+    other = tmp_path / 'other.csv'
+    pd.read_csv(csv_path).head(100).to_csv(other, index=False)
+    cache_dir = str(tmp_path / 'cache')
+    kept = [load_features(str(other), metadata_path, cache_dir=cache_dir),
+            load_features(str(other), metadata_path, {'encoding': 'index'}, cache_dir=cache_dir)]
+    old = load_features(csv_path, metadata_path, cache_dir=cache_dir)
+
+    # Nueva versión del CSV: su entrada anterior sobra, las de other.csv (ambas
+    # codificaciones) no
+    pd.read_csv(csv_path).head(200).to_csv(csv_path, index=False)
+    new = load_features(csv_path, metadata_path, cache_dir=cache_dir)
+    assert len(new) == 200
+    assert not os.path.exists(old.path)
+    assert all(os.path.exists(os.path.join(entry.path, 'manifest.json')) for entry in kept)
+
+
+def test_find_features_does_not_build(tmp_path, generated):
+    csv_path, metadata_path = generated
+    cache_dir = tmp_path / 'cache'
+    assert find_features(csv_path, metadata_path, cache_dir=str(cache_dir)) is None
+    assert not cache_dir.exists()
+    built = load_features(csv_path, metadata_path, cache_dir=str(cache_dir))
+    assert find_features(csv_path, metadata_path, cache_dir=str(cache_dir)).key == built.key
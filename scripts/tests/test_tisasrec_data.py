@@ -0,0 +1,124 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tisasrec_data import (build_relation_index, build_sequence_store, load_relation_index,
+                           load_sequence_store, open_relation_index)
+
+MAXLEN = 8
+TIME_SPAN = 16
+
+
+def _pickle_relations(interactions, maxlen, time_span):
+    """Matrices como ``Relation``/``computeRePos`` del TiSASRec original (las del pickle)."""
+    by_user = {}
+    for user, item, timestamp in interactions:
+        by_user.setdefault(user, []).append((item, timestamp))
+    relations = {}
+    for user, sequence in by_user.items():
+        sequence.sort(key=lambda x: x[1])
+        times = sorted({t for _, t in sequence})
+        diffs = [b - a for a, b in zip(times, times[1:]) if b - a]
+        scale = min(diffs) if diffs else 1
+        scaled = [(item, int(round((t - times[0]) / scale) + 1)) for item, t in sequence]
+        train = scaled[:-2] if len(scaled) >= 3 else scaled
+        time_seq = np.zeros(maxlen, dtype=np.int32)
+        idx = maxlen - 1
+        for _, t in reversed(train[:-1]):
+            time_seq[idx] = t
+            idx -= 1
+            if idx == -1:
+                break
+        matrix = np.zeros((maxlen, maxlen), dtype=np.int32)
+        for i in range(maxlen):
+            for j in range(maxlen):
+                matrix[i][j] = min(abs(int(time_seq[i]) - int(time_seq[j])), time_span)
+        relations[user] = matrix
+    return relations
+
+
+def _interactions(seed, users=(1, 2, 3, 5, 8, 13), max_len=20):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for user in users:
+        start = int(rng.integers(1_600_000_000, 1_700_000_000))
+        steps = rng.choice([0, 60, 120, 3600, 86400], size=int(rng.integers(1, max_len)))
+        for step in np.cumsum(steps):
+            rows.append((user, int(rng.integers(1, 50)), start + int(step)))
+    return rows
+
+
+def _write(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(f'{u} {i} {t}\n' for u, i, t in rows)
+
+
+def _assert_parity(index, expected):
+    actual = index.as_dict()
+    assert sorted(actual) == sorted(expected)
+    for user, matrix in expected.items():
+        np.testing.assert_array_equal(actual[user], matrix)
+    users = sorted(expected)
+    np.testing.assert_array_equal(index.batch(users), np.stack([expected[u] for u in users]))
+
+
+@pytest.mark.parametrize('materialize', [False, True])
+def test_relation_index_matches_pickle_path(tmp_path, materialize):
+    rows = _interactions(seed=7)
+    source = tmp_path / 'interactions.txt'
+    _write(source, rows)
+    store = build_sequence_store(str(source), str(tmp_path / 'seq'))
+    index = build_relation_index(store, str(tmp_path / 'rel'), MAXLEN, TIME_SPAN, materialize)
+    _assert_parity(index, _pickle_relations(rows, MAXLEN, TIME_SPAN))
+    _assert_parity(open_relation_index(str(tmp_path / 'rel')), _pickle_relations(rows, MAXLEN, TIME_SPAN))
+
+
+def test_incremental_rebuild_matches_pickle_path(tmp_path):
+    source = tmp_path / 'interactions.txt'
+    rows = _interactions(seed=11)
+    _write(source, rows)
+    build_relation_index(build_sequence_store(str(source), str(tmp_path / 'seq')),
+                         str(tmp_path / 'rel'), MAXLEN, TIME_SPAN)
+
+    # Usuarios nuevos e interacciones añadidas a usuarios existentes
+    rows += _interactions(seed=12, users=(2, 21, 34))
+    _write(source, rows)
+    index = build_relation_index(build_sequence_store(str(source), str(tmp_path / 'seq')),
+                                 str(tmp_path / 'rel'), MAXLEN, TIME_SPAN)
+    _assert_parity(index, _pickle_relations(rows, MAXLEN, TIME_SPAN))
+
+
+def test_reload_after_appending_to_an_existing_user(tmp_path):
+    source = tmp_path / 'interactions.txt'
+    store_dir, relation_dir = str(tmp_path / 'seq'), str(tmp_path / 'rel')
+    rows = _interactions(seed=5)
+    _write(source, rows)
+    load_relation_index(str(source), MAXLEN, TIME_SPAN, relation_dir, store_dir)
+
+    # Mismos usuarios, más interacciones para uno existente; otro llamador
+    # (p. ej. batch_scoring.py) refresca el almacén antes que el índice
+    last = max(t for u, _, t in rows if u == 3)
+    rows += [(3, 7, last + 60), (3, 9, last + 180)]
+    _write(source, rows)
+    os.utime(source, ns=(os.stat(source).st_atime_ns, os.stat(source).st_mtime_ns + 1_000_000_000))
+    load_sequence_store(str(source), store_dir)
+
+    index = load_relation_index(str(source), MAXLEN, TIME_SPAN, relation_dir, store_dir)
+    _assert_parity(index, _pickle_relations(rows, MAXLEN, TIME_SPAN))
+
+
+def test_unknown_user_raises_key_error(tmp_path):
+    source = tmp_path / 'interactions.txt'
+    _write(source, _interactions(seed=3, users=(1, 4, 9)))
+    index = build_relation_index(build_sequence_store(str(source), str(tmp_path / 'seq')),
+                                 str(tmp_path / 'rel'), MAXLEN, TIME_SPAN)
+    for user in (0, 2, 10):
+        with pytest.raises(KeyError):
+            index.matrix(user)
+    with pytest.raises(KeyError):
+        index.batch([1, 2])
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Utilidades comunes para ejecutar y medir modelos TensorFlow Lite de TempoSage.
+
+Se usan desde ``create_model.py`` (informe de cuantización) y desde el
+benchmark de modelos. Preferimos el intérprete de LiteRT (``ai_edge_litert``)
+si está instalado y si no el de ``tf.lite``.
+"""
+
+import time
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    from ai_edge_litert.interpreter import Interpreter as _Interpreter
+except ImportError:  # pragma: no cover - depende del entorno
+    try:
+        from tflite_runtime.interpreter import Interpreter as _Interpreter
+    except ImportError:
+        import tensorflow as tf
+        _Interpreter = tf.lite.Interpreter
+
+
+def make_interpreter(model_path: str, num_threads: int = None):
+    """Crea un intérprete para ``model_path`` (sin reservar tensores)."""
+    if num_threads is None:
+        return _Interpreter(model_path=model_path)
+    return _Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+def resize_batch(interpreter, batch_size: int):
+    """Ajusta la dimensión de lote de todas las entradas y reserva tensores."""
+    for detail in interpreter.get_input_details():
+        shape = list(detail["shape"])
+        if shape and shape[0] != batch_size:
+            shape[0] = batch_size
+            interpreter.resize_tensor_input(detail["index"], shape)
+    interpreter.allocate_tensors()
+
+
+def random_inputs(interpreter, batch_size: int = None, seed: int = 0, high: int = None) -> List[np.ndarray]:
+    """Entradas sintéticas con la forma y el dtype de cada entrada del modelo.
+
+    Las entradas enteras (ids, intervalos) se generan en ``[0, high)``; si no
+    se indica ``high`` se usa 2, valor válido para cualquier embedding.
+    """
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for detail in interpreter.get_input_details():
+        shape = list(detail["shape"])
+        if batch_size is not None and shape:
+            shape[0] = batch_size
+        dtype = detail["dtype"]
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            upper = min(high or 2, info.max)
+            inputs.append(rng.integers(max(0, info.min), upper, size=shape).astype(dtype))
+        else:
+            inputs.append(rng.random(shape).astype(dtype))
+    return inputs
+
+
+def invoke(interpreter, inputs: List[np.ndarray]) -> List[np.ndarray]:
+    """Asigna ``inputs`` en orden, ejecuta y devuelve copias de las salidas."""
+    for detail, value in zip(interpreter.get_input_details(), inputs):
+        interpreter.set_tensor(detail["index"], value)
+    interpreter.invoke()
+    return [interpreter.get_tensor(detail["index"]).copy() for detail in interpreter.get_output_details()]
+
+
+def input_order(interpreter, names: List[str]) -> List[int]:
+    """Posición de cada nombre de ``names`` en ``get_input_details()``.
+
+    Los nombres exportados llevan prefijo y sufijo (``serving_default_item_seq:0``),
+    así que basta con que el nombre aparezca dentro del de la entrada.
+    """
+    details = interpreter.get_input_details()
+    order = []
+    for name in names:
+        matches = [i for i, detail in enumerate(details) if name in detail["name"]]
+        if not matches:
+            raise KeyError(f"El modelo no tiene la entrada {name!r}")
+        order.append(matches[0])
+    return order
+
+
+def invoke_named(interpreter, inputs: Dict[str, np.ndarray]) -> List[np.ndarray]:
+    """Como ``invoke`` pero asigna las entradas por nombre en vez de por posición."""
+    details = interpreter.get_input_details()
+    for position, value in zip(input_order(interpreter, list(inputs)), inputs.values()):
+        interpreter.set_tensor(details[position]["index"], value)
+    interpreter.invoke()
+    return [interpreter.get_tensor(detail["index"]).copy() for detail in interpreter.get_output_details()]
+
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    """Resumen en milisegundos de una lista de tiempos en segundos."""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    if len(values) == 0:
+        return {}
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "min_ms": float(values.min()),
+        "max_ms": float(values.max()),
+        "runs": int(len(values)),
+    }
+
+
+def measure_latency(interpreter, inputs: List[np.ndarray], runs: int = 100, warmup: int = 5) -> Dict[str, float]:
+    """Latencia de ``invoke`` con las entradas ya asignadas."""
+    for detail, value in zip(interpreter.get_input_details(), inputs):
+        interpreter.set_tensor(detail["index"], value)
+    for _ in range(warmup):
+        interpreter.invoke()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        interpreter.invoke()
+        samples.append(time.perf_counter() - started)
+    return latency_stats(samples)
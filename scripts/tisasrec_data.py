@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Almacén compacto de secuencias para TiSASRec
+============================================
+
+Convierte el log de interacciones ``data/temposage_unified.txt`` (líneas
+``usuario item timestamp``) en arrays NumPy estilo CSR que se abren con
+``mmap``:
+
+    <directorio>/users.npy       int32  ids de usuario ordenados (U)
+    <directorio>/offsets.npy     int32  inicio de cada usuario en items/timestamps (U + 1)
+    <directorio>/items.npy       int32  ids de item ordenados por usuario y tiempo (N)
+    <directorio>/timestamps.npy  int64  timestamps alineados con items (N)
+    <directorio>/manifest.json   tamaño y mtime del texto de origen
+
+Obtener la secuencia de un usuario es un slice ``offsets[u]:offsets[u + 1]``
+(O(1)). El texto solo se vuelve a parsear cuando cambia su tamaño o su fecha
+de modificación.
+
+Además construye el índice de intervalos temporales que sustituye a
+``relation_matrix_temposage_unified_50_256.pickle``. En lugar de guardar una
+matriz densa de 50x50 por usuario, guarda la secuencia de tiempos escalados
+de cada usuario (``maxlen`` enteros) y calcula las matrices de relación por
+lote, con caché LRU. Opcionalmente las materializa en un array ``uint8``
+(``uint16`` si ``time_span`` > 255) abierto con ``mmap``. Cuando se añaden
+interacciones solo se recalculan los usuarios cuya secuencia cambió.
+
+Uso:
+    python scripts/tisasrec_data.py build data/temposage_unified.txt
+    python scripts/tisasrec_data.py relations data/temposage_unified.txt --maxlen 50 --time-span 256
+"""
+
+import argparse
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+DEFAULT_SOURCE = os.path.join('data', 'temposage_unified.txt')
+
+
+def default_store_dir(source: str) -> str:
+    """Directorio del almacén junto al texto: ``temposage_unified.txt`` -> ``temposage_unified_seq/``."""
+    return os.path.splitext(source)[0] + '_seq'
+
+
+def _source_signature(source: str) -> dict:
+    stat = os.stat(source)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class SequenceStore:
+    """Secuencias de interacción por usuario respaldadas por arrays (posiblemente mmap)."""
+
+    def __init__(self, users: np.ndarray, offsets: np.ndarray, items: np.ndarray,
+                 timestamps: np.ndarray, path: str = None):
+        self.users = users
+        self.offsets = offsets
+        self.items = items
+        self.timestamps = timestamps
+        self.path = path
+        # Si los ids son 1..U consecutivos el índice de usuario es directo
+        self._dense = len(users) == 0 or (users[0] == 1 and users[-1] == len(users))
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    @property
+    def num_users(self) -> int:
+        return len(self.users)
+
+    @property
+    def num_interactions(self) -> int:
+        return len(self.items)
+
+    @property
+    def num_items(self) -> int:
+        """Mayor id de item (los ids de TiSASRec empiezan en 1; 0 es padding)."""
+        return int(self.items.max()) if len(self.items) else 0
+
+    def user_index(self, user_id: int) -> int:
+        """Posición de ``user_id`` en ``users``; ``KeyError`` si no existe."""
+        if self._dense:
+            index = int(user_id) - 1
+            if 0 <= index < len(self.users):
+                return index
+        else:
+            index = int(np.searchsorted(self.users, user_id))
+            if index < len(self.users) and self.users[index] == user_id:
+                return index
+        raise KeyError(user_id)
+
+    def sequence_at(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Items y timestamps del usuario en la posición ``index`` (vistas, sin copia)."""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.items[start:end], self.timestamps[start:end]
+
+    def sequence(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Items y timestamps de ``user_id`` ordenados por tiempo."""
+        return self.sequence_at(self.user_index(user_id))
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+
+def parse_interactions(source: str) -> pd.DataFrame:
+    """Parsea el texto ``usuario item timestamp`` con el lector C de pandas."""
+    return pd.read_csv(source, sep=r'\s+', header=None, names=['user', 'item', 'timestamp'],
+                       dtype={'user': np.int64, 'item': np.int64, 'timestamp': np.int64},
+                       engine='c')
+
+
+def build_sequence_store(source: str = DEFAULT_SOURCE, store_dir: str = None) -> SequenceStore:
+    """Parsea ``source`` y escribe el almacén CSR en ``store_dir``."""
+    store_dir = store_dir or default_store_dir(source)
+    signature = _source_signature(source)
+    df = parse_interactions(source)
+
+    users_raw = df['user'].to_numpy()
+    items_raw = df['item'].to_numpy()
+    timestamps_raw = df['timestamp'].to_numpy()
+    for name, values in (('usuario', users_raw), ('item', items_raw)):
+        if len(values) and (values.min() < 0 or values.max() > np.iinfo(np.int32).max):
+            raise ValueError(f"Ids de {name} fuera del rango int32 en {source}")
+
+    # Orden estable por usuario y tiempo (conserva el orden original en empates)
+    order = np.lexsort((timestamps_raw, users_raw))
+    users_sorted = users_raw[order]
+    users, counts = np.unique(users_sorted, return_counts=True)
+    offsets = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if offsets[-1] > np.iinfo(np.int32).max:
+        raise ValueError("Demasiadas interacciones para offsets int32")
+
+    arrays = {
+        'users': users.astype(np.int32),
+        'offsets': offsets.astype(np.int32),
+        'items': items_raw[order].astype(np.int32),
+        'timestamps': timestamps_raw[order].astype(np.int64),
+    }
+    os.makedirs(store_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(store_dir, f'{name}.npy'), array)
+
+    manifest = {
+        'version': STORE_VERSION,
+        'source': os.path.abspath(source),
+        'source_signature': signature,
+        'num_users': int(len(users)),
+        'num_interactions': int(len(df)),
+        'num_items': int(arrays['items'].max()) if len(df) else 0,
+    }
+    # El manifiesto se escribe al final: si falta, el almacén se considera incompleto
+    tmp_path = os.path.join(store_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(store_dir, 'manifest.json'))
+    return SequenceStore(**arrays, path=store_dir)
+
+
+def is_store_fresh(source: str, store_dir: str) -> bool:
+    """``True`` si el almacén existe y corresponde a la versión actual de ``source``."""
+    manifest_path = os.path.join(store_dir, 'manifest.json')
+    if not os.path.isfile(manifest_path):
+        return False
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return (manifest.get('version') == STORE_VERSION
+            and manifest.get('source_signature') == _source_signature(source))
+
+
+def open_sequence_store(store_dir: str, mmap: bool = True) -> SequenceStore:
+    """Abre un almacén ya construido sin consultar el texto de origen."""
+    mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode=mode)
+        for name in ('users', 'offsets', 'items', 'timestamps')
+    }
+    return SequenceStore(**arrays, path=store_dir)
+
+
+def load_sequence_store(source: str = DEFAULT_SOURCE, store_dir: str = None,
+                        mmap: bool = True) -> SequenceStore:
+    """Abre el almacén de ``source`` y lo reconstruye solo si el texto cambió."""
+    store_dir = store_dir or default_store_dir(source)
+    if not is_store_fresh(source, store_dir):
+        build_sequence_store(source, store_dir)
+    return open_sequence_store(store_dir, mmap=mmap)
+
+
+def scaled_times(timestamps: np.ndarray) -> np.ndarray:
+    """Escala personalizada de TiSASRec: ``round((t - t_min) / escala) + 1``.
+
+    La escala de cada usuario es su menor diferencia no nula entre
+    interacciones consecutivas (1 si todas coinciden).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return timestamps
+    diffs = np.diff(timestamps)
+    nonzero = diffs[diffs != 0]
+    scale = nonzero.min() if len(nonzero) else 1
+    return np.round((timestamps - timestamps.min()) / scale).astype(np.int64) + 1
+
+
+def train_time_sequence(timestamps: np.ndarray, maxlen: int) -> np.ndarray:
+    """Tiempos escalados que TiSASRec usa para la matriz de relación de entrenamiento.
+
+    Igual que ``Relation`` del código original: se reservan las dos últimas
+    interacciones (validación y test), se descarta el último objetivo de
+    entrenamiento y se toman las ``maxlen`` más recientes, con ceros a la izquierda.
+    """
+    times = scaled_times(timestamps)
+    train = times[:-2] if len(times) >= 3 else times
+    history = train[:-1][-maxlen:]
+    sequence = np.zeros(maxlen, dtype=np.int64)
+    if len(history):
+        sequence[maxlen - len(history):] = history
+    return sequence
+
+
+def serving_sequences(store: SequenceStore, indices: Iterable[int], maxlen: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Entradas de inferencia: las ``maxlen`` interacciones más recientes de cada usuario.
+
+    A diferencia de ``train_time_sequence`` no se reserva nada: se usa el
+    historial completo para predecir el siguiente item. Devuelve items
+    ``(B, maxlen)`` int32 y tiempos escalados ``(B, maxlen)`` int64, con ceros a
+    la izquierda.
+    """
+    indices = np.asarray(list(indices), dtype=np.int64)
+    item_seqs = np.zeros((len(indices), maxlen), dtype=np.int32)
+    time_seqs = np.zeros((len(indices), maxlen), dtype=np.int64)
+    for row, index in enumerate(indices):
+        items, timestamps = store.sequence_at(index)
+        length = min(len(items), maxlen)
+        if length:
+            item_seqs[row, maxlen - length:] = items[-length:]
+            time_seqs[row, maxlen - length:] = scaled_times(timestamps)[-length:]
+    return item_seqs, time_seqs
+
+
+def relation_matrices(time_sequences: np.ndarray, time_span: int, dtype=None) -> np.ndarray:
+    """Matrices ``min(|t_i - t_j|, time_span)`` para un lote ``(B, maxlen)``."""
+    time_sequences = np.asarray(time_sequences, dtype=np.int64)
+    spans = np.abs(time_sequences[:, :, None] - time_sequences[:, None, :])
+    np.minimum(spans, time_span, out=spans)
+    return spans.astype(dtype or relation_dtype(time_span))
+
+
+def relation_dtype(time_span: int) -> np.dtype:
+    """Menor entero sin signo capaz de guardar valores en ``[0, time_span]``."""
+    return np.dtype(np.uint8) if time_span <= np.iinfo(np.uint8).max else np.dtype(np.uint16)
+
+
+def default_relation_dir(source: str, maxlen: int, time_span: int) -> str:
+    return os.path.splitext(source)[0] + f'_rel_{maxlen}_{time_span}'
+
+
+class RelationIndex:
+    """Índice de intervalos temporales por usuario para TiSASRec.
+
+    ``time_seqs[u]`` contiene los ``maxlen`` tiempos escalados del usuario en la
+    posición ``u`` del almacén de secuencias; las matrices se derivan de ahí.
+    ``users`` está ordenado, así que los usuarios se buscan con ``searchsorted``
+    sin construir un diccionario sobre el array mapeado.
+    """
+
+    def __init__(self, users: np.ndarray, time_seqs: np.ndarray, time_span: int,
+                 path: str = None, cache_size: int = 4096):
+        self.users = users
+        self.time_seqs = time_seqs
+        self.maxlen = time_seqs.shape[1] if time_seqs.ndim == 2 else 0
+        self.time_span = time_span
+        self.dtype = relation_dtype(time_span)
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._dense = None
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _matrix_at(self, index: int) -> np.ndarray:
+        if self._dense is not None:
+            return self._dense[index]
+        matrix = self._cache.get(index)
+        if matrix is None:
+            matrix = relation_matrices(self.time_seqs[index:index + 1], self.time_span, self.dtype)[0]
+            self._cache[index] = matrix
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(index)
+        return matrix
+
+    def user_indices(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Posiciones de ``user_ids`` en ``users``; ``KeyError`` si alguno no existe."""
+        user_ids = np.asarray(user_ids if isinstance(user_ids, np.ndarray) else list(user_ids), dtype=np.int64)
+        indices = np.searchsorted(self.users, user_ids)
+        found = indices < len(self.users)
+        found[found] = self.users[indices[found]] == user_ids[found]
+        if not found.all():
+            raise KeyError(int(user_ids[~found][0]))
+        return indices
+
+    def matrix(self, user_id: int) -> np.ndarray:
+        """Matriz ``(maxlen, maxlen)`` de ``user_id``."""
+        return self._matrix_at(int(self.user_indices([user_id])[0]))
+
+    def batch(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Matrices ``(B, maxlen, maxlen)`` de un lote, calculadas de una vez."""
+        indices = self.user_indices(user_ids)
+        if self._dense is not None:
+            return np.asarray(self._dense[indices])
+        return relation_matrices(self.time_seqs[indices], self.time_span, self.dtype)
+
+    def attach_dense(self, dense: np.ndarray):
+        """Usa un array denso materializado (normalmente ``mmap``) en vez de calcular."""
+        self._dense = dense
+
+    def as_dict(self) -> Dict[int, np.ndarray]:
+        """Mismo formato que el pickle original: ``{usuario: matriz int32}``."""
+        return {int(user): self._matrix_at(i).astype(np.int32) for i, user in enumerate(self.users)}
+
+
+def store_signature(store: SequenceStore) -> dict:
+    """Firma del texto de origen con la que se construyó ``store`` (``None`` si no está en disco)."""
+    manifest_path = os.path.join(store.path, 'manifest.json') if store.path else None
+    if not manifest_path or not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('source_signature')
+
+
+def sequence_signature(store: SequenceStore) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitud y último timestamp por usuario: detectan secuencias modificadas."""
+    lengths = store.lengths().astype(np.int64)
+    last = np.zeros(len(store.users), dtype=np.int64)
+    nonempty = lengths > 0
+    last[nonempty] = np.asarray(store.timestamps)[np.asarray(store.offsets[1:])[nonempty] - 1]
+    return lengths, last
+
+
+def build_relation_index(store: SequenceStore, relation_dir: str, maxlen: int = 50,
+                         time_span: int = 256, materialize: bool = False) -> RelationIndex:
+    """Construye (o actualiza incrementalmente) el índice de relaciones en ``relation_dir``.
+
+    Si ya existe un índice con los mismos ``maxlen``/``time_span``, solo se
+    recalculan los usuarios nuevos o cuya longitud o último timestamp cambió.
+    """
+    os.makedirs(relation_dir, exist_ok=True)
+    lengths, last = sequence_signature(store)
+    users = np.asarray(store.users)
+    time_seqs = np.zeros((len(users), maxlen), dtype=np.int64)
+    changed = np.ones(len(users), dtype=bool)
+
+    manifest_path = os.path.join(relation_dir, 'manifest.json')
+    previous = None
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    if previous and previous.get('maxlen') == maxlen and previous.get('time_span') == time_span:
+        old = {name: np.load(os.path.join(relation_dir, f'{name}.npy'))
+               for name in ('users', 'lengths', 'last_timestamps', 'time_seqs')}
+        position = np.searchsorted(old['users'], users)
+        position = np.minimum(position, max(len(old['users']) - 1, 0))
+        if len(old['users']):
+            known = old['users'][position] == users
+        else:
+            known = np.zeros(len(users), dtype=bool)
+        same = known & (old['lengths'][position] == lengths) & (old['last_timestamps'][position] == last)
+        time_seqs[same] = old['time_seqs'][position[same]]
+        changed = ~same
+
+    for index in np.flatnonzero(changed):
+        _, timestamps = store.sequence_at(index)
+        time_seqs[index] = train_time_sequence(timestamps, maxlen)
+
+    for name, array in (('users', users.astype(np.int32)), ('lengths', lengths),
+                        ('last_timestamps', last), ('time_seqs', time_seqs)):
+        np.save(os.path.join(relation_dir, f'{name}.npy'), array)
+
+    dense_path = os.path.join(relation_dir, 'relations.npy')
+    if materialize:
+        dtype = relation_dtype(time_span)
+        dense = np.lib.format.open_memmap(dense_path + '.tmp', mode='w+', dtype=dtype,
+                                          shape=(len(users), maxlen, maxlen))
+        # Por bloques para que la memoria no dependa del número de usuarios
+        for start in range(0, len(users), 1024):
+            dense[start:start + 1024] = relation_matrices(time_seqs[start:start + 1024], time_span, dtype)
+        dense.flush()
+        del dense
+        os.replace(dense_path + '.tmp', dense_path)
+    elif os.path.exists(dense_path):
+        os.remove(dense_path)
+
+    manifest = {
+        'version': STORE_VERSION,
+        'maxlen': maxlen,
+        'time_span': time_span,
+        'dtype': relation_dtype(time_span).name,
+        'num_users': int(len(users)),
+        'store_signature': store_signature(store),
+        'updated_users': int(changed.sum()),
+        'materialized': materialize,
+    }
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return open_relation_index(relation_dir)
+
+
+def open_relation_index(relation_dir: str, cache_size: int = 4096) -> RelationIndex:
+    """Abre un índice de relaciones con ``mmap``."""
+    with open(os.path.join(relation_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    index = RelationIndex(
+        np.load(os.path.join(relation_dir, 'users.npy'), mmap_mode='r'),
+        np.load(os.path.join(relation_dir, 'time_seqs.npy'), mmap_mode='r'),
+        manifest['time_span'], path=relation_dir, cache_size=cache_size,
+    )
+    dense_path = os.path.join(relation_dir, 'relations.npy')
+    if manifest.get('materialized') and os.path.exists(dense_path):
+        index.attach_dense(np.load(dense_path, mmap_mode='r'))
+    return index
+
+
+def load_relation_index(source: str = DEFAULT_SOURCE, maxlen: int = 50, time_span: int = 256,
+                        relation_dir: str = None, store_dir: str = None,
+                        materialize: bool = False) -> RelationIndex:
+    """Abre el índice de relaciones de ``source``, actualizándolo si el texto cambió.
+
+    El manifiesto del índice guarda la firma del texto con la que se construyó
+    el almacén, así que se detectan también los cambios que otro llamador
+    (``load_sequence_store``) ya aplicó al almacén.
+    """
+    relation_dir = relation_dir or default_relation_dir(source, maxlen, time_span)
+    store_dir = store_dir or default_store_dir(source)
+    store = load_sequence_store(source, store_dir)
+    manifest_path = os.path.join(relation_dir, 'manifest.json')
+    if not os.path.isfile(manifest_path):
+        return build_relation_index(store, relation_dir, maxlen, time_span, materialize)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if (manifest.get('maxlen') != maxlen or manifest.get('time_span') != time_span
+            or manifest.get('store_signature') != store_signature(store)
+            or manifest.get('num_users') != store.num_users
+            or bool(manifest.get('materialized')) != materialize):
+        return build_relation_index(store, relation_dir, maxlen, time_span, materialize)
+    return open_relation_index(relation_dir)
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Almacén de secuencias TiSASRec de TempoSage")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Convierte el log de texto al almacén compacto")
+    build.add_argument('source', nargs='?', default=DEFAULT_SOURCE)
+    build.add_argument('--store-dir', default=None)
+    build.add_argument('--force', action='store_true', help="Reconstruye aunque el texto no haya cambiado")
+
+    relations = subparsers.add_parser('relations', help="Construye o actualiza el índice de relaciones temporales")
+    relations.add_argument('source', nargs='?', default=DEFAULT_SOURCE)
+    relations.add_argument('--store-dir', default=None)
+    relations.add_argument('--relation-dir', default=None)
+    relations.add_argument('--maxlen', type=int, default=50)
+    relations.add_argument('--time-span', type=int, default=256)
+    relations.add_argument('--materialize', action='store_true',
+                           help="Guarda también las matrices densas en un array mmap")
+
+    args = parser.parse_args()
+    store_dir = args.store_dir or default_store_dir(args.source)
+    if args.command == 'relations':
+        relation_dir = args.relation_dir or default_relation_dir(args.source, args.maxlen, args.time_span)
+        store = load_sequence_store(args.source, store_dir)
+        index = build_relation_index(store, relation_dir, args.maxlen, args.time_span, args.materialize)
+        with open(os.path.join(relation_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        print(f"✅ Índice de relaciones en {relation_dir}")
+        print(f"  - Usuarios: {len(index):,} ({manifest['updated_users']:,} recalculados)")
+        print(f"  - maxlen={args.maxlen}, time_span={args.time_span}, dtype={manifest['dtype']}")
+        return
+
+    if args.force or not is_store_fresh(args.source, store_dir):
+        store = build_sequence_store(args.source, store_dir)
+        print(f"✅ Almacén de secuencias generado en {store_dir}")
+    else:
+        store = open_sequence_store(store_dir)
+        print(f"El almacén de {store_dir} ya está actualizado")
+    lengths = store.lengths()
+    print(f"  - Usuarios: {store.num_users:,}")
+    print(f"  - Interacciones: {store.num_interactions:,}")
+    print(f"  - Items: {store.num_items:,}")
+    if len(lengths):
+        print(f"  - Longitud de secuencia: media {lengths.mean():.1f}, máx {lengths.max()}")
+
+
+if __name__ == "__main__":
+    main()
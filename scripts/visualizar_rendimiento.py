@@ -4,56 +4,184 @@
 """
 Visualizador de métricas de rendimiento para TempoSage
 Este script genera gráficos a partir de los datos de rendimiento recopilados.
+Los resúmenes y los volcados dumpsys se ingieren de forma incremental en el
+historial SQLite (ver performance_history.py) y solo se consulta el rango de
+fechas pedido.
+
+Uso:
+    python scripts/visualizar_rendimiento.py
+    python scripts/visualizar_rendimiento.py --desde 2025-05-01 --hasta 2025-06-01
+    python scripts/visualizar_rendimiento.py --ultimas 100
+    python scripts/visualizar_rendimiento.py --analizar --presupuestos performance_budgets.json
+    python scripts/visualizar_rendimiento.py --reporte --formato html --max-puntos 500
+
+El modo ``--reporte`` no usa pyplot: dibuja todos los paneles en una sola
+figura con el backend Agg, pide al historial las series ya reducidas a
+``--max-puntos`` puntos (la agrupación se hace en SQLite) y libera la figura
+al terminar, así que el tiempo y la memoria no crecen con el historial.
 """
 
+import argparse
+import base64
+import io
 import os
 import sys
 import glob
-import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 
 # Verificar dependencias
 try:
     import pandas as pd
-    import matplotlib.pyplot as plt
+    import matplotlib
+    import matplotlib.style
 except ImportError:
     print("Error: Este script requiere pandas y matplotlib.")
     print("Instala las dependencias con: pip install pandas matplotlib")
     sys.exit(1)
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dumpsys_parser import PERCENTILES
+from performance_history import DEFAULT_DB, PerformanceHistory, parse_date
+from performance_regression import run_check
+
+
+GRAPHS_DIR = 'performance_reports/graficos'
+DEFAULT_MAX_POINTS = 500
+
+
+def render_report(runs: pd.DataFrame, captures: pd.DataFrame, latest: pd.DataFrame, total_runs: int,
+                  output_path: str, output_format: str = 'png') -> str:
+    """Dibuja todos los paneles en una sola figura Agg y la guarda como PNG o HTML.
+
+    ``runs`` y ``captures`` son las series ya reducidas por el historial
+    (``max_points``); ``latest`` son las últimas ejecuciones sin reducir para
+    la tabla del informe HTML.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    columns = [f'frame_p{q}_ms' for q in PERCENTILES]
+    frames = captures.dropna(how='all', subset=columns)
+
+    # Figure sin pyplot: no queda registrada en ningún gestor global de figuras
+    figure = Figure(figsize=(12, 15))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(5, 1, sharex=True)
+    try:
+        axes[0].plot(runs['Timestamp'], runs['Memoria_Total_PSS'], 'b-', label='PSS Total')
+        axes[0].plot(runs['Timestamp'], runs['Java_Heap'], 'r-', label='Java Heap')
+        axes[0].set_title('Uso de Memoria')
+        axes[0].set_ylabel('Memoria (KB)')
+        axes[0].legend()
+
+        axes[1].plot(runs['Timestamp'], runs['CPU_Usage'], 'g-')
+        axes[1].set_title('Uso de CPU')
+        axes[1].set_ylabel('CPU (%)')
+
+        axes[2].plot(runs['Timestamp'], runs['Total_Frames'], label='Total Frames')
+        axes[2].plot(runs['Timestamp'], runs['Janky_Frames'], color='red', label='Frames Lentos')
+        axes[2].set_title('Rendimiento de Frames')
+        axes[2].set_ylabel('Número de Frames')
+        axes[2].legend()
+
+        axes[3].plot(runs['Timestamp'], runs['Janky_Percent'], 'r-')
+        axes[3].axhline(y=16, color='orange', linestyle='--', label='Umbral de advertencia (16%)')
+        axes[3].set_title('Porcentaje de Frames Lentos')
+        axes[3].set_ylabel('Porcentaje (%)')
+        axes[3].legend()
+
+        for column, q in zip(columns, PERCENTILES):
+            if not frames.empty:
+                axes[4].plot(frames['timestamp'], frames[column], marker='.', label=f'p{q}')
+        axes[4].axhline(y=16, color='orange', linestyle='--', label='Presupuesto 60 fps (16 ms)')
+        axes[4].set_title('Percentiles de tiempo de frame')
+        axes[4].set_ylabel('Tiempo de frame (ms)')
+        axes[4].set_xlabel('Fecha')
+        axes[4].legend()
+        for label in axes[4].get_xticklabels():
+            label.set_rotation(45)
+        figure.suptitle(f'Rendimiento de TempoSage ({total_runs} ejecuciones)')
+        figure.tight_layout()
+
+        if output_format == 'html':
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png', dpi=100)
+            image = base64.b64encode(buffer.getvalue()).decode('ascii')
+            table = latest.drop(columns=['Timestamp'])
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write('<!DOCTYPE html>\n<html lang="es"><head><meta charset="utf-8">'
+                        '<title>Rendimiento de TempoSage</title></head><body>\n'
+                        f'<h1>Rendimiento de TempoSage</h1>\n<p>{total_runs} ejecuciones, '
+                        f'{runs["Fecha"].iloc[0]} – {latest["Fecha"].iloc[-1]}</p>\n'
+                        f'<img src="data:image/png;base64,{image}" alt="Rendimiento">\n'
+                        f'<h2>Últimas ejecuciones</h2>\n{table.to_html(index=False, na_rep="-")}\n'
+                        '</body></html>\n')
+        else:
+            figure.savefig(output_path, dpi=100)
+    finally:
+        figure.clear()
+    return output_path
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Gráficos de rendimiento de TempoSage")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Historial SQLite de rendimiento")
+    parser.add_argument('--desde', type=parse_date, default=None, help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument('--hasta', type=parse_date, default=None, help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument('--ultimas', type=int, default=None, help="Solo las N ejecuciones más recientes")
+    parser.add_argument('--analizar', action='store_true',
+                        help="Compara la última captura con la línea base y sale con 1 si hay regresiones")
+    parser.add_argument('--presupuestos', default=None, help="JSON con presupuestos de rendimiento")
+    parser.add_argument('--ventana', type=int, default=None, help="Ejecuciones anteriores en la línea base")
+    parser.add_argument('--reporte', action='store_true',
+                        help="Genera un único informe multipanel sin interfaz gráfica (backend Agg)")
+    parser.add_argument('--formato', choices=['png', 'html'], default='png', help="Formato del informe")
+    parser.add_argument('--max-puntos', type=int, default=DEFAULT_MAX_POINTS,
+                        help="Puntos máximos por serie en el informe (0 = sin reducir)")
+    args = parser.parse_args()
+
+    if args.analizar:
+        sys.exit(run_check(args.db, budgets_path=args.presupuestos, window=args.ventana))
+
+    if args.reporte or not (os.environ.get('DISPLAY') or sys.platform in ('darwin', 'win32')):
+        # Sin pantalla no hace falta pagar la importación de un backend interactivo
+        matplotlib.use('Agg')
+
     # Configurar estilo de gráficos
-    plt.style.use('ggplot')
+    matplotlib.style.use('ggplot')
     
-    # Buscar archivos CSV de resumen
-    csv_files = glob.glob('performance_reports/resumen_*.csv')
+    # Ingerir solo los resúmenes y volcados nuevos y consultar el rango pedido
+    columns = [f'frame_p{q}_ms' for q in PERCENTILES]
+    with PerformanceHistory(args.db) as history:
+        result = history.ingest('performance_reports')
+        if result['files']:
+            print(f"Historial actualizado: {result['files']} archivos nuevos ({result['runs']} ejecuciones,"
+                  f" {result['captures']} capturas dumpsys)")
+        # En el informe las series llegan ya reducidas; los gráficos sueltos usan todas las filas
+        max_points = args.max_puntos if args.reporte else None
+        data = history.query(args.desde, args.hasta, args.ultimas, max_points=max_points)
+        if not data.empty:
+            latest = history.query(args.desde, args.hasta, min(args.ultimas or 10, 10))
+            total_runs = min(history.count(args.desde, args.hasta), args.ultimas or sys.maxsize)
+            captures = history.query_captures(data['Timestamp'].iloc[0], latest['Timestamp'].iloc[-1],
+                                              columns=columns, max_points=max_points)
     
-    if not csv_files:
-        print("No se encontraron archivos CSV de rendimiento.")
+    if data.empty:
+        print("No se encontraron datos de rendimiento en el rango indicado.")
         print("Ejecuta primero './scripts/analizar_rendimiento.sh'")
         return
     
-    # Cargar todos los CSV en un DataFrame
-    all_data = []
-    for csv_file in csv_files:
-        try:
-            df = pd.read_csv(csv_file)
-            df['Timestamp'] = pd.to_datetime(df['Fecha'], format='%Y%m%d_%H%M%S')
-            all_data.append(df)
-        except Exception as e:
-            print(f"Error al procesar {csv_file}: {e}")
+    # Crear directorio para gráficos
+    os.makedirs(GRAPHS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    if not all_data:
-        print("No se pudieron cargar datos de los archivos CSV.")
+    if args.reporte:
+        path = render_report(data, captures, latest, total_runs,
+                             f'{GRAPHS_DIR}/reporte_{timestamp}.{args.formato}', args.formato)
+        print(f"Informe generado: {path}")
         return
     
-    # Combinar todos los datos
-    data = pd.concat(all_data).sort_values('Timestamp')
-    
-    # Crear directorio para gráficos
-    os.makedirs('performance_reports/graficos', exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    import matplotlib.pyplot as plt
     
     # Generar gráficos
     
@@ -68,6 +196,7 @@ def main():
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.savefig(f'performance_reports/graficos/memoria_{timestamp}.png')
+    plt.close()
     
     # 2. CPU
     plt.figure(figsize=(10, 6))
@@ -78,6 +207,7 @@ def main():
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.savefig(f'performance_reports/graficos/cpu_{timestamp}.png')
+    plt.close()
     
     # 3. Frames
     plt.figure(figsize=(10, 6))
@@ -90,6 +220,7 @@ def main():
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.savefig(f'performance_reports/graficos/frames_{timestamp}.png')
+    plt.close()
     
     # 4. Porcentaje de Janky Frames
     if 'Total_Frames' in data and data['Total_Frames'].max() > 0:
@@ -104,6 +235,22 @@ def main():
         plt.xticks(rotation=45)
         plt.tight_layout()
         plt.savefig(f'performance_reports/graficos/janky_percent_{timestamp}.png')
+        plt.close()
+    
+    # 5. Percentiles de tiempo de frame (desde los volcados gfxinfo)
+    if not captures.empty and captures[columns].notna().any().any():
+        plt.figure(figsize=(10, 6))
+        for column, q in zip(columns, PERCENTILES):
+            plt.plot(captures['timestamp'], captures[column], marker='o', label=f'p{q}')
+        plt.axhline(y=16, color='orange', linestyle='--', label='Presupuesto 60 fps (16 ms)')
+        plt.title('Percentiles de tiempo de frame')
+        plt.xlabel('Fecha')
+        plt.ylabel('Tiempo de frame (ms)')
+        plt.legend()
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        plt.savefig(f'performance_reports/graficos/frame_percentiles_{timestamp}.png')
+        plt.close()
     
     print(f"Gráficos generados en performance_reports/graficos/")
     print("Archivos:")